@@ -1,14 +1,34 @@
+import asyncio
+import copy
+import functools
+import inspect
+import reprlib
+import time
+from concurrent import futures
 from enum import Enum
-
-import requests
+from typing import List, Optional, Tuple
 
 import oxapi
+from oxapi.batching import (
+    ChunkingPolicy,
+    ChunkQueue,
+    deduplicate,
+    expand_results,
+    merge_results,
+)
+from oxapi.client import get_async_client, get_client
+from oxapi.coalescing import Coalescer
+from oxapi.deadline import Deadline
+from oxapi.endpoints import get_base_url
 from oxapi.error import (
+    CircuitOpenException,
+    DeadlineExceededException,
     InvalidAPIKeyException,
     NotAllowedException,
     NotFoundException,
     OxAPIError,
 )
+from oxapi.singleflight import SingleFlight
 from oxapi.utils import OxapiType
 
 
@@ -16,8 +36,53 @@ class ModelAPI:
     """General class for all the classes that call a OxAPI model.
 
     This class cannot be directly instantiated.
+
+    The texts of a call are split into chunks sent concurrently according to the
+    ``chunking`` policy of its class, which may adapt the chunks to the outcome of
+    the previous ones; chunking is disabled if None.
+
+    The concurrent calls with few texts can instead be merged into batched requests
+    by the ``coalescing`` coalescer of their class, disabled if None.
+
+    If ``deduplication`` is enabled for their class, the repeated texts of a call are
+    sent only once and their results copied back to every occurrence.
+
+    The identical calls running at the same time share a single request through the
+    ``single_flight`` layer of their class, disabled if None.
+
+    The results of single texts are kept in the ``cache`` of their class, if any,
+    and only the texts missing from it are sent to the API.
+
+    The objects are slotted. If ``release_body`` is enabled for their class, the body
+    of a call is dropped once its result is received, so that the texts are not kept
+    twice. If ``memoization`` is enabled for their class, the outputs of
+    ``format_result`` are kept per format until the result changes; it is disabled
+    by default.
     """
 
+    __slots__ = (
+        "model",
+        "type",
+        "version",
+        "api_version",
+        "error",
+        "_body",
+        "result",
+        "deadline",
+        "input_texts",
+        "prompt",
+        "_formatted",
+        "_params",
+    )
+
+    chunking: ChunkingPolicy = ChunkingPolicy()
+    coalescing: Coalescer = None
+    deduplication: bool = False
+    single_flight: SingleFlight = None
+    cache = None
+    release_body: bool = False
+    memoization: bool = False
+
     def __init__(
         self, model: Enum, oxapi_type: OxapiType, api_version: str, version: str
     ):
@@ -38,14 +103,33 @@ class ModelAPI:
         self.error = None
         self._body = None
         self.result = None
+        self.deadline = None
+        self._formatted = None
+        self._params = None
+
+    def __getattr__(self, name: str):
+        """Returns the parameters set by ``set_params`` that have no slot.
+
+        Args:
+            name: the name of the parameter.
+
+        Returns:
+            the value of the parameter.
+        """
+        if name != "_params" and self._params is not None and name in self._params:
+            return self._params[name]
+        raise AttributeError(
+            "'{0}' object has no attribute '{1}'".format(type(self).__name__, name)
+        )
 
     def __repr__(self) -> str:
+        # bounded, so that the results of large calls are never stringified entirely
         return "Model: {0}, Type: {1}, API version: {2}, Version: {3}, Result: {4}, Error: {5}".format(
             self.model.value,
             self.type.value,
             self.api_version,
             self.version,
-            str(self.result),
+            _repr.repr(self.result),
             str(self.error),
         )
 
@@ -61,9 +145,7 @@ class ModelAPI:
         Returns:
             str : the full url of the OxAPI to be called.
         """
-        base_url: str = (
-            oxapi.base_url if oxapi.base_url is not None else "https://api.oxolo.com"
-        )  # TODO: remove hardcoding
+        base_url: str = get_base_url()
         if verbose:
             oxapi.logger.info(base_url)
             oxapi.logger.info(self.api_version)
@@ -96,7 +178,11 @@ class ModelAPI:
         """
 
         def __post_request(
-            api: ModelAPI, body: dict, verbose: bool, raise_exceptions: bool
+            api: ModelAPI,
+            body: dict,
+            verbose: bool,
+            raise_exceptions: bool,
+            deadline: float,
         ):
             """Performs a POST request on OxAPI endpoint and returns the
             result.
@@ -107,42 +193,429 @@ class ModelAPI:
                 verbose: optional, True to enable verbose mode.
                 raise_exceptions: enables or disables the raising of exceptions in case of error. If False,
                 you will be receiving only warnings.
+                deadline: the time budget of the call in seconds, None for no deadline.
 
             Returns:
-                the result from the POST request.
+                the decoded result of the POST request.
             """
-            if oxapi.api_key is None:
-                raise InvalidAPIKeyException(
-                    "API Key cannot be None: either you set it manually the value of oxapi.api_key, \
-                or you set the OXAPI_KEY environment variable"
-                )
+            ModelAPI._check_api_key()
             url: str = api.get_url(verbose=verbose)
             if verbose:
                 oxapi.logger.info(url)
                 oxapi.logger.info(body)
-            res = requests.post(
-                url,
-                json=body,
-                headers={
-                    "Content-Type": "application/json",
-                    "Authorization": oxapi.api_key,
-                },
-            )
-            api.parse_error_message(
-                res, verbose=verbose, raise_exceptions=raise_exceptions
-            )
-            if api.error is not None:
+            client = get_client()
+            deadline = Deadline.start(deadline)
+            keys, cached, body = api._lookup_cache(body)
+            if body is None:
+                return api._merge_cache(keys, cached, {"results": []})
+            body, positions = api._deduplicate(body)
+            try:
+                if api.single_flight is None:
+                    responses = api._post_chunks(client, url, body, deadline)
+                else:
+                    # the shared call outlives the deadline of the caller which
+                    # started it, each caller only waits until its own deadline
+                    responses = api.single_flight.do(
+                        url,
+                        body,
+                        lambda: api._post_chunks(client, url, body, None),
+                        deadline=deadline,
+                    )
+            except (CircuitOpenException, DeadlineExceededException) as e:
+                api.handle_exception(e, raise_exceptions=raise_exceptions)
                 return None
-            return res
+            result = api._merge_responses(
+                responses, verbose=verbose, raise_exceptions=raise_exceptions
+            )
+            if result is not None and positions is not None:
+                result = expand_results(result, positions)
+            return api._merge_cache(keys, cached, result)
 
         api: ModelAPI = kwargs.get("api")
         verbose: bool = kwargs.get("verbose")
         body: dict = kwargs.get("body")
         raise_exceptions: bool = kwargs.get("raise_exceptions")
-        res = __post_request(
-            api=api, body=body, verbose=verbose, raise_exceptions=raise_exceptions
+        deadline: float = kwargs.get("deadline")
+        result = __post_request(
+            api=api,
+            body=body,
+            verbose=verbose,
+            raise_exceptions=raise_exceptions,
+            deadline=deadline,
         )
-        return api, res
+        api._release_body()
+        return api, result
+
+    @classmethod
+    async def arun(cls, *args, **kwargs):
+        """Coroutine to run and perform a call to any OxAPI model without
+        blocking the event loop.
+
+        Args:
+            *args: any (see the derived class signature).
+            **kwargs: any (see the derived class signature).
+
+        Returns:
+            ModelAPI : an object of ModelAPI class for fetching the result.
+        """
+        api: ModelAPI = kwargs.get("api")
+        verbose: bool = kwargs.get("verbose")
+        body: dict = kwargs.get("body")
+        raise_exceptions: bool = kwargs.get("raise_exceptions")
+        deadline: float = kwargs.get("deadline")
+        ModelAPI._check_api_key()
+        url: str = api.get_url(verbose=verbose)
+        if verbose:
+            oxapi.logger.info(url)
+            oxapi.logger.info(body)
+        client = get_async_client()
+        deadline = Deadline.start(deadline)
+        keys, cached, body = api._lookup_cache(body)
+        if body is None:
+            api._release_body()
+            return api, api._merge_cache(keys, cached, {"results": []})
+        body, positions = api._deduplicate(body)
+        try:
+            if api.single_flight is None:
+                responses = await api._apost_chunks(client, url, body, deadline)
+            else:
+                # the shared call outlives the deadline of the caller which
+                # started it, each caller only waits until its own deadline
+                responses = await api.single_flight.ado(
+                    url,
+                    body,
+                    lambda: api._apost_chunks(client, url, body, None),
+                    deadline=deadline,
+                )
+        except (CircuitOpenException, DeadlineExceededException) as e:
+            api.handle_exception(e, raise_exceptions=raise_exceptions)
+            return api, None
+        result = api._merge_responses(
+            responses, verbose=verbose, raise_exceptions=raise_exceptions
+        )
+        if result is not None and positions is not None:
+            result = expand_results(result, positions)
+        api._release_body()
+        return api, api._merge_cache(keys, cached, result)
+
+    def _lookup_cache(
+        self, body: dict
+    ) -> Tuple[Optional[List[tuple]], Optional[list], Optional[dict]]:
+        """Looks up the results of the texts of a call in the cache.
+
+        Args:
+            body: the body of the call.
+
+        Returns:
+            Tuple[Optional[List[tuple]], Optional[list], Optional[dict]] : the cache keys of the texts, their cached
+            results (None for the misses) and the body with the texts to be sent to the API, None if all of them are
+            cached; the keys and the results are None, and the body unchanged, if the call is not cached.
+        """
+        texts = body.get("texts") if body is not None else None
+        if self.cache is None or not isinstance(texts, list) or not self._chunkable():
+            return None, None, body
+        keys = [
+            self.cache.get_key(self.model.value, self.version, self.api_version, text)
+            for text in texts
+        ]
+        cached = self.cache.get_many(keys)
+        missing = [text for text, value in zip(texts, cached) if value is None]
+        if not missing:
+            return keys, cached, None
+        return keys, cached, dict(body, texts=missing)
+
+    def _merge_cache(
+        self, keys: Optional[List[tuple]], cached: Optional[list], result: dict
+    ) -> Optional[dict]:
+        """Stores copies of the results received from the API in the cache and
+        stitches them with the cached ones, in the order of the texts, so that the
+        callers modifying their result do not alter the cache.
+
+        Args:
+            keys: the cache keys of the texts, None if the call is not cached.
+            cached: the cached results, None for the misses.
+            result: the decoded result of the call for the missing texts, None in case of error.
+
+        Returns:
+            Optional[dict] : the result for all the texts, None in case of error.
+        """
+        if keys is None or result is None:
+            return result
+        fresh = iter(result["results"])
+        results = [
+            next(fresh) if value is None else self._from_cache(value)
+            for value in cached
+        ]
+        self.cache.put_many(
+            [key for key, value in zip(keys, cached) if value is None],
+            copy.deepcopy(result["results"]),
+        )
+        return dict(result, results=results)
+
+    def _from_cache(self, value):
+        """Converts a cached result to the format of the results of the API.
+
+        Args:
+            value: the cached result.
+
+        Returns:
+            the result, a copy of the cached one.
+        """
+        return copy.deepcopy(value)
+
+    def _deduplicate(self, body: dict) -> Tuple[dict, Optional[List[int]]]:
+        """Removes the repeated texts of a call if deduplication is enabled.
+
+        Args:
+            body: the body of the call.
+
+        Returns:
+            Tuple[dict, Optional[List[int]]] : the body with the unique texts, and for each text the index of its unique
+            text; the body itself and None if no text was removed.
+        """
+        texts = body.get("texts") if body is not None else None
+        if (
+            not self.deduplication
+            or not isinstance(texts, list)
+            or not self._chunkable()
+        ):
+            return body, None
+        unique, positions = deduplicate(texts)
+        if positions is None:
+            return body, None
+        oxapi.logger.debug(
+            "Sending {0} unique texts out of {1}".format(len(unique), len(texts))
+        )
+        return dict(body, texts=unique), positions
+
+    def _get_texts(self, body: dict) -> Optional[List[str]]:
+        """Returns the texts of a call to be split into chunks.
+
+        Args:
+            body: the body of the call.
+
+        Returns:
+            Optional[List[str]] : the texts, None if the call is not chunked.
+        """
+        texts = body.get("texts") if body is not None else None
+        if (
+            self.chunking is None
+            or not isinstance(texts, list)
+            or not self._chunkable()
+        ):
+            return None
+        if self.chunking.next_chunk(texts, 0) >= len(texts):
+            return None
+        return texts
+
+    def _post_chunks(self, client, url: str, body: dict, deadline: Deadline) -> list:
+        """Sends a call, either merged with concurrent calls by the coalescer or
+        split into chunks sent from a pool of threads, as many at the same time as
+        allowed by the chunking policy, which records their outcome.
+
+        Args:
+            client: the client sending the requests.
+            url: the url of the endpoint.
+            body: the body of the call.
+            deadline: the deadline of the call, None for no deadline.
+
+        Returns:
+            list : the responses of the API, in order; a single one if the call is not chunked.
+        """
+        accept = self._get_accept()
+        if self._coalescable(body):
+            return [
+                self.coalescing.post(
+                    client, url, body, deadline=deadline, accept=accept
+                )
+            ]
+        texts = self._get_texts(body)
+        if texts is None:
+            return [client.post(url, body, deadline=deadline, accept=accept)]
+        policy = self.chunking
+        queue = ChunkQueue(policy, texts)
+        responses = {}
+
+        def post(start: int, end: int):
+            started = time.monotonic()
+            try:
+                res = client.post(
+                    url,
+                    dict(body, texts=texts[start:end]),
+                    deadline=deadline,
+                    accept=accept,
+                )
+            except Exception:
+                policy.record(end - start, time.monotonic() - started)
+                raise
+            return res, policy.record(end - start, time.monotonic() - started, res)
+
+        running = {}
+        with futures.ThreadPoolExecutor(
+            max_workers=policy.get_concurrency_limit()
+        ) as executor:
+            while True:
+                while len(running) < policy.max_concurrency:
+                    chunk = queue.next()
+                    if chunk is None:
+                        break
+                    running[executor.submit(post, *chunk)] = chunk
+                if not running:
+                    break
+                done, _ = futures.wait(running, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    start, end = running.pop(future)
+                    res, resend = future.result()
+                    if resend:
+                        queue.requeue(start, end)
+                    else:
+                        responses[start] = res
+        return [responses[start] for start in sorted(responses)]
+
+    async def _apost_chunks(
+        self, client, url: str, body: dict, deadline: Deadline
+    ) -> list:
+        """Coroutine sending a call, either merged with concurrent calls by the
+        coalescer or split into chunks, as many at the same time as allowed by the
+        chunking policy, which records their outcome.
+
+        Args:
+            client: the asynchronous client sending the requests.
+            url: the url of the endpoint.
+            body: the body of the call.
+            deadline: the deadline of the call, None for no deadline.
+
+        Returns:
+            list : the responses of the API, in order; a single one if the call is not chunked.
+        """
+        accept = self._get_accept()
+        if self._coalescable(body):
+            return [
+                await self.coalescing.apost(
+                    client, url, body, deadline=deadline, accept=accept
+                )
+            ]
+        texts = self._get_texts(body)
+        if texts is None:
+            return [await client.post(url, body, deadline=deadline, accept=accept)]
+        policy = self.chunking
+        queue = ChunkQueue(policy, texts)
+        responses = {}
+
+        async def post(start: int, end: int):
+            started = time.monotonic()
+            try:
+                res = await client.post(
+                    url,
+                    dict(body, texts=texts[start:end]),
+                    deadline=deadline,
+                    accept=accept,
+                )
+            except Exception:
+                policy.record(end - start, time.monotonic() - started)
+                raise
+            return res, policy.record(end - start, time.monotonic() - started, res)
+
+        running = {}
+        try:
+            while True:
+                while len(running) < policy.max_concurrency:
+                    chunk = queue.next()
+                    if chunk is None:
+                        break
+                    running[asyncio.ensure_future(post(*chunk))] = chunk
+                if not running:
+                    break
+                done, _ = await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    start, end = running.pop(task)
+                    res, resend = task.result()
+                    if resend:
+                        queue.requeue(start, end)
+                    else:
+                        responses[start] = res
+        finally:
+            for task in running:
+                task.cancel()
+        return [responses[start] for start in sorted(responses)]
+
+    def _coalescable(self, body: dict) -> bool:
+        """Checks whether a call can be merged with other calls into a batched
+        request.
+
+        Args:
+            body: the body of the call.
+
+        Returns:
+            bool : True if the class has a coalescer accepting the call.
+        """
+        return (
+            self.coalescing is not None
+            and self._chunkable()
+            and self.coalescing.accepts(body)
+        )
+
+    def _chunkable(self) -> bool:
+        """Checks whether the texts of the call can be split into chunks.
+
+        Returns:
+            bool : True if the result of each text does not depend on the other texts.
+        """
+        return True
+
+    def _merge_responses(
+        self, responses: list, verbose: bool = False, raise_exceptions: bool = True
+    ):
+        """Checks the responses to the chunks of a call and merges their results.
+
+        Args:
+            responses: the responses of the API, in order.
+            verbose: optional, True to enable verbose mode.
+            raise_exceptions: default True, enables or disables the raising of exceptions in case of error. If False,
+            you will be receiving only warnings.
+
+        Returns:
+            the decoded result of the call, None in case of error.
+        """
+        for res in responses:
+            self.parse_error_message(
+                res, verbose=verbose, raise_exceptions=raise_exceptions
+            )
+            if self.error is not None:
+                return None
+        if len(responses) == 1:
+            return self._decode_response(responses[0])
+        return merge_results([self._decode_response(res) for res in responses])
+
+    def _get_accept(self) -> Optional[str]:
+        """Returns the Accept header negotiating the format of the responses.
+
+        Returns:
+            Optional[str] : the value of the header, None for the default one.
+        """
+        return None
+
+    def _decode_response(self, response):
+        """Decodes the successful response of the API.
+
+        Args:
+            response: the response of the API.
+
+        Returns:
+            the decoded result.
+        """
+        return response.json()
+
+    @staticmethod
+    def _check_api_key():
+        """Internal function for checking that the API key is set."""
+        if oxapi.api_key is None:
+            raise InvalidAPIKeyException(
+                "API Key cannot be None: either you set it manually the value of oxapi.api_key, \
+            or you set the OXAPI_KEY environment variable"
+            )
 
     def parse_error_message(
         self, api_response, verbose: bool = False, raise_exceptions: bool = True
@@ -203,6 +676,23 @@ class ModelAPI:
             else:
                 raise self.error
 
+    def handle_exception(self, error: OxAPIError, raise_exceptions: bool = True):
+        """Method to handle a call interrupted before receiving a response, because
+        its deadline has been exceeded or its endpoint is short-circuited.
+
+        Args:
+            error: the exception interrupting the call.
+            raise_exceptions: default True, enables or disables the raising of exceptions in case of error. If False,
+            you will be receiving only warnings.
+        """
+        self.error = error
+        if not raise_exceptions:
+            oxapi.logger.warning(
+                "Request failed: {0}, ERROR: {1}".format(self.get_url(), error)
+            )
+        else:
+            raise error
+
     def set_params(self, **kwargs):
         """Function for setting attributes to the objects.
 
@@ -212,4 +702,59 @@ class ModelAPI:
         for key, value in kwargs.items():
             if key == "body":
                 key = "_body"
-            self.__setattr__(key, value)
+            try:
+                self.__setattr__(key, value)
+            except AttributeError:
+                # parameter without a slot
+                if self._params is None:
+                    self._params = {}
+                self._params[key] = value
+
+    def _release_body(self):
+        """Drops the body of a successful call if the class releases them."""
+        if self.release_body and self.error is None:
+            self._body = None
+
+
+_repr = reprlib.Repr()
+_repr.maxlevel = 3
+_repr.maxdict = 4
+_repr.maxlist = 4
+_repr.maxtuple = 4
+_repr.maxstring = 80
+_repr.maxother = 80
+
+
+def memoize_format(format_result):
+    """Decorator memoizing the outputs of a ``format_result`` method per format and
+    arguments, for the classes with ``memoization`` enabled, until the result of the
+    call changes.
+
+    The memoized outputs are returned as they are, not copied.
+
+    Args:
+        format_result: the method.
+
+    Returns:
+        the memoized method.
+    """
+    signature = inspect.signature(format_result)
+
+    @functools.wraps(format_result)
+    def wrapper(self, *args, **kwargs):
+        if not self.memoization or self.result is None:
+            return format_result(self, *args, **kwargs)
+        arguments = signature.bind(self, *args, **kwargs)
+        arguments.apply_defaults()
+        key = tuple(arguments.arguments.items())[1:]
+        if self._formatted is None or self._formatted[0] is not self.result:
+            self._formatted = (self.result, {})
+        outputs = self._formatted[1]
+        if key not in outputs:
+            output = format_result(self, *args, **kwargs)
+            if output is None:
+                return None
+            outputs[key] = output
+        return outputs[key]
+
+    return wrapper
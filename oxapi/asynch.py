@@ -1,26 +1,61 @@
-from typing import List, Union
+import asyncio
+import time
+from typing import AsyncIterator, Iterator, List, Optional, Set, Tuple, Union
 
 import oxapi
 from oxapi.abstract.api import ModelAPI
+from oxapi.client import get_async_client, get_client, log_deadline, log_retry
+from oxapi.deadline import Deadline
+from oxapi.error import (
+    CircuitOpenException,
+    DeadlineExceededException,
+    OxAPIError,
+)
+from oxapi.ratelimit import TokenBucket
+from oxapi.retry import RetryPolicy
 
 
 class AsyncCallPipe:
     """Class for performing multiple calls to OxAPI in parallel."""
 
-    def __init__(self, call_list: List[ModelAPI] = None):
+    def __init__(
+        self,
+        call_list: List[ModelAPI] = None,
+        max_in_flight: int = None,
+        requests_per_second: float = None,
+        texts_per_second: float = None,
+        retry_policy: RetryPolicy = None,
+    ):
         """Constructor.
 
         Args:
             call_list: the list of API calls. It is allowed to create an AsyncCallPipe without its call_list
             defined at instantiation time (calls can be added later with add method).
+            max_in_flight: optional, maximum number of calls running at the same time; unbounded if None.
+            requests_per_second: optional, maximum number of calls started per second; unbounded if None.
+            texts_per_second: optional, maximum number of texts sent per second (a Completion prompt counts as
+            one text); unbounded if None.
+            retry_policy: optional, the policy for retrying the failed calls; the policy of the client is used
+            if None.
         """
         if call_list is None:
             call_list = []
         self.__call_list = call_list
+        self.max_in_flight = max_in_flight
+        self.__buckets = []
+        if requests_per_second is not None:
+            self.__buckets.append((TokenBucket(rate=requests_per_second), False))
+        if texts_per_second is not None:
+            self.__buckets.append((TokenBucket(rate=texts_per_second), True))
+        self.retry_policy = retry_policy
 
-    def run(self):
+    def run(self, deadline: float = None):
         """Runs the set of API calls.
 
+        Args:
+            deadline: optional, time budget in seconds of the whole run, retries included; the calls prepared
+            with their own deadline are bounded by both.
+
         Returns:
             List : the List of API calls with their result (or errors).
         """
@@ -29,32 +64,183 @@ class AsyncCallPipe:
         if len(self.__call_list) == 0:
             oxapi.logger.warning("Call list is empty, nothing to run.")
             return
-        reqs = []
-        for call in self.__call_list:
-            api_type: ModelAPI = call
-            reqs.append(
-                grequests.post(
-                    api_type.get_url(),
-                    json=api_type._body,
-                    headers={
-                        "Content-Type": "application/json",
-                        "Authorization": oxapi.api_key,
-                    },
+        client = get_client()
+        deadlines = self.__start_deadlines(deadline)
+        lookups, cached = self.__lookup_caches()
+        results = [None] * len(self.__call_list)
+        pending = [i for i in range(0, len(self.__call_list)) if i not in cached]
+        attempt = 1
+        while pending:
+            admitted = self.__admit(pending, client)
+            for i in set(pending) - set(admitted):
+                results[i] = None
+            reqs = [
+                self.__build_request(
+                    grequests, client, self.__call_list[i], deadlines[i]
                 )
+                for i in admitted
+            ]
+            responses = grequests.map(
+                requests=reqs,
+                size=self.max_in_flight,
+                exception_handler=AsyncCallPipe.__build_exception_handler(client),
             )
-
-        results = grequests.map(
-            requests=reqs, exception_handler=AsyncCallPipe.__exception_handler
-        )
+            for i, response in zip(admitted, responses):
+                results[i] = response
+            pending = self.__select_retries(
+                admitted, results, attempt, client, deadlines
+            )
+            attempt += 1
         results_processed = []
-        for i in range(0, len(results)):
-            temp = self.__call_list[i]
-            temp.parse_error_message(results[i], raise_exceptions=False)
-            if results[i].status_code == 200:
-                temp.result = results[i].json()
-            results_processed.append(temp)
+        for i, call in enumerate(self.__call_list):
+            if i not in cached:
+                AsyncCallPipe.__process_response(call, results[i], deadlines[i])
+                AsyncCallPipe.__merge_cache(call, lookups[i])
+            results_processed.append(call)
         return results_processed
 
+    async def arun(self, deadline: float = None):
+        """Coroutine running the set of API calls concurrently on the running
+        event loop.
+
+        Args:
+            deadline: optional, time budget in seconds of the whole run, retries included; the calls prepared
+            with their own deadline are bounded by both.
+
+        Returns:
+            List : the List of API calls with their result (or errors).
+        """
+        if len(self.__call_list) == 0:
+            oxapi.logger.warning("Call list is empty, nothing to run.")
+            return
+        post = self.__build_async_post()
+        deadlines = self.__start_deadlines(deadline)
+        lookups, cached = self.__lookup_caches()
+        pending = [i for i in range(0, len(self.__call_list)) if i not in cached]
+        results = await asyncio.gather(
+            *[post(self.__call_list[i], deadlines[i]) for i in pending],
+            return_exceptions=True,
+        )
+        for i, result in zip(pending, results):
+            call = self.__call_list[i]
+            AsyncCallPipe.__process_async_result(call, result)
+            AsyncCallPipe.__merge_cache(call, lookups[i])
+        return list(self.__call_list)
+
+    def iter_completed(self, deadline: float = None) -> Iterator[Tuple[int, ModelAPI]]:
+        """Runs the set of API calls, yielding each of them as soon as its response
+        arrives.
+
+        Args:
+            deadline: optional, time budget in seconds of the whole run, retries included; the calls prepared
+            with their own deadline are bounded by both.
+
+        Returns:
+            Iterator[Tuple[int, ModelAPI]] : the index of each API call in the call list together with the call
+            itself, holding its result (or error), in order of completion.
+        """
+        import grequests
+
+        if len(self.__call_list) == 0:
+            oxapi.logger.warning("Call list is empty, nothing to run.")
+            return
+        client = get_client()
+        retry_policy = self.__get_retry_policy(client)
+        deadlines = self.__start_deadlines(deadline)
+        lookups, cached = self.__lookup_caches()
+        for i in sorted(cached):
+            yield i, self.__call_list[i]
+        pending = [i for i in range(0, len(self.__call_list)) if i not in cached]
+        attempt = 1
+        while pending:
+            admitted = self.__admit(pending, client)
+            for i in pending:
+                if i not in admitted:
+                    AsyncCallPipe.__merge_cache(self.__call_list[i], lookups[i])
+                    yield i, self.__call_list[i]
+            reqs = [
+                self.__build_request(
+                    grequests, client, self.__call_list[i], deadlines[i]
+                )
+                for i in admitted
+            ]
+            failed = {}
+            for j, result in AsyncCallPipe.__imap_completed(
+                grequests,
+                reqs,
+                size=self.max_in_flight,
+                exception_handler=AsyncCallPipe.__build_exception_handler(client),
+            ):
+                i = admitted[j]
+                reqs[j].response = None
+                if (
+                    retry_policy is not None
+                    and attempt < retry_policy.max_attempts
+                    and retry_policy.is_retryable(result)
+                ):
+                    failed[i] = result
+                    continue
+                call = self.__call_list[i]
+                AsyncCallPipe.__process_response(call, result, deadlines[i])
+                AsyncCallPipe.__merge_cache(call, lookups[i])
+                yield i, call
+            pending = []
+            if failed:
+                pending = self.__wait_retry(
+                    sorted(failed), failed, attempt, retry_policy, deadlines
+                )
+            for i in sorted(set(failed) - set(pending)):
+                call = self.__call_list[i]
+                AsyncCallPipe.__process_response(call, failed[i], deadlines[i])
+                AsyncCallPipe.__merge_cache(call, lookups[i])
+                yield i, call
+            attempt += 1
+
+    async def aiter_completed(
+        self, deadline: float = None
+    ) -> AsyncIterator[Tuple[int, ModelAPI]]:
+        """Runs the set of API calls concurrently on the running event loop,
+        yielding each of them as soon as its response arrives.
+
+        Args:
+            deadline: optional, time budget in seconds of the whole run, retries included; the calls prepared
+            with their own deadline are bounded by both.
+
+        Returns:
+            AsyncIterator[Tuple[int, ModelAPI]] : the index of each API call in the call list together with the
+            call itself, holding its result (or error), in order of completion.
+        """
+        if len(self.__call_list) == 0:
+            oxapi.logger.warning("Call list is empty, nothing to run.")
+            return
+        post = self.__build_async_post()
+        deadlines = self.__start_deadlines(deadline)
+        lookups, cached = self.__lookup_caches()
+        for i in sorted(cached):
+            yield i, self.__call_list[i]
+
+        async def indexed_post(i: int, call: ModelAPI):
+            try:
+                return i, await post(call, deadlines[i])
+            except Exception as e:
+                return i, e
+
+        tasks = [
+            asyncio.ensure_future(indexed_post(i, call))
+            for i, call in enumerate(self.__call_list)
+            if i not in cached
+        ]
+        try:
+            for task in asyncio.as_completed(tasks):
+                i, result = await task
+                call = self.__call_list[i]
+                AsyncCallPipe.__process_async_result(call, result)
+                AsyncCallPipe.__merge_cache(call, lookups[i])
+                yield i, call
+        finally:
+            for task in tasks:
+                task.cancel()
+
     def add(self, api_call: Union[ModelAPI, List[ModelAPI]]):
         """Adds a single or a list of API calls to the call list.
 
@@ -70,14 +256,382 @@ class AsyncCallPipe:
         """Clears the list of API calls."""
         self.__call_list = []
 
+    def __build_request(
+        self, grequests, client, call: ModelAPI, deadline: Optional[Deadline] = None
+    ):
+        """Builds the grequests request of an API call, throttled by the token
+        buckets of the pipe.
+
+        The timeouts of the request are computed when it is sent, after waiting for
+        the limits of the pipe, so that they fit in the remaining budget of the call;
+        a request whose deadline expired while waiting is not sent.
+
+        Args:
+            grequests: the grequests module.
+            client: the OxAPIClient whose session is used.
+            call: the API call.
+            deadline: optional, the deadline of the call, bounding the timeouts of the request.
+
+        Returns:
+            grequests.AsyncRequest : the request, not yet sent.
+        """
+        url = call.get_url()
+        data, headers = client.encode_body(call._body, accept=call._get_accept())
+        request = grequests.post(
+            url,
+            data=data,
+            headers=headers,
+            session=client.session,
+            hooks={"response": AsyncCallPipe.__build_response_hook(client, url)},
+        )
+        send = request.send
+
+        def timed_send(*args, **kwargs):
+            if self.__buckets:
+                self.__acquire(call)
+            if deadline is not None and deadline.expired():
+                request.exception = deadline.exceeded(url)
+                return request
+            kwargs["timeout"] = client.get_timeout(deadline)
+            return send(*args, **kwargs)
+
+        request.send = timed_send
+        return request
+
+    @staticmethod
+    def __build_response_hook(client, url: str):
+        """Builds the hook called on the response received by a grequests
+        request.
+
+        Args:
+            client: the OxAPIClient whose counters are updated.
+            url: the url of the endpoint called by the request.
+
+        Returns:
+            the hook, counting the response and updating the health of its endpoint.
+        """
+
+        def hook(response, *args, **kwargs):
+            client.stats.record_response(response)
+            client.record_outcome(url, response)
+
+        return hook
+
     @staticmethod
-    def __exception_handler(request, exception):
-        """Handles the exceptions in calling the APIs.
+    def __imap_completed(grequests, reqs: list, size: int, exception_handler):
+        """Sends grequests requests concurrently, yielding their responses in order
+        of completion together with their index.
 
         Args:
-            request: original request
-            exception: generated exception
+            grequests: the grequests module.
+            reqs: the requests.
+            size: the maximum number of requests in flight.
+            exception_handler: the handler of the exceptions raised by the requests.
+
+        Returns:
+            Iterator[Tuple[int, Optional[requests.Response]]] : the index of each request in the list together with
+            its response, None if it failed.
         """
-        oxapi.logger.warning(
-            "Request failed: {0}, ERROR: {1}".format(request.url, exception)
+        pool = grequests.Pool(size)
+
+        def send(j):
+            return j, reqs[j].send()
+
+        for j, request in pool.imap_unordered(send, range(len(reqs))):
+            if request.response is None:
+                exception_handler(request, request.exception)
+            yield j, request.response
+
+    @staticmethod
+    def __build_exception_handler(client):
+        """Builds the handler of the exceptions raised by the grequests requests.
+
+        Args:
+            client: the OxAPIClient whose endpoints health is updated.
+
+        Returns:
+            the handler, logging the exception and recording the failure of the endpoint, unless the request was
+            not sent.
+        """
+
+        def handler(request, exception):
+            oxapi.logger.warning(
+                "Request failed: {0}, ERROR: {1}".format(request.url, exception)
+            )
+            if isinstance(exception, DeadlineExceededException):
+                # not sent, the endpoint is not to blame
+                client.release_call(request.url)
+            else:
+                client.record_outcome(request.url)
+
+        return handler
+
+    def __admit(self, indices: List[int], client) -> List[int]:
+        """Selects the calls that may be sent, failing fast the ones whose
+        endpoint is short-circuited.
+
+        Args:
+            indices: the indices of the calls to be sent.
+            client: the OxAPIClient used by the pipe.
+
+        Returns:
+            List[int] : the indices of the calls to be sent.
+        """
+        admitted = []
+        for i in indices:
+            call = self.__call_list[i]
+            try:
+                client.before_call(call.get_url())
+            except CircuitOpenException as e:
+                oxapi.logger.warning(
+                    "Request failed: {0}, ERROR: {1}".format(call.get_url(), e)
+                )
+                call.error = e
+                continue
+            admitted.append(i)
+        return admitted
+
+    def __build_async_post(self):
+        """Builds the coroutine function sending an API call through the default
+        asynchronous client, bounded by the limits of the pipe.
+
+        Returns:
+            the coroutine function taking an API call and its deadline, and returning its response.
+        """
+        client = get_async_client()
+        semaphore = (
+            asyncio.Semaphore(self.max_in_flight)
+            if self.max_in_flight is not None
+            else None
+        )
+
+        async def post(call: ModelAPI, deadline: Optional[Deadline]):
+            if semaphore is None:
+                await self.__acquire_async(call)
+                return await client.post(
+                    call.get_url(),
+                    call._body,
+                    retry_policy=self.retry_policy,
+                    deadline=deadline,
+                    accept=call._get_accept(),
+                )
+            async with semaphore:
+                await self.__acquire_async(call)
+                return await client.post(
+                    call.get_url(),
+                    call._body,
+                    retry_policy=self.retry_policy,
+                    deadline=deadline,
+                    accept=call._get_accept(),
+                )
+
+        return post
+
+    def __lookup_caches(self) -> Tuple[List[Optional[tuple]], Set[int]]:
+        """Looks up the results of the calls in the caches of their classes: the
+        fully cached calls get their result, the partially cached ones a body with
+        the missing texts only, until their response is merged.
+
+        Returns:
+            Tuple[List[Optional[tuple]], Set[int]] : for each call, its cache keys, cached results and original body
+            (None if the call is not cached), and the indices of the fully cached calls.
+        """
+        lookups = []
+        cached = set()
+        for i, call in enumerate(self.__call_list):
+            keys, values, body = call._lookup_cache(call._body)
+            if keys is None:
+                lookups.append(None)
+            elif body is None:
+                lookups.append(None)
+                call.result = call._merge_cache(keys, values, {"results": []})
+                call._release_body()
+                cached.add(i)
+            else:
+                lookups.append((keys, values, call._body))
+                call._body = body
+        return lookups, cached
+
+    @staticmethod
+    def __merge_cache(call: ModelAPI, lookup: Optional[tuple]):
+        """Restores the body of a partially cached call and stitches its cached
+        results with the ones received from the API, then releases the body of the
+        call if its class releases them.
+
+        Args:
+            call: the API call.
+            lookup: the cache keys, cached results and original body of the call, None if it is not cached.
+        """
+        if lookup is not None:
+            keys, values, body = lookup
+            call._body = body
+            call.result = call._merge_cache(keys, values, call.result)
+        call._release_body()
+
+    def __get_retry_policy(self, client) -> RetryPolicy:
+        """Returns the retry policy in use.
+
+        Args:
+            client: the OxAPIClient used by the pipe.
+
+        Returns:
+            RetryPolicy : the policy of the pipe, or the one of the client if None.
+        """
+        return (
+            self.retry_policy if self.retry_policy is not None else client.retry_policy
         )
+
+    def __select_retries(
+        self,
+        indices: List[int],
+        results: list,
+        attempt: int,
+        client,
+        deadlines: List[Optional[Deadline]],
+    ) -> List[int]:
+        """Selects the calls to be retried and waits for the backoff time.
+
+        Args:
+            indices: the indices of the calls sent in the last attempt.
+            results: the responses of all the calls, None for the failed requests.
+            attempt: the number of attempts performed so far.
+            client: the OxAPIClient used by the pipe.
+            deadlines: the deadlines of all the calls.
+
+        Returns:
+            List[int] : the indices of the calls to be retried.
+        """
+        retry_policy = self.__get_retry_policy(client)
+        if retry_policy is None or attempt >= retry_policy.max_attempts:
+            return []
+        retries = [i for i in indices if retry_policy.is_retryable(results[i])]
+        if retries:
+            retries = self.__wait_retry(
+                retries, results, attempt, retry_policy, deadlines
+            )
+        return retries
+
+    def __wait_retry(
+        self,
+        indices: List[int],
+        results,
+        attempt: int,
+        retry_policy: RetryPolicy,
+        deadlines: List[Optional[Deadline]],
+    ) -> List[int]:
+        """Waits for the longest backoff time among the calls to be retried,
+        dropping the calls whose deadline would be exceeded.
+
+        Args:
+            indices: the failed calls to be retried.
+            results: the responses of the calls, indexable by the call indices.
+            attempt: the number of attempts performed so far.
+            retry_policy: the retry policy in use.
+            deadlines: the deadlines of all the calls.
+
+        Returns:
+            List[int] : the indices of the calls to be retried.
+        """
+        backoffs = {i: retry_policy.get_backoff(attempt, results[i]) for i in indices}
+        retries = []
+        for i in indices:
+            if deadlines[i] is not None and backoffs[i] >= deadlines[i].remaining():
+                log_deadline(self.__call_list[i].get_url(), attempt)
+            else:
+                retries.append(i)
+        if not retries:
+            return []
+        backoff = max(backoffs[i] for i in retries)
+        for i in retries:
+            log_retry(self.__call_list[i].get_url(), attempt, backoff, results[i])
+        time.sleep(backoff)
+        return [
+            i for i in retries if deadlines[i] is None or not deadlines[i].expired()
+        ]
+
+    def __start_deadlines(self, deadline: float = None) -> List[Optional[Deadline]]:
+        """Starts the deadlines of the calls of a run.
+
+        Args:
+            deadline: optional, time budget in seconds of the whole run.
+
+        Returns:
+            List[Optional[Deadline]] : for each call, the earliest between the deadline of the run and the
+            one of the call; None if neither is set.
+        """
+        deadline = Deadline.start(deadline)
+        return [
+            Deadline.earliest(deadline, Deadline.start(call.deadline))
+            for call in self.__call_list
+        ]
+
+    def __acquire(self, call: ModelAPI):
+        """Waits until the token buckets of the pipe allow to send the call.
+
+        Args:
+            call: the API call to be sent.
+        """
+        for bucket, per_text in self.__buckets:
+            bucket.acquire(AsyncCallPipe.__count_texts(call) if per_text else 1)
+
+    async def __acquire_async(self, call: ModelAPI):
+        """Waits, without blocking the event loop, until the token buckets of the
+        pipe allow to send the call.
+
+        Args:
+            call: the API call to be sent.
+        """
+        for bucket, per_text in self.__buckets:
+            await bucket.acquire_async(
+                AsyncCallPipe.__count_texts(call) if per_text else 1
+            )
+
+    @staticmethod
+    def __count_texts(call: ModelAPI) -> int:
+        """Counts the texts sent by an API call.
+
+        Args:
+            call: the API call.
+
+        Returns:
+            int : the number of texts in the body of the call, 1 for a prompt.
+        """
+        texts = call._body.get("texts") if call._body is not None else None
+        return max(len(texts), 1) if isinstance(texts, list) else 1
+
+    @staticmethod
+    def __process_response(
+        call: ModelAPI, response, deadline: Optional[Deadline] = None
+    ):
+        """Sets the result, or the error, of an API call from its response.
+
+        Args:
+            call: the API call.
+            response: the response of the API, None if the request failed.
+            deadline: optional, the deadline of the call, reported as error if it expired without a response.
+        """
+        if response is None:
+            if deadline is not None and deadline.expired():
+                call.error = deadline.exceeded(call.get_url())
+            return
+        call.parse_error_message(response, raise_exceptions=False)
+        if response.status_code == 200:
+            call.result = call._decode_response(response)
+
+    @staticmethod
+    def __process_async_result(call: ModelAPI, result):
+        """Sets the result, or the error, of an API call from the outcome of its
+        coroutine.
+
+        Args:
+            call: the API call.
+            result: the response of the API, or the exception raised by the request.
+        """
+        if isinstance(result, Exception):
+            oxapi.logger.warning(
+                "Request failed: {0}, ERROR: {1}".format(call.get_url(), result)
+            )
+            if isinstance(result, OxAPIError):
+                call.error = result
+            result = None
+        AsyncCallPipe.__process_response(call, result)
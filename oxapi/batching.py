@@ -0,0 +1,349 @@
+"""Module containing the utilities splitting large lists of texts into several
+calls to OxAPI."""
+import json
+import threading
+from typing import List, Optional, Tuple
+
+import oxapi
+
+
+class ChunkingPolicy:
+    """Policy splitting the texts of a call into chunks, sent as separate requests
+    running concurrently.
+
+    A chunk holds at most ``max_texts`` texts and at most ``max_bytes`` bytes of
+    JSON encoded texts; a single text larger than ``max_bytes`` is sent alone.
+    """
+
+    def __init__(
+        self,
+        max_texts: int = 1000,
+        max_bytes: int = 2 * 1024 * 1024,
+        max_concurrency: int = 4,
+    ):
+        """Constructor.
+
+        Args:
+            max_texts: maximum number of texts in a chunk.
+            max_bytes: maximum size in bytes of the JSON encoded texts of a chunk.
+            max_concurrency: maximum number of chunks of the same call sent at the same time.
+        """
+        if max_texts < 1:
+            raise ValueError("max_texts of a ChunkingPolicy must be at least 1")
+        if max_bytes < 1:
+            raise ValueError("max_bytes of a ChunkingPolicy must be at least 1")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency of a ChunkingPolicy must be at least 1")
+        self.max_texts = max_texts
+        self.max_bytes = max_bytes
+        self.max_concurrency = max_concurrency
+
+    def __repr__(self) -> str:
+        return "{0}(max_texts={1}, max_bytes={2}, max_concurrency={3})".format(
+            type(self).__name__, self.max_texts, self.max_bytes, self.max_concurrency
+        )
+
+    def get_concurrency_limit(self) -> int:
+        """Returns the maximum number of chunks ever sent at the same time.
+
+        Returns:
+            int : the limit of the concurrency.
+        """
+        return self.max_concurrency
+
+    def next_chunk(self, texts: List[str], start: int) -> int:
+        """Computes the end of the chunk starting at a given text.
+
+        Args:
+            texts: the texts.
+            start: the index of the first text of the chunk.
+
+        Returns:
+            int : the index (excluded) of the last text of the chunk.
+        """
+        max_texts = self.max_texts
+        max_bytes = self.max_bytes
+        size = 0
+        for i in range(start, len(texts)):
+            # JSON encoded text followed by a separator
+            size += len(json.dumps(texts[i]).encode("utf-8")) + 1
+            if i > start and (i - start >= max_texts or size > max_bytes):
+                return i
+        return len(texts)
+
+    def split(self, texts: List[str]) -> List[Tuple[int, int]]:
+        """Splits a list of texts into chunks.
+
+        Args:
+            texts: the texts.
+
+        Returns:
+            List[Tuple[int, int]] : the start (included) and end (excluded) index of each chunk, in order.
+        """
+        chunks = []
+        start = 0
+        while start < len(texts):
+            end = self.next_chunk(texts, start)
+            chunks.append((start, end))
+            start = end
+        return chunks
+
+    def record(self, texts: int, latency: float, response=None) -> bool:
+        """Records the outcome of a chunk, which is ignored by this policy.
+
+        Args:
+            texts: the number of texts of the chunk.
+            latency: the time in seconds taken by the chunk.
+            response: optional, the response of the API, None if the request failed without a response.
+
+        Returns:
+            bool : True if the chunk should be split again and resent.
+        """
+        return False
+
+
+class AdaptiveChunkingPolicy(ChunkingPolicy):
+    """Chunking policy tuning the size of the chunks and the number of chunks sent
+    at the same time from the outcome of the previous chunks, to converge to the
+    highest throughput.
+
+    Both values follow an additive increase, multiplicative decrease scheme:
+
+    - a chunk answered within ``target_latency`` increases the size of the chunks
+      by ``texts_step`` texts, and every ``max_concurrency`` such chunks in a row
+      increase the concurrency by one;
+    - a slower chunk decreases the size of the chunks by ``decrease_factor``;
+    - a chunk rejected as too large (413) decreases the size of the chunks and is
+      split again and resent;
+    - a chunk rejected because of the load of the API (429, 503) decreases the
+      concurrency;
+    - a chunk failing without response (e.g. a timeout) decreases both.
+
+    The current values are available as ``max_texts`` and ``max_concurrency``.
+    """
+
+    def __init__(
+        self,
+        max_texts: int = 100,
+        max_concurrency: int = 2,
+        max_bytes: int = 2 * 1024 * 1024,
+        min_texts: int = 1,
+        texts_limit: int = 2000,
+        concurrency_limit: int = 16,
+        texts_step: int = 50,
+        target_latency: float = 5.0,
+        decrease_factor: float = 0.5,
+    ):
+        """Constructor.
+
+        Args:
+            max_texts: initial maximum number of texts in a chunk.
+            max_concurrency: initial maximum number of chunks of the same call sent at the same time.
+            max_bytes: maximum size in bytes of the JSON encoded texts of a chunk.
+            min_texts: lower bound of the number of texts in a chunk.
+            texts_limit: upper bound of the number of texts in a chunk.
+            concurrency_limit: upper bound of the number of chunks sent at the same time.
+            texts_step: number of texts added to the chunks after a successful chunk.
+            target_latency: latency in seconds above which the chunks are considered too large.
+            decrease_factor: factor applied to the values when they are decreased, between 0 and 1.
+        """
+        super().__init__(
+            max_texts=max_texts, max_bytes=max_bytes, max_concurrency=max_concurrency
+        )
+        if not 0 < decrease_factor < 1:
+            raise ValueError(
+                "decrease_factor of an AdaptiveChunkingPolicy must be between 0 and 1"
+            )
+        self.min_texts = min_texts
+        self.texts_limit = texts_limit
+        self.concurrency_limit = concurrency_limit
+        self.texts_step = texts_step
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self._successes = 0
+        self._lock = threading.Lock()
+
+    def get_concurrency_limit(self) -> int:
+        """Returns the maximum number of chunks ever sent at the same time.
+
+        Returns:
+            int : the limit of the concurrency.
+        """
+        return self.concurrency_limit
+
+    def get_values(self) -> dict:
+        """Returns the values currently chosen by the policy.
+
+        Returns:
+            dict : the maximum number of texts in a chunk and the maximum number of chunks sent at the same time.
+        """
+        with self._lock:
+            return {
+                "max_texts": self.max_texts,
+                "max_concurrency": self.max_concurrency,
+            }
+
+    def record(self, texts: int, latency: float, response=None) -> bool:
+        """Adapts the size of the chunks and the concurrency to the outcome of a
+        chunk.
+
+        Args:
+            texts: the number of texts of the chunk.
+            latency: the time in seconds taken by the chunk.
+            response: optional, the response of the API, None if the request failed without a response.
+
+        Returns:
+            bool : True if the chunk was too large and should be split again and resent.
+        """
+        with self._lock:
+            status_code = response.status_code if response is not None else None
+            resend = False
+            if status_code is None:
+                self._decrease_texts(self.max_texts)
+                self._decrease_concurrency()
+            elif status_code == 413:
+                self._decrease_texts(texts)
+                resend = texts > 1
+            elif status_code in (429, 503):
+                self._decrease_concurrency()
+            elif status_code == 200:
+                if latency > self.target_latency:
+                    self._decrease_texts(self.max_texts)
+                else:
+                    if texts >= self.max_texts:
+                        self.max_texts = min(
+                            self.max_texts + self.texts_step, self.texts_limit
+                        )
+                    self._successes += 1
+                    if self._successes >= self.max_concurrency:
+                        self.max_concurrency = min(
+                            self.max_concurrency + 1, self.concurrency_limit
+                        )
+                        self._successes = 0
+            values = (self.max_texts, self.max_concurrency)
+        oxapi.logger.debug(
+            "Chunk of {0} texts in {1:.3f}s (status code {2}): max_texts={3}, max_concurrency={4}".format(
+                texts, latency, status_code, *values
+            )
+        )
+        return resend
+
+    def _decrease_texts(self, texts: int):
+        """Decreases the size of the chunks. To be called holding the lock.
+
+        Args:
+            texts: the size of the chunks to be decreased.
+        """
+        self.max_texts = max(
+            int(min(texts, self.max_texts) * self.decrease_factor), self.min_texts
+        )
+        self._successes = 0
+
+    def _decrease_concurrency(self):
+        """Decreases the number of chunks sent at the same time. To be called
+        holding the lock."""
+        self.max_concurrency = max(int(self.max_concurrency * self.decrease_factor), 1)
+        self._successes = 0
+
+
+class ChunkQueue:
+    """Queue of the chunks of a list of texts, cut lazily so that every chunk
+    follows the limits of its policy at the time it is sent."""
+
+    def __init__(self, policy: ChunkingPolicy, texts: List[str]):
+        """Constructor.
+
+        Args:
+            policy: the chunking policy.
+            texts: the texts.
+        """
+        self.policy = policy
+        self.texts = texts
+        self._position = 0
+        self._requeued: List[Tuple[int, int]] = []
+
+    def next(self) -> Optional[Tuple[int, int]]:
+        """Cuts the next chunk to be sent, requeued chunks first.
+
+        Returns:
+            Optional[Tuple[int, int]] : the start (included) and end (excluded) index of the chunk, None if no chunk is left.
+        """
+        if self._requeued:
+            start, end = self._requeued.pop()
+            split = min(self.policy.next_chunk(self.texts, start), end)
+            if split < end:
+                self._requeued.append((split, end))
+            return start, split
+        if self._position >= len(self.texts):
+            return None
+        start = self._position
+        self._position = self.policy.next_chunk(self.texts, start)
+        return start, self._position
+
+    def requeue(self, start: int, end: int):
+        """Puts back a chunk to be split again and resent.
+
+        Args:
+            start: the index of the first text of the chunk.
+            end: the index (excluded) of the last text of the chunk.
+        """
+        self._requeued.append((start, end))
+
+
+def merge_results(results: List[dict]) -> dict:
+    """Merges the results of the chunks of a call into a single result.
+
+    Args:
+        results: the results of the chunks, in order.
+
+    Returns:
+        dict : the result, with the results of all the chunks concatenated.
+    """
+    merged = dict(results[0])
+    parts = [result["results"] for result in results]
+    if all(hasattr(part, "shape") for part in parts):
+        # matrices decoded from a binary wire format
+        import numpy as np
+
+        merged["results"] = np.concatenate(parts)
+        return merged
+    merged["results"] = [element for part in parts for element in part]
+    return merged
+
+
+def deduplicate(texts: List[str]) -> Tuple[List[str], Optional[List[int]]]:
+    """Removes the repeated texts of a list.
+
+    Args:
+        texts: the texts.
+
+    Returns:
+        Tuple[List[str], Optional[List[int]]] : the unique texts in order of first occurrence, and for each text the
+        index of its unique text; None instead of the indices if the texts are already unique or cannot be compared.
+    """
+    indices = {}
+    try:
+        positions = [indices.setdefault(text, len(indices)) for text in texts]
+    except TypeError:
+        # unhashable texts, e.g. dialogs given as lists
+        return texts, None
+    if len(indices) == len(texts):
+        return texts, None
+    return list(indices), positions
+
+
+def expand_results(result: dict, positions: List[int]) -> dict:
+    """Fans the results of the unique texts of a call back out to all the texts.
+
+    Args:
+        result: the result of the call with the unique texts.
+        positions: for each text, the index of its unique text.
+
+    Returns:
+        dict : the result, with one element for each text.
+    """
+    results = result["results"]
+    if hasattr(results, "shape"):
+        # matrix decoded from a binary wire format
+        return dict(result, results=results[positions])
+    return dict(result, results=[results[position] for position in positions])
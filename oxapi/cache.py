@@ -0,0 +1,923 @@
+"""Module containing the caches avoiding repeated calls to OxAPI for the same
+inputs."""
+import contextlib
+import hashlib
+import json
+import mmap
+import os
+import re
+import sqlite3
+import struct
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+import oxapi
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class EmbeddingCache:
+    """Least recently used cache of the embeddings of single texts, bounded by the
+    size in bytes of the stored vectors.
+
+    An embedding is identified by the model, the version of the model, the version
+    of the API and the SHA-256 digest of its text; it is stored as a float32 vector.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        """Constructor.
+
+        Args:
+            max_bytes: maximum size in bytes of the stored vectors.
+        """
+        if max_bytes < 1:
+            raise ValueError("max_bytes of an EmbeddingCache must be at least 1")
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return "EmbeddingCache(max_bytes={0}, size={1}, entries={2}, hits={3}, misses={4})".format(
+            self.max_bytes, self.size, len(self), self.hits, self.misses
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def get_key(model: str, version: str, api_version: str, text: str) -> tuple:
+        """Builds the key of the embedding of a text.
+
+        Args:
+            model: the name of the model.
+            version: the version of the model.
+            api_version: the version of the API.
+            text: the text.
+
+        Returns:
+            tuple : the key.
+        """
+        return (
+            model,
+            version,
+            api_version,
+            hashlib.sha256(text.encode("utf-8")).digest(),
+        )
+
+    def get(self, key: tuple) -> Optional["np.ndarray"]:
+        """Looks up an embedding, marking it as recently used.
+
+        Args:
+            key: the key of the embedding.
+
+        Returns:
+            Optional[numpy.ndarray] : the float32 vector, None if it is not cached.
+        """
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def get_many(self, keys: Sequence[tuple]) -> List[Optional["np.ndarray"]]:
+        """Looks up several embeddings.
+
+        Args:
+            keys: the keys of the embeddings.
+
+        Returns:
+            List[Optional[numpy.ndarray]] : for each key, the float32 vector, None if it is not cached.
+        """
+        return [self.get(key) for key in keys]
+
+    def put(self, key: tuple, embedding: Sequence[float]):
+        """Stores an embedding, evicting the least recently used ones if the cache
+        is full.
+
+        Args:
+            key: the key of the embedding.
+            embedding: the embedding.
+        """
+        import numpy as np
+
+        # copied, so that a view never keeps a whole response alive
+        vector = np.array(embedding, dtype=np.float32)
+        if vector.nbytes > self.max_bytes:
+            return
+        vector.setflags(write=False)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous.nbytes
+            self._entries[key] = vector
+            self.size += vector.nbytes
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.nbytes
+                self.evictions += 1
+
+    def put_many(self, keys: Sequence[tuple], embeddings: Sequence[Sequence[float]]):
+        """Stores several embeddings.
+
+        Args:
+            keys: the keys of the embeddings.
+            embeddings: the embeddings.
+        """
+        for key, embedding in zip(keys, embeddings):
+            self.put(key, embedding)
+
+    def clear(self):
+        """Removes all the embeddings and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+class DiskEmbeddingStore:
+    """Embedding cache persisted in a directory, shared by all the processes of a
+    host.
+
+    The float32 vectors are appended to a data file, memory-mapped by the readers,
+    which get zero-copy read-only views on it; an append-only index file maps the
+    digest of each key to the position of its vector. Writers hold an exclusive
+    lock on the directory while readers hold a shared one, so that readers never
+    observe a partially written or compacted store.
+
+    When the data file would exceed ``max_bytes``, the store is compacted: only the
+    most recently written embeddings, up to ``compact_ratio`` times ``max_bytes``,
+    are kept. Views obtained before a compaction remain valid.
+
+    Requires a POSIX platform (``fcntl`` locks).
+    """
+
+    # digest of the key, offset of the vector in floats, length of the vector
+    _RECORD = struct.Struct("<32sQI")
+    _VECTORS = "vectors.f32"
+    _INDEX = "index"
+    _LOCK = "lock"
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 1024 * 1024 * 1024,
+        compact_ratio: float = 0.5,
+    ):
+        """Constructor.
+
+        Args:
+            path: the directory of the store, created if needed.
+            max_bytes: maximum size in bytes of the data file.
+            compact_ratio: share of max_bytes kept by a compaction, between 0 and 1.
+        """
+        if os.name != "posix":
+            raise OSError("DiskEmbeddingStore requires a POSIX platform")
+        if max_bytes < 1:
+            raise ValueError("max_bytes of a DiskEmbeddingStore must be at least 1")
+        if not 0 < compact_ratio <= 1:
+            raise ValueError(
+                "compact_ratio of a DiskEmbeddingStore must be between 0 and 1"
+            )
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.compact_ratio = compact_ratio
+        self.hits = 0
+        self.misses = 0
+        self.compactions = 0
+        self._index: Dict[bytes, Tuple[int, int]] = {}
+        self._generation = None
+        self._position = 0
+        self._map = None
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return "DiskEmbeddingStore(path={0!r}, max_bytes={1}, size={2}, entries={3}, hits={4}, misses={5})".format(
+            self.path, self.max_bytes, self.size, len(self), self.hits, self.misses
+        )
+
+    def __len__(self) -> int:
+        with self._lock, self._locked(exclusive=False):
+            self._refresh()
+            return len(self._index)
+
+    @property
+    def size(self) -> int:
+        """Size in bytes of the data file."""
+        try:
+            return os.path.getsize(self._get_path(self._VECTORS))
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def get_key(model: str, version: str, api_version: str, text: str) -> bytes:
+        """Builds the key of the embedding of a text.
+
+        Args:
+            model: the name of the model.
+            version: the version of the model.
+            api_version: the version of the API.
+            text: the text.
+
+        Returns:
+            bytes : the SHA-256 digest of the model, the versions and the text.
+        """
+        digest = hashlib.sha256()
+        for part in (model, version, api_version):
+            digest.update(str(part).encode("utf-8") + b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.digest()
+
+    def get(self, key: bytes) -> Optional["np.ndarray"]:
+        """Looks up an embedding.
+
+        Args:
+            key: the key of the embedding.
+
+        Returns:
+            Optional[numpy.ndarray] : a read-only float32 view of the vector, None if it is not stored.
+        """
+        return self.get_many([key])[0]
+
+    def get_many(self, keys: Sequence[bytes]) -> List[Optional["np.ndarray"]]:
+        """Looks up several embeddings.
+
+        Args:
+            keys: the keys of the embeddings.
+
+        Returns:
+            List[Optional[numpy.ndarray]] : for each key, a read-only float32 view of the vector, None if it is not
+            stored.
+        """
+        import numpy as np
+
+        with self._lock, self._locked(exclusive=False):
+            self._refresh()
+            vectors = []
+            for key in keys:
+                entry = self._index.get(key)
+                if entry is None:
+                    self.misses += 1
+                    vectors.append(None)
+                    continue
+                self.hits += 1
+                offset, length = entry
+                vectors.append(
+                    np.frombuffer(
+                        self._get_map(offset + length),
+                        dtype=np.float32,
+                        count=length,
+                        offset=offset * 4,
+                    )
+                )
+            return vectors
+
+    def put(self, key: bytes, embedding: Sequence[float]):
+        """Stores an embedding.
+
+        Args:
+            key: the key of the embedding.
+            embedding: the embedding.
+        """
+        self.put_many([key], [embedding])
+
+    def put_many(self, keys: Sequence[bytes], embeddings: Sequence[Sequence[float]]):
+        """Stores several embeddings, compacting the store if it would exceed its
+        maximum size.
+
+        Args:
+            keys: the keys of the embeddings.
+            embeddings: the embeddings.
+        """
+        import numpy as np
+
+        with self._lock, self._locked(exclusive=True):
+            self._refresh()
+            entries = {}
+            for key, embedding in zip(keys, embeddings):
+                if len(key) != 32:
+                    raise ValueError(
+                        "The keys of a DiskEmbeddingStore must be built by get_key"
+                    )
+                vector = np.asarray(embedding, dtype=np.float32)
+                if key not in self._index and vector.nbytes <= self.max_bytes:
+                    entries[key] = vector
+            if not entries:
+                return
+            added = sum(vector.nbytes for vector in entries.values())
+            if self.size + added > self.max_bytes:
+                self._compact(max(int(self.max_bytes * self.compact_ratio) - added, 0))
+            self._append(entries)
+            self._refresh()
+
+    def compact(self):
+        """Rewrites the store without the space lost by the embeddings written more
+        than once or by interrupted writes."""
+        with self._lock, self._locked(exclusive=True):
+            self._refresh()
+            self._compact(self.max_bytes)
+            self._refresh()
+
+    def clear(self):
+        """Removes all the embeddings and resets the counters."""
+        with self._lock, self._locked(exclusive=True):
+            for name in (self._INDEX, self._VECTORS):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(self._get_path(name))
+            self._reset()
+            self.hits = 0
+            self.misses = 0
+            self.compactions = 0
+
+    def _get_path(self, name: str) -> str:
+        """Returns the path of a file of the store.
+
+        Args:
+            name: the name of the file.
+
+        Returns:
+            str : the path.
+        """
+        return os.path.join(self.path, name)
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive: bool):
+        """Context manager holding the lock of the store, shared by all the
+        processes.
+
+        Args:
+            exclusive: True to write, False to read.
+        """
+        import fcntl
+
+        with open(self._get_path(self._LOCK), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _reset(self):
+        """Forgets the index and the mapping of the data file. To be called holding
+        the locks."""
+        self._index = {}
+        self._generation = None
+        self._position = 0
+        # the views already returned keep the previous mapping alive
+        self._map = None
+
+    def _refresh(self):
+        """Reads the records added to the index since the last refresh, starting
+        over if the store has been compacted or cleared. To be called holding the
+        locks."""
+        record = self._RECORD.size
+        try:
+            with open(self._get_path(self._INDEX), "rb") as index:
+                header = index.read(record)
+                if len(header) < record:
+                    self._reset()
+                    return
+                if header != self._generation:
+                    self._reset()
+                    self._generation = header
+                    self._position = record
+                index.seek(self._position)
+                data = index.read()
+        except FileNotFoundError:
+            self._reset()
+            return
+        data = data[: len(data) - len(data) % record]
+        for digest, offset, length in self._RECORD.iter_unpack(data):
+            self._index[digest] = (offset, length)
+        self._position += len(data)
+
+    def _get_map(self, end: int) -> mmap.mmap:
+        """Returns the mapping of the data file, mapping it again if it does not
+        cover a given position. To be called holding the locks.
+
+        Args:
+            end: the position in floats that must be covered.
+
+        Returns:
+            mmap.mmap : the read-only mapping.
+        """
+        if self._map is None or len(self._map) < end * 4:
+            with open(self._get_path(self._VECTORS), "rb") as vectors:
+                self._map = mmap.mmap(vectors.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def _append(self, entries: Dict[bytes, "np.ndarray"]):
+        """Appends embeddings to the data file, then their records to the index. To
+        be called holding the locks.
+
+        Args:
+            entries: the vectors, by key.
+        """
+        record = self._RECORD.size
+        with open(self._get_path(self._VECTORS), "ab") as vectors:
+            # realigned after an interrupted write
+            offset = -(-vectors.tell() // 4)
+            vectors.write(b"\0" * (offset * 4 - vectors.tell()))
+            records = []
+            for key, vector in entries.items():
+                vectors.write(vector.tobytes())
+                records.append(self._RECORD.pack(key, offset, len(vector)))
+                offset += len(vector)
+        with open(self._get_path(self._INDEX), "ab") as index:
+            position = index.tell()
+            if position < record:
+                index.truncate(0)
+                index.write(self._new_header())
+            elif position % record:
+                # drops an interrupted record
+                index.truncate(position - position % record)
+            index.write(b"".join(records))
+
+    def _compact(self, max_bytes: int):
+        """Rewrites the store keeping only the most recently written embeddings. To
+        be called holding the locks.
+
+        Args:
+            max_bytes: maximum size in bytes of the kept embeddings.
+        """
+        import numpy as np
+
+        entries = sorted(self._index.items(), key=lambda item: item[1][0])
+        kept = []
+        size = 0
+        for key, (offset, length) in reversed(entries):
+            if size + length * 4 > max_bytes:
+                break
+            kept.append((key, offset, length))
+            size += length * 4
+        kept.reverse()
+        records = [self._new_header()]
+        vectors_path = self._get_path(self._VECTORS)
+        with open(vectors_path + ".tmp", "wb") as vectors:
+            offset = 0
+            for key, previous, length in kept:
+                vector = np.frombuffer(
+                    self._get_map(previous + length),
+                    dtype=np.float32,
+                    count=length,
+                    offset=previous * 4,
+                )
+                vectors.write(vector.tobytes())
+                records.append(self._RECORD.pack(key, offset, length))
+                offset += length
+        index_path = self._get_path(self._INDEX)
+        with open(index_path + ".tmp", "wb") as index:
+            index.write(b"".join(records))
+        os.replace(vectors_path + ".tmp", vectors_path)
+        os.replace(index_path + ".tmp", index_path)
+        self._reset()
+        self.compactions += 1
+        oxapi.logger.info(
+            "Compacted the embedding store {0}: {1} embeddings kept out of {2}".format(
+                self.path, len(kept), len(entries)
+            )
+        )
+
+    def _new_header(self) -> bytes:
+        """Builds the first record of a new index, identifying its generation.
+
+        Returns:
+            bytes : the header record.
+        """
+        return self._RECORD.pack(uuid.uuid4().bytes * 2, 0, 0)
+
+
+class MemoryResultBackend:
+    """Storage of a ResultCache in the memory of the process, evicting the least
+    recently used results beyond ``max_entries``."""
+
+    def __init__(self, max_entries: int = 100000):
+        """Constructor.
+
+        Args:
+            max_entries: maximum number of stored results.
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries of a MemoryResultBackend must be at least 1")
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_many(self, keys: Sequence[tuple]) -> List[Optional[Tuple[Any, float]]]:
+        """Looks up several results.
+
+        Args:
+            keys: the keys of the results.
+
+        Returns:
+            List[Optional[Tuple[Any, float]]] : for each key, the result and its expiry time (None if it never
+            expires), None if it is not stored.
+        """
+        with self._lock:
+            entries = []
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                entries.append(entry)
+            return entries
+
+    def set_many(
+        self, keys: Sequence[tuple], values: Sequence[Any], expires_at: Optional[float]
+    ):
+        """Stores several results.
+
+        Args:
+            keys: the keys of the results.
+            values: the results.
+            expires_at: the expiry time of the results, None if they never expire.
+        """
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._entries[key] = (value, expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete_many(self, keys: Sequence[tuple]):
+        """Removes several results.
+
+        Args:
+            keys: the keys of the results.
+        """
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def invalidate(self, model: str, api_version: str, version: str):
+        """Removes the results of a model computed by versions other than a given
+        one.
+
+        Args:
+            model: the name of the model.
+            api_version: the version of the API.
+            version: the version of the model whose results are kept.
+        """
+        with self._lock:
+            for key in list(self._entries):
+                if key[0] == model and key[2] == api_version and key[1] != version:
+                    del self._entries[key]
+
+    def clear(self):
+        """Removes all the results."""
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteResultBackend:
+    """Storage of a ResultCache in a SQLite database, persisted across restarts and
+    shared by the processes of a host."""
+
+    def __init__(self, path: str):
+        """Constructor.
+
+        Args:
+            path: the path of the database file, created if needed.
+        """
+        self.path = path
+        self._connection = sqlite3.connect(
+            path, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "model TEXT, version TEXT, api_version TEXT, digest TEXT, "
+                "value TEXT, expires_at REAL, "
+                "PRIMARY KEY (model, version, api_version, digest))"
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[
+                0
+            ]
+
+    def get_many(self, keys: Sequence[tuple]) -> List[Optional[Tuple[Any, float]]]:
+        """Looks up several results.
+
+        Args:
+            keys: the keys of the results.
+
+        Returns:
+            List[Optional[Tuple[Any, float]]] : for each key, the result and its expiry time (None if it never
+            expires), None if it is not stored.
+        """
+        with self._lock:
+            entries = []
+            for key in keys:
+                row = self._connection.execute(
+                    "SELECT value, expires_at FROM results "
+                    "WHERE model = ? AND version = ? AND api_version = ? AND digest = ?",
+                    key,
+                ).fetchone()
+                entries.append(None if row is None else (json.loads(row[0]), row[1]))
+            return entries
+
+    def set_many(
+        self, keys: Sequence[tuple], values: Sequence[Any], expires_at: Optional[float]
+    ):
+        """Stores several results.
+
+        Args:
+            keys: the keys of the results.
+            values: the results.
+            expires_at: the expiry time of the results, None if they never expire.
+        """
+        with self._lock:
+            with self._transaction():
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        key + (json.dumps(value), expires_at)
+                        for key, value in zip(keys, values)
+                    ],
+                )
+
+    def delete_many(self, keys: Sequence[tuple]):
+        """Removes several results.
+
+        Args:
+            keys: the keys of the results.
+        """
+        with self._lock:
+            with self._transaction():
+                self._connection.executemany(
+                    "DELETE FROM results "
+                    "WHERE model = ? AND version = ? AND api_version = ? AND digest = ?",
+                    keys,
+                )
+
+    def invalidate(self, model: str, api_version: str, version: str):
+        """Removes the results of a model computed by versions other than a given
+        one.
+
+        Args:
+            model: the name of the model.
+            api_version: the version of the API.
+            version: the version of the model whose results are kept.
+        """
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM results WHERE model = ? AND api_version = ? AND version != ?",
+                (model, api_version, version),
+            )
+
+    def clear(self):
+        """Removes all the results."""
+        with self._lock:
+            self._connection.execute("DELETE FROM results")
+
+    def close(self):
+        """Closes the database."""
+        with self._lock:
+            self._connection.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Context manager running statements in a single transaction. To be called
+        holding the lock."""
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+
+class ResultCache:
+    """Cache of the results of single texts, for the models whose result for a text
+    does not depend on the other texts of the call (e.g. classification or
+    transformation of single utterances).
+
+    A result is identified by the model, the version of the model, the version of
+    the API and the SHA-256 digest of its text, and expires ``ttl`` seconds after
+    being stored. Once a newer version of a model is called (e.g. 'v2' after 'v1'),
+    the results of its previous versions are removed; the calls pinning an older
+    version do not remove the results of the newer ones.
+
+    The results are stored by a backend, in memory by default, or in a SQLite
+    database with SQLiteResultBackend.
+    """
+
+    def __init__(self, backend=None, ttl: Optional[float] = 24 * 3600):
+        """Constructor.
+
+        Args:
+            backend: optional, the storage of the results; a MemoryResultBackend if None.
+            ttl: time to live of the results in seconds, None for no expiry.
+        """
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl of a ResultCache must be positive")
+        self.backend = backend if backend is not None else MemoryResultBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._versions: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return "ResultCache(backend={0}, ttl={1}, hits={2}, misses={3})".format(
+            type(self.backend).__name__, self.ttl, self.hits, self.misses
+        )
+
+    def get_key(self, model: str, version: str, api_version: str, text: str) -> tuple:
+        """Builds the key of the result of a text, invalidating the results of the
+        previous versions of the model the first time a newer version is seen.
+
+        Args:
+            model: the name of the model.
+            version: the version of the model.
+            api_version: the version of the API.
+            text: the text.
+
+        Returns:
+            tuple : the key.
+        """
+        with self._lock:
+            latest = self._versions.get((model, api_version))
+            newer = ResultCache._is_newer(version, latest)
+            if newer:
+                self._versions[(model, api_version)] = version
+        if newer and latest is not None:
+            self.backend.invalidate(model, api_version, version)
+        return (
+            model,
+            version,
+            api_version,
+            hashlib.sha256(text.encode("utf-8")).hexdigest(),
+        )
+
+    @staticmethod
+    def _is_newer(version: str, latest: Optional[str]) -> bool:
+        """Checks if a version of a model is newer than the latest one seen, comparing
+        their numbers (e.g. 'v10' is newer than 'v9').
+
+        Args:
+            version: the version of the model.
+            latest: the latest version seen, None if none was seen.
+
+        Returns:
+            bool : True if the version is newer, False if it is not or if the versions cannot be compared.
+        """
+        numbers = tuple(int(number) for number in re.findall(r"\d+", version or ""))
+        if not numbers:
+            return False
+        if latest is None:
+            return True
+        return numbers > tuple(int(number) for number in re.findall(r"\d+", latest))
+
+    def get_many(self, keys: Sequence[tuple]) -> List[Optional[Any]]:
+        """Looks up several results, removing the expired ones.
+
+        Args:
+            keys: the keys of the results.
+
+        Returns:
+            List[Optional[Any]] : for each key, the result, None if it is not cached or has expired.
+        """
+        now = time.time()
+        values = []
+        expired = []
+        for key, entry in zip(keys, self.backend.get_many(keys)):
+            if entry is not None and entry[1] is not None and entry[1] <= now:
+                expired.append(key)
+                entry = None
+            values.append(None if entry is None else entry[0])
+        if expired:
+            self.backend.delete_many(expired)
+        with self._lock:
+            hits = sum(value is not None for value in values)
+            self.hits += hits
+            self.misses += len(values) - hits
+        return values
+
+    def put_many(self, keys: Sequence[tuple], results: Sequence[Any]):
+        """Stores several results.
+
+        Args:
+            keys: the keys of the results.
+            results: the results.
+        """
+        if keys:
+            expires_at = None if self.ttl is None else time.time() + self.ttl
+            self.backend.set_many(keys, results, expires_at)
+
+    def clear(self):
+        """Removes all the results and resets the counters."""
+        self.backend.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self._versions.clear()
+
+
+class CompletionCache(ResultCache):
+    """Cache of the results of Completion calls, restricted to the deterministic
+    ones.
+
+    A result is identified by the model, the version of the model, the version of
+    the API and the digest of the canonical JSON encoding of the body, i.e. of the
+    prompt and of all the generation parameters. Since a sampled completion differs
+    from one call to another, only the calls explicitly disabling sampling
+    (``do_sample=False``, i.e. greedy or beam search decoding) are cached; the
+    other ones are counted as ``refused``.
+    """
+
+    def __init__(self, backend=None, ttl: Optional[float] = None):
+        """Constructor.
+
+        Args:
+            backend: optional, the storage of the results; a MemoryResultBackend if None.
+            ttl: time to live of the results in seconds, None for no expiry.
+        """
+        super().__init__(backend=backend, ttl=ttl)
+        self.refused = 0
+
+    def __repr__(self) -> str:
+        return "CompletionCache(backend={0}, ttl={1}, hits={2}, misses={3}, refused={4})".format(
+            type(self.backend).__name__, self.ttl, self.hits, self.misses, self.refused
+        )
+
+    def accepts(self, body: dict) -> bool:
+        """Checks whether the result of a call can be cached.
+
+        Args:
+            body: the body of the call.
+
+        Returns:
+            bool : True if the call disables sampling.
+        """
+        deterministic = body is not None and body.get("do_sample", True) is False
+        if not deterministic:
+            with self._lock:
+                self.refused += 1
+        return deterministic
+
+    def get_key(self, model: str, version: str, api_version: str, body: dict) -> tuple:
+        """Builds the key of the result of a call, invalidating the results of the
+        other versions of the model the first time a version is seen.
+
+        Args:
+            model: the name of the model.
+            version: the version of the model.
+            api_version: the version of the API.
+            body: the body of the call.
+
+        Returns:
+            tuple : the key.
+        """
+        encoded = json.dumps(
+            _canonicalize(body),
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+        )
+        return super().get_key(model, version, api_version, encoded)
+
+    def clear(self):
+        """Removes all the results and resets the counters."""
+        super().clear()
+        with self._lock:
+            self.refused = 0
+
+
+def _canonicalize(value):
+    """Normalizes a JSON value so that equivalent values have the same encoding.
+
+    Args:
+        value: the value.
+
+    Returns:
+        the value, with integral floats converted to integers and tuples to lists.
+    """
+    if isinstance(value, dict):
+        return {str(key): _canonicalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonicalize(item) for item in value]
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
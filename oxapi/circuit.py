@@ -0,0 +1,227 @@
+"""Module containing the circuit breaker protecting the calls to OxAPI endpoints
+that are down."""
+import threading
+import time
+from typing import Dict
+
+import oxapi
+from oxapi.error import CircuitOpenException
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class _Circuit:
+    """State of the circuit of a single endpoint."""
+
+    def __init__(self):
+        """Constructor."""
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probes = 0
+
+
+class CircuitBreaker:
+    """Circuit breaker keeping a separate circuit for every endpoint url (i.e. for
+    every model and version).
+
+    A circuit opens after ``failure_threshold`` consecutive failures of its
+    endpoint: the following calls fail immediately with CircuitOpenException,
+    without waiting for a round-trip. After ``recovery_timeout`` seconds the
+    circuit becomes half-open and lets ``half_open_max_calls`` probe calls through:
+    a successful probe closes the circuit, a failed one opens it again.
+
+    A call fails when the request gets no response or a server error (5xx).
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        """Constructor.
+
+        Args:
+            failure_threshold: number of consecutive failures opening the circuit of an endpoint.
+            recovery_timeout: time in seconds after which an open circuit lets probe calls through.
+            half_open_max_calls: maximum number of probe calls running at the same time on a half-open circuit.
+        """
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold of a CircuitBreaker must be at least 1")
+        if half_open_max_calls < 1:
+            raise ValueError(
+                "half_open_max_calls of a CircuitBreaker must be at least 1"
+            )
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._circuits: Dict[str, _Circuit] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return "CircuitBreaker(failure_threshold={0}, recovery_timeout={1}, states={2})".format(
+            self.failure_threshold, self.recovery_timeout, self.get_states()
+        )
+
+    def before_call(self, url: str):
+        """Checks whether a call to an endpoint may be performed, raising an
+        exception if its circuit is open.
+
+        Args:
+            url: the url of the endpoint.
+        """
+        with self._lock:
+            circuit = self._get_circuit(url)
+            self._update(circuit)
+            if circuit.state == CLOSED:
+                return
+            if circuit.state == HALF_OPEN and circuit.probes < self.half_open_max_calls:
+                circuit.probes += 1
+                return
+            retry_in = max(
+                circuit.opened_at + self.recovery_timeout - time.monotonic(), 0.0
+            )
+        raise CircuitOpenException(
+            message="Circuit {0} for {1}: failing fast, next probe in {2:.1f}s".format(
+                circuit.state, url, retry_in
+            )
+        )
+
+    def record(self, url: str, response=None):
+        """Records the outcome of a call to an endpoint.
+
+        Args:
+            url: the url of the endpoint.
+            response: optional, the response of the API, None if the request failed without a response.
+        """
+        if response is None or response.status_code >= 500:
+            self.record_failure(url)
+        else:
+            self.record_success(url)
+
+    def release(self, url: str):
+        """Releases the probe slot taken by a call that ended without an outcome,
+        e.g. a cancelled call, so that the next call can probe the endpoint.
+
+        Args:
+            url: the url of the endpoint.
+        """
+        with self._lock:
+            circuit = self._circuits.get(url)
+            if (
+                circuit is not None
+                and circuit.state == HALF_OPEN
+                and circuit.probes > 0
+            ):
+                circuit.probes -= 1
+
+    def record_success(self, url: str):
+        """Records a successful call, closing the circuit of its endpoint.
+
+        Args:
+            url: the url of the endpoint.
+        """
+        with self._lock:
+            circuit = self._get_circuit(url)
+            circuit.state = CLOSED
+            circuit.failures = 0
+            circuit.opened_at = None
+            circuit.probes = 0
+
+    def record_failure(self, url: str):
+        """Records a failed call, opening the circuit of its endpoint if the
+        failure threshold is reached or if the call was a probe.
+
+        Args:
+            url: the url of the endpoint.
+        """
+        with self._lock:
+            circuit = self._get_circuit(url)
+            circuit.failures += 1
+            failures = circuit.failures
+            opened = circuit.state == HALF_OPEN or (
+                circuit.state == CLOSED and failures >= self.failure_threshold
+            )
+            if opened:
+                circuit.state = OPEN
+                circuit.opened_at = time.monotonic()
+                circuit.probes = 0
+        if opened:
+            oxapi.logger.warning(
+                "Circuit opened for {0} after {1} consecutive failures".format(
+                    url, failures
+                )
+            )
+
+    def get_state(self, url: str) -> str:
+        """Returns the state of the circuit of an endpoint.
+
+        Args:
+            url: the url of the endpoint.
+
+        Returns:
+            str : 'closed', 'open' or 'half-open'.
+        """
+        with self._lock:
+            circuit = self._circuits.get(url)
+            if circuit is None:
+                return CLOSED
+            self._update(circuit)
+            return circuit.state
+
+    def get_states(self) -> Dict[str, dict]:
+        """Returns the state of all the circuits.
+
+        Returns:
+            Dict[str, dict] : for each endpoint url, the state of its circuit and its consecutive failures.
+        """
+        with self._lock:
+            states = {}
+            for url, circuit in self._circuits.items():
+                self._update(circuit)
+                states[url] = {"state": circuit.state, "failures": circuit.failures}
+            return states
+
+    def reset(self, url: str = None):
+        """Closes the circuit of an endpoint, or all of them.
+
+        Args:
+            url: optional, the url of the endpoint; all the circuits are closed if None.
+        """
+        with self._lock:
+            if url is None:
+                self._circuits.clear()
+            else:
+                self._circuits.pop(url, None)
+
+    def _get_circuit(self, url: str) -> _Circuit:
+        """Returns the circuit of an endpoint, created at first use. To be called
+        holding the lock.
+
+        Args:
+            url: the url of the endpoint.
+
+        Returns:
+            _Circuit : the circuit.
+        """
+        circuit = self._circuits.get(url)
+        if circuit is None:
+            circuit = self._circuits[url] = _Circuit()
+        return circuit
+
+    def _update(self, circuit: _Circuit):
+        """Moves an open circuit to half-open once the recovery timeout has
+        elapsed. To be called holding the lock.
+
+        Args:
+            circuit: the circuit.
+        """
+        if (
+            circuit.state == OPEN
+            and time.monotonic() - circuit.opened_at >= self.recovery_timeout
+        ):
+            circuit.state = HALF_OPEN
+            circuit.probes = 0
@@ -0,0 +1,1006 @@
+"""Module containing the HTTP clients used to perform the calls to OxAPI."""
+
+import asyncio
+import gzip
+import json
+import socket
+import threading
+import time
+from concurrent import futures
+from typing import Callable, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import oxapi
+from oxapi.circuit import CircuitBreaker
+from oxapi.deadline import Deadline
+from oxapi.endpoints import report_response, reroute
+from oxapi.hedging import HedgingPolicy
+from oxapi.retry import RetryPolicy
+
+
+class TransferStats:
+    """Counters of the bytes exchanged with OxAPI."""
+
+    def __init__(self):
+        """Constructor."""
+        self._lock = threading.Lock()
+        self.reset()
+
+    def __repr__(self) -> str:
+        return "TransferStats({0})".format(self.as_dict())
+
+    def reset(self):
+        """Sets all the counters to zero."""
+        with self._lock:
+            self.requests = 0
+            self.bytes_sent = 0
+            self.bytes_sent_uncompressed = 0
+            self.responses = 0
+            self.bytes_received = 0
+            self.bytes_received_uncompressed = 0
+
+    def record_request(self, uncompressed_size: int, size: int):
+        """Counts a request.
+
+        Args:
+            uncompressed_size: size in bytes of the JSON body.
+            size: size in bytes of the body actually sent.
+        """
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += size
+            self.bytes_sent_uncompressed += uncompressed_size
+
+    def record_response(self, response):
+        """Counts a response.
+
+        Args:
+            response: the response of the API.
+        """
+        uncompressed_size = len(response.content)
+        size = (response.headers or {}).get("Content-Length")
+        size = int(size) if size is not None else uncompressed_size
+        with self._lock:
+            self.responses += 1
+            self.bytes_received += size
+            self.bytes_received_uncompressed += uncompressed_size
+
+    def as_dict(self) -> dict:
+        """Returns the counters.
+
+        Returns:
+            dict : the value of each counter.
+        """
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "bytes_sent": self.bytes_sent,
+                "bytes_sent_uncompressed": self.bytes_sent_uncompressed,
+                "responses": self.responses,
+                "bytes_received": self.bytes_received,
+                "bytes_received_uncompressed": self.bytes_received_uncompressed,
+            }
+
+
+class BaseOxAPIClient:
+    """General class for the clients calling OxAPI, holding the configuration shared
+    by the synchronous and the asynchronous clients.
+
+    This class cannot be directly instantiated.
+    """
+
+    def __init__(
+        self,
+        retry_policy: RetryPolicy = None,
+        hedging: HedgingPolicy = None,
+        compress_threshold: int = None,
+        compress_level: int = 6,
+        accept_encoding: str = "gzip, deflate",
+        connect_timeout: Optional[float] = 10.0,
+        read_timeout: Optional[float] = 300.0,
+        circuit_breaker: CircuitBreaker = None,
+    ):
+        """Constructor.
+
+        Args:
+            retry_policy: optional, the policy for retrying the failed calls; calls are not retried if None.
+            hedging: optional, the policy for hedging slow calls; calls are not hedged if None.
+            compress_threshold: optional, size in bytes from which the request bodies are gzip-compressed;
+            request bodies are never compressed if None.
+            compress_level: gzip compression level, from 1 (fastest) to 9 (smallest).
+            accept_encoding: the encodings accepted for the response bodies.
+            connect_timeout: timeout in seconds for establishing a connection, None for no timeout.
+            read_timeout: timeout in seconds between two bytes received from the API, None for no timeout.
+            circuit_breaker: optional, the circuit breaker failing fast the calls to the endpoints that are down;
+            calls are never short-circuited if None.
+        """
+        if self.__class__ == BaseOxAPIClient:
+            raise NotImplementedError(
+                "BaseOxAPIClient class cannot be directly instantiated"
+            )
+        self.retry_policy = retry_policy
+        self.hedging = hedging
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+        self.accept_encoding = accept_encoding
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.circuit_breaker = circuit_breaker
+        self.stats = TransferStats()
+
+    @staticmethod
+    def get_headers() -> dict:
+        """Builds the headers of a request to OxAPI.
+
+        Returns:
+            dict : the headers, including the authorization.
+        """
+        return {
+            "Content-Type": "application/json",
+            "Authorization": oxapi.api_key,
+        }
+
+    def get_timeout(
+        self, deadline: Deadline = None
+    ) -> Tuple[Optional[float], Optional[float]]:
+        """Computes the timeouts of a request.
+
+        Args:
+            deadline: optional, the deadline of the call, capping the timeouts to its remaining budget.
+
+        Returns:
+            Tuple[Optional[float], Optional[float]] : the connect and read timeouts in seconds.
+        """
+        timeout = (self.connect_timeout, self.read_timeout)
+        if deadline is not None:
+            timeout = deadline.clamp(timeout)
+        return timeout
+
+    def before_call(self, url: str):
+        """Checks that a call may be sent, raising CircuitOpenException if the
+        circuit of its endpoint is open.
+
+        Args:
+            url: the url of the endpoint.
+        """
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.before_call(url)
+
+    def release_call(self, url: str):
+        """Releases a call that ended without an outcome, so that it does not hold
+        the probe slot of a half-open circuit.
+
+        Args:
+            url: the url of the endpoint.
+        """
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.release(url)
+
+    def record_outcome(self, url: str, response=None):
+        """Records the outcome of a call, updating the health of its endpoint.
+
+        Args:
+            url: the url of the endpoint.
+            response: optional, the response of the API, None if the request failed without a response.
+        """
+        report_response(url, response)
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record(url, response)
+
+    def encode_body(self, body: dict, accept: str = None) -> Tuple[bytes, dict]:
+        """Serializes the body of a request, compressing it if it is larger than
+        the compression threshold.
+
+        Args:
+            body: the body of the request.
+            accept: optional, the Accept header negotiating the format of the response.
+
+        Returns:
+            Tuple[bytes, dict] : the body to be sent and the headers of the request.
+        """
+        data = json.dumps(body, separators=(",", ":")).encode("utf-8")
+        uncompressed_size = len(data)
+        headers = self.get_headers()
+        headers["Accept-Encoding"] = self.accept_encoding
+        if accept is not None:
+            headers["Accept"] = accept
+        if (
+            self.compress_threshold is not None
+            and uncompressed_size >= self.compress_threshold
+        ):
+            data = gzip.compress(data, compresslevel=self.compress_level)
+            headers["Content-Encoding"] = "gzip"
+        self.stats.record_request(uncompressed_size, len(data))
+        return data, headers
+
+
+class _HedgedRace:
+    """Race between a request and its duplicate sent by a hedged call: the first
+    successful response wins, and the connections still used by the other request
+    are aborted."""
+
+    def __init__(self):
+        """Constructor."""
+        self.winner = None
+        self.hedge: Optional[futures.Future] = None
+        self._closed = False
+        self._connections: Dict[int, list] = {}
+        self._lock = threading.Lock()
+
+    def start_hedge(self, submit: Callable[[], Optional[futures.Future]]):
+        """Sends the duplicate request, unless the race is over.
+
+        Args:
+            submit: the function submitting the duplicate request, returning None if it is not sent.
+        """
+        with self._lock:
+            if self.winner is None and not self._closed:
+                self.hedge = submit()
+
+    def close(self) -> Optional[futures.Future]:
+        """Prevents the duplicate request from being sent from now on.
+
+        Returns:
+            Optional[futures.Future] : the future of the duplicate request, None if it was not sent.
+        """
+        with self._lock:
+            self._closed = True
+            return self.hedge
+
+    def track(self, connection):
+        """Records a connection used by the request of the calling thread.
+
+        Args:
+            connection: the urllib3 connection.
+        """
+        with self._lock:
+            self._connections.setdefault(threading.get_ident(), []).append(connection)
+
+    def untrack(self, connection):
+        """Forgets a connection released by the request of the calling thread, before
+        it returns to its pool.
+
+        Args:
+            connection: the urllib3 connection.
+        """
+        with self._lock:
+            connections = self._connections.get(threading.get_ident(), [])
+            if connection in connections:
+                connections.remove(connection)
+
+    def win(self, response) -> bool:
+        """Ends the race with the response of the calling thread, unless the other
+        request already won it.
+
+        Args:
+            response: the successful response.
+
+        Returns:
+            bool : True if the response won the race.
+        """
+        with self._lock:
+            if self.winner is not None:
+                return False
+            self.winner = response
+            # aborted under the lock, so that they cannot be back in their pool
+            for ident, connections in self._connections.items():
+                if ident == threading.get_ident():
+                    continue
+                for connection in connections:
+                    sock = getattr(connection, "sock", None)
+                    if sock is not None:
+                        try:
+                            sock.shutdown(socket.SHUT_RDWR)
+                        except OSError:
+                            pass
+            return True
+
+
+_hedged = threading.local()
+
+
+class _TrackedPoolMixin:
+    """Connection pool recording the connections used by the requests of a hedged
+    call, so that the losing request can be aborted."""
+
+    def _get_conn(self, timeout=None):
+        connection = super()._get_conn(timeout=timeout)
+        race = getattr(_hedged, "race", None)
+        if race is not None:
+            race.track(connection)
+        return connection
+
+    def _put_conn(self, connection):
+        race = getattr(_hedged, "race", None)
+        if race is not None and connection is not None:
+            race.untrack(connection)
+        super()._put_conn(connection)
+
+
+class _TrackedHTTPConnectionPool(_TrackedPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _TrackedHTTPSConnectionPool(_TrackedPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class _TrackedAdapter(HTTPAdapter):
+    """Adapter whose connection pools record the connections of hedged calls."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TrackedHTTPConnectionPool,
+            "https": _TrackedHTTPSConnectionPool,
+        }
+
+
+class OxAPIClient(BaseOxAPIClient):
+    """Client owning a pooled, keep-alive HTTP session towards OxAPI.
+
+    Reusing the same session across calls avoids paying a new TCP and TLS handshake
+    for every request.
+    """
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 10, **kwargs):
+        """Constructor.
+
+        Args:
+            pool_connections: number of hosts for which a connection pool is cached.
+            pool_maxsize: maximum number of connections kept alive for each host.
+            **kwargs: the configuration shared by all the clients (see BaseOxAPIClient).
+        """
+        super().__init__(**kwargs)
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self._session = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def session(self) -> requests.Session:
+        """The pooled session, created at first use.
+
+        Returns:
+            requests.Session : the session shared by all the calls of this client.
+        """
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def _build_session(self) -> requests.Session:
+        """Builds a session mounting pooled adapters for both http and https.
+
+        Returns:
+            requests.Session : the new session.
+        """
+        session = requests.Session()
+        adapter = _TrackedAdapter(
+            pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def post(
+        self,
+        url: str,
+        body: dict,
+        retry_policy: RetryPolicy = None,
+        deadline: Deadline = None,
+        accept: str = None,
+    ) -> requests.Response:
+        """Performs a POST request through the pooled session, retrying it
+        according to the retry policy. When ``oxapi.base_url`` lists several
+        regions, retries fail over to the fastest healthy endpoint.
+
+        Args:
+            url: the url of the endpoint.
+            body: the body of the request, sent as JSON.
+            retry_policy: optional, the policy overriding the one of the client for this request.
+            deadline: optional, the time budget of the call in seconds (or a started Deadline), shared by all the
+            attempts; DeadlineExceededException is raised when it is exhausted. The read timeout of ``requests`` bounds
+            each read from the socket, not the whole response, so a response streamed slowly can overrun it.
+            accept: optional, the Accept header negotiating the format of the response.
+
+        Returns:
+            requests.Response : the response of the API.
+        """
+        retry_policy = retry_policy if retry_policy is not None else self.retry_policy
+        deadline = Deadline.start(deadline)
+        attempt = 1
+        while True:
+            if deadline is not None:
+                deadline.check(url)
+            self.before_call(url)
+            try:
+                res = self._send(
+                    url, body, timeout=self.get_timeout(deadline), accept=accept
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.record_outcome(url)
+                if deadline is not None:
+                    deadline.check(url)
+                if retry_policy is None or attempt >= retry_policy.max_attempts:
+                    raise
+                error = e
+                oxapi.logger.warning("Request failed: {0}, ERROR: {1}".format(url, e))
+                res = None
+            except BaseException:
+                # e.g. a cancelled call or a broken response: no outcome recorded
+                self.release_call(url)
+                raise
+            else:
+                self.record_outcome(url, res)
+                if (
+                    retry_policy is None
+                    or attempt >= retry_policy.max_attempts
+                    or not retry_policy.is_retryable(res)
+                ):
+                    return res
+            backoff = retry_policy.get_backoff(attempt, res)
+            if deadline is not None and backoff >= deadline.remaining():
+                log_deadline(url, attempt)
+                if res is None:
+                    raise error
+                return res
+            log_retry(url, attempt, backoff, res)
+            time.sleep(backoff)
+            url = reroute(url)
+            attempt += 1
+
+    def _send(
+        self,
+        url: str,
+        body: dict,
+        timeout: Tuple[float, float] = None,
+        accept: str = None,
+    ) -> requests.Response:
+        """Performs a single POST request, hedged if a hedging policy is set.
+
+        Args:
+            url: the url of the endpoint.
+            body: the body of the request, sent as JSON.
+            timeout: optional, the connect and read timeouts in seconds.
+            accept: optional, the Accept header negotiating the format of the response.
+
+        Returns:
+            requests.Response : the response of the API.
+        """
+        data, headers = self.encode_body(body, accept=accept)
+        if self.hedging is None:
+            res = self.session.post(url, data=data, headers=headers, timeout=timeout)
+        else:
+            res = self._send_hedged(url, data, headers, timeout)
+        self.stats.record_response(res)
+        return res
+
+    def _send_hedged(
+        self, url: str, data: bytes, headers: dict, timeout: Tuple[float, float] = None
+    ) -> requests.Response:
+        """Performs a POST request, sending a duplicate if no response arrives
+        within the hedging delay, and returns the first successful response.
+
+        The request is sent by the calling thread, and only its duplicate by the
+        executor of the client; the connection of the losing request is aborted.
+
+        Args:
+            url: the url of the endpoint.
+            data: the encoded body of the request.
+            headers: the headers of the request.
+            timeout: optional, the connect and read timeouts in seconds of each request.
+
+        Returns:
+            requests.Response : the response of the API.
+        """
+        self.hedging.start_request()
+        start = time.monotonic()
+        race = _HedgedRace()
+        timer = threading.Timer(
+            self.hedging.get_delay(url),
+            self._hedge,
+            args=(race, url, data, headers, timeout, start),
+        )
+        timer.daemon = True
+        timer.start()
+        _hedged.race = race
+        try:
+            res = self.session.post(url, data=data, headers=headers, timeout=timeout)
+        except Exception as e:
+            error = e
+        else:
+            error = None
+            if race.win(res):
+                self.hedging.record(url, time.monotonic() - start)
+                return res
+            res.close()
+        finally:
+            _hedged.race = None
+            timer.cancel()
+            hedge = race.close()
+        if race.winner is None and hedge is not None:
+            # the request failed, the duplicate still has a chance
+            futures.wait([hedge])
+        if race.winner is not None:
+            return race.winner
+        raise error
+
+    def _hedge(
+        self,
+        race: _HedgedRace,
+        url: str,
+        data: bytes,
+        headers: dict,
+        timeout: Tuple[float, float],
+        start: float,
+    ):
+        """Sends the duplicate of a request still running after the hedging delay,
+        if the hedging policy allows it.
+
+        Args:
+            race: the race of the request and its duplicate.
+            url: the url of the endpoint.
+            data: the encoded body of the request.
+            headers: the headers of the request.
+            timeout: the connect and read timeouts in seconds of the request.
+            start: the time at which the request was sent.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = futures.ThreadPoolExecutor(
+                    max_workers=self.pool_maxsize,
+                    thread_name_prefix="oxapi-hedging",
+                )
+            executor = self._executor
+
+        def submit() -> Optional[futures.Future]:
+            if not self.hedging.try_hedge():
+                return None
+            oxapi.logger.info("Hedging request to {0}".format(url))
+            return executor.submit(
+                self._send_hedge, race, url, data, headers, timeout, start
+            )
+
+        race.start_hedge(submit)
+
+    def _send_hedge(
+        self,
+        race: _HedgedRace,
+        url: str,
+        data: bytes,
+        headers: dict,
+        timeout: Tuple[float, float],
+        start: float,
+    ) -> Optional[requests.Response]:
+        """Sends the duplicate of a request, from the executor of the client.
+
+        Args:
+            race: the race of the request and its duplicate.
+            url: the url of the endpoint.
+            data: the encoded body of the request.
+            headers: the headers of the request.
+            timeout: the connect and read timeouts in seconds of the request.
+            start: the time at which the request was sent.
+
+        Returns:
+            Optional[requests.Response] : the response if it won the race, None otherwise.
+        """
+        _hedged.race = race
+        try:
+            res = self.session.post(url, data=data, headers=headers, timeout=timeout)
+        finally:
+            _hedged.race = None
+        if race.win(res):
+            self.hedging.record(url, time.monotonic() - start)
+            return res
+        res.close()
+        return None
+
+    def close(self):
+        """Closes the session and all its pooled connections."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+class AsyncResponse:
+    """Response of an asynchronous call, exposing the same interface used for the
+    responses of ``requests``."""
+
+    def __init__(self, status_code: int, headers, url: str, content: bytes):
+        """Constructor.
+
+        Args:
+            status_code: HTTP status code of the response.
+            headers: headers of the response.
+            url: the url that has been called.
+            content: the raw body of the response.
+        """
+        self.status_code = status_code
+        self.headers = headers
+        self.url = url
+        self.content = content
+
+    def json(self):
+        """Decodes the body of the response.
+
+        Returns:
+            the JSON decoded body.
+        """
+        return json.loads(self.content)
+
+
+class AsyncOxAPIClient(BaseOxAPIClient):
+    """Client owning a pooled ``aiohttp`` session towards OxAPI, to be used from
+    an asyncio event loop.
+
+    A session is kept per event loop, and closed when the client is closed or when
+    its loop shuts down its asynchronous generators (as done by ``asyncio.run``).
+
+    It requires the ``aiohttp`` package (``pip install oxapi[async]``).
+    """
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 0, **kwargs):
+        """Constructor.
+
+        Args:
+            limit: maximum number of simultaneous connections.
+            limit_per_host: maximum number of simultaneous connections to the same
+            host, 0 for no limit.
+            **kwargs: the configuration shared by all the clients (see BaseOxAPIClient).
+        """
+        super().__init__(**kwargs)
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self._sessions: Dict[asyncio.AbstractEventLoop, tuple] = {}
+        self._lock = threading.Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    @property
+    def session(self):
+        """The pooled session of the running event loop, created at first use.
+
+        Returns:
+            aiohttp.ClientSession : the session shared by all the calls of this
+            client within the running event loop.
+        """
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._sessions.get(loop)
+            if entry is not None and not entry[0].closed:
+                return entry[0]
+            # the sessions of the loops closed without shutting down their
+            # asynchronous generators cannot be closed anymore, their connections
+            # are released when they are garbage collected
+            for other in [other for other in self._sessions if other.is_closed()]:
+                del self._sessions[other]
+            connector = aiohttp.TCPConnector(
+                limit=self.limit, limit_per_host=self.limit_per_host
+            )
+            session = aiohttp.ClientSession(connector=connector)
+            lifetime = self._session_lifetime(session)
+            # started up to its first yield, which registers it with the loop
+            try:
+                lifetime.asend(None).send(None)
+            except StopIteration:
+                pass
+            self._sessions[loop] = (session, lifetime)
+        return session
+
+    async def _session_lifetime(self, session):
+        """Asynchronous generator suspended for the lifetime of a session, and closed
+        when the client is closed or when the event loop of the session shuts down
+        its asynchronous generators, closing the session.
+
+        Args:
+            session: the session of the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            yield
+        finally:
+            with self._lock:
+                if self._sessions.get(loop, (None,))[0] is session:
+                    del self._sessions[loop]
+            await session.close()
+
+    async def post(
+        self,
+        url: str,
+        body: dict,
+        retry_policy: RetryPolicy = None,
+        deadline: Deadline = None,
+        accept: str = None,
+    ) -> AsyncResponse:
+        """Performs a POST request through the pooled session, retrying it
+        according to the retry policy. When ``oxapi.base_url`` lists several
+        regions, retries fail over to the fastest healthy endpoint.
+
+        Args:
+            url: the url of the endpoint.
+            body: the body of the request, sent as JSON.
+            retry_policy: optional, the policy overriding the one of the client for this request.
+            deadline: optional, the time budget of the call in seconds (or a started Deadline), shared by all the
+            attempts; DeadlineExceededException is raised when it is exhausted.
+            accept: optional, the Accept header negotiating the format of the response.
+
+        Returns:
+            AsyncResponse : the response of the API.
+        """
+        import aiohttp
+
+        retry_policy = retry_policy if retry_policy is not None else self.retry_policy
+        deadline = Deadline.start(deadline)
+        attempt = 1
+        while True:
+            if deadline is not None:
+                deadline.check(url)
+            self.before_call(url)
+            try:
+                send = self._send(
+                    url, body, timeout=self.get_timeout(deadline), accept=accept
+                )
+                if deadline is None:
+                    res = await send
+                else:
+                    res = await asyncio.wait_for(send, timeout=deadline.remaining())
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.record_outcome(url)
+                if deadline is not None:
+                    deadline.check(url)
+                if retry_policy is None or attempt >= retry_policy.max_attempts:
+                    raise
+                error = e
+                oxapi.logger.warning("Request failed: {0}, ERROR: {1}".format(url, e))
+                res = None
+            except BaseException:
+                # e.g. a cancelled call or a broken response: no outcome recorded
+                self.release_call(url)
+                raise
+            else:
+                self.record_outcome(url, res)
+                if (
+                    retry_policy is None
+                    or attempt >= retry_policy.max_attempts
+                    or not retry_policy.is_retryable(res)
+                ):
+                    return res
+            backoff = retry_policy.get_backoff(attempt, res)
+            if deadline is not None and backoff >= deadline.remaining():
+                log_deadline(url, attempt)
+                if res is None:
+                    raise error
+                return res
+            log_retry(url, attempt, backoff, res)
+            await asyncio.sleep(backoff)
+            url = reroute(url)
+            attempt += 1
+
+    async def _send(
+        self,
+        url: str,
+        body: dict,
+        timeout: Tuple[float, float] = None,
+        accept: str = None,
+    ) -> AsyncResponse:
+        """Performs a single POST request, hedged if a hedging policy is set.
+
+        Args:
+            url: the url of the endpoint.
+            body: the body of the request, sent as JSON.
+            timeout: optional, the connect and read timeouts in seconds.
+            accept: optional, the Accept header negotiating the format of the response.
+
+        Returns:
+            AsyncResponse : the response of the API.
+        """
+        data, headers = self.encode_body(body, accept=accept)
+        if self.hedging is None:
+            res = await self._post(url, data, headers, timeout)
+        else:
+            res = await self._send_hedged(url, data, headers, timeout)
+        self.stats.record_response(res)
+        return res
+
+    async def _send_hedged(
+        self, url: str, data: bytes, headers: dict, timeout: Tuple[float, float] = None
+    ) -> AsyncResponse:
+        """Performs a POST request, sending a duplicate if no response arrives
+        within the hedging delay, and returns the first successful response while
+        cancelling the other request.
+
+        Args:
+            url: the url of the endpoint.
+            data: the encoded body of the request.
+            headers: the headers of the request.
+            timeout: optional, the connect and read timeouts in seconds of each request.
+
+        Returns:
+            AsyncResponse : the response of the API.
+        """
+        self.hedging.start_request()
+        start = time.monotonic()
+        pending = {asyncio.ensure_future(self._post(url, data, headers, timeout))}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.hedging.get_delay(url))
+            if not done and self.hedging.try_hedge():
+                oxapi.logger.info("Hedging request to {0}".format(url))
+                pending.add(
+                    asyncio.ensure_future(self._post(url, data, headers, timeout))
+                )
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                successful = [task for task in done if task.exception() is None]
+                if not successful:
+                    error = next(iter(done)).exception()
+                    continue
+                self.hedging.record(url, time.monotonic() - start)
+                return successful[0].result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _post(
+        self, url: str, data: bytes, headers: dict, timeout: Tuple[float, float] = None
+    ) -> AsyncResponse:
+        """Performs a single POST request through the pooled session.
+
+        Args:
+            url: the url of the endpoint.
+            data: the encoded body of the request.
+            headers: the headers of the request.
+            timeout: optional, the connect and read timeouts in seconds.
+
+        Returns:
+            AsyncResponse : the response of the API.
+        """
+        import aiohttp
+
+        connect, read = timeout if timeout is not None else (None, None)
+        timeout = aiohttp.ClientTimeout(
+            total=None, sock_connect=connect, sock_read=read
+        )
+        async with self.session.post(
+            url, data=data, headers=headers, timeout=timeout
+        ) as res:
+            content = await res.read()
+            return AsyncResponse(
+                status_code=res.status,
+                headers=res.headers,
+                url=str(res.url),
+                content=content,
+            )
+
+    async def close(self):
+        """Closes the sessions and all their pooled connections, the sessions of
+        the other event loops being closed within their loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        for other, (session, lifetime) in sessions.items():
+            if other is loop:
+                await lifetime.aclose()
+            elif not other.is_closed():
+                asyncio.run_coroutine_threadsafe(lifetime.aclose(), other)
+
+
+def log_retry(url: str, attempt: int, backoff: float, response=None):
+    """Logs that a failed call is going to be retried.
+
+    Args:
+        url: the url of the endpoint.
+        attempt: the number of attempts performed so far.
+        backoff: the waiting time in seconds before the next attempt.
+        response: optional, the response of the failed attempt.
+    """
+    oxapi.logger.info(
+        "Retrying request to {0} in {1:.2f}s (attempt {2} failed{3})".format(
+            url,
+            backoff,
+            attempt,
+            ""
+            if response is None
+            else " with status code {0}".format(response.status_code),
+        )
+    )
+
+
+def log_deadline(url: str, attempt: int):
+    """Logs that a failed call is not retried because its deadline would be
+    exceeded.
+
+    Args:
+        url: the url of the endpoint.
+        attempt: the number of attempts performed so far.
+    """
+    oxapi.logger.warning(
+        "Not retrying request to {0} after attempt {1}: the deadline would be exceeded".format(
+            url, attempt
+        )
+    )
+
+
+_default_client = None
+_default_async_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_client() -> OxAPIClient:
+    """Returns the client used by default for all the calls to OxAPI.
+
+    Returns:
+        OxAPIClient : the default client, created at first use.
+    """
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = OxAPIClient()
+    return _default_client
+
+
+def set_client(client: OxAPIClient):
+    """Replaces the client used by default for all the calls to OxAPI.
+
+    Args:
+        client: the new default client.
+    """
+    global _default_client
+    with _default_client_lock:
+        previous, _default_client = _default_client, client
+    if previous is not None and previous is not client:
+        previous.close()
+
+
+def get_async_client() -> AsyncOxAPIClient:
+    """Returns the asynchronous client used by default for the coroutines calling
+    OxAPI.
+
+    Returns:
+        AsyncOxAPIClient : the default asynchronous client, created at first use.
+    """
+    global _default_async_client
+    if _default_async_client is None:
+        with _default_client_lock:
+            if _default_async_client is None:
+                _default_async_client = AsyncOxAPIClient()
+    return _default_async_client
+
+
+def set_async_client(client: AsyncOxAPIClient):
+    """Replaces the asynchronous client used by default for the coroutines calling
+    OxAPI.
+
+    Args:
+        client: the new default asynchronous client.
+    """
+    global _default_async_client
+    with _default_client_lock:
+        _default_async_client = client
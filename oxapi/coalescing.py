@@ -0,0 +1,357 @@
+"""Module containing the coalescer merging concurrent small calls to the same
+OxAPI model into batched requests."""
+import asyncio
+import json
+import threading
+from concurrent import futures
+from typing import Callable, Dict, List, Optional
+
+from oxapi.deadline import Deadline
+
+
+class SlicedResponse:
+    """Response of a batched request restricted to the results of the texts of a
+    single call."""
+
+    def __init__(self, response, start: int, end: int):
+        """Constructor.
+
+        Args:
+            response: the response of the batched request.
+            start: the index of the first result of the call.
+            end: the index (excluded) of the last result of the call.
+        """
+        self.response = response
+        self.start = start
+        self.end = end
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = response.url
+
+    def json(self):
+        """Decodes the response, keeping only the results of the call if the
+        request succeeded.
+
+        Returns:
+            the decoded response.
+        """
+        return self.decode(lambda response: response.json())
+
+    def decode(self, decoder: Callable):
+        """Decodes the response with a given decoder, keeping only the results of
+        the call if the request succeeded.
+
+        Args:
+            decoder: the function decoding the response of the batched request.
+
+        Returns:
+            the decoded response.
+        """
+        result = decoder(self.response)
+        if self.status_code != 200:
+            return result
+        return dict(result, results=result["results"][self.start : self.end])
+
+
+class _Batch:
+    """Calls waiting to be sent in the same batched request."""
+
+    def __init__(self, key: tuple, url: str, body: dict, accept: Optional[str], event):
+        """Constructor.
+
+        Args:
+            key: the key of the batch, i.e. its endpoint and parameters.
+            url: the url of the endpoint.
+            body: the body of the first call of the batch.
+            accept: the Accept header of the batched request, None for the default one.
+            event: the event set when the batch is full.
+        """
+        self.key = key
+        self.url = url
+        self.body = body
+        self.accept = accept
+        self.event = event
+        self.texts: List[str] = []
+        self.calls = []
+        self.deadline: Optional[Deadline] = None
+        self.task: Optional[asyncio.Future] = None
+
+    def add(self, texts: List[str], deadline: Optional[Deadline], future):
+        """Adds the texts of a call to the batch.
+
+        Args:
+            texts: the texts of the call.
+            deadline: the deadline of the call, None for no deadline.
+            future: the future resolved with the response of the call.
+        """
+        # the request lasts as long as the most patient call needs, each call
+        # stopping its own wait at its deadline
+        self.deadline = (
+            Deadline.latest(self.deadline, deadline) if self.calls else deadline
+        )
+        self.calls.append((len(self.texts), len(self.texts) + len(texts), future))
+        self.texts.extend(texts)
+
+    def get_body(self) -> dict:
+        """Builds the body of the batched request.
+
+        Returns:
+            dict : the body, with the texts of all the calls.
+        """
+        return dict(self.body, texts=self.texts)
+
+
+class Coalescer:
+    """Coalescer collecting the concurrent calls to the same endpoint with the same
+    parameters for up to ``max_wait`` seconds, or until they hold ``max_batch``
+    texts, and sending them as a single request.
+
+    Each call gets its own slice of the results of the batched request. The first
+    call of a batch waits and sends the request; the following ones only wait for
+    its response.
+
+    Calls with ``max_batch`` texts or more are sent on their own.
+
+    The batched request is bounded by the latest deadline of its calls, and by no
+    deadline if one of them has none; each call stops waiting at its own deadline.
+    """
+
+    def __init__(self, max_wait: float = 0.005, max_batch: int = 64):
+        """Constructor.
+
+        Args:
+            max_wait: maximum time in seconds a call waits for other calls to join its batch.
+            max_batch: maximum number of texts in a batched request.
+        """
+        if max_wait < 0:
+            raise ValueError("max_wait of a Coalescer cannot be negative")
+        if max_batch < 1:
+            raise ValueError("max_batch of a Coalescer must be at least 1")
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.calls = 0
+        self.requests = 0
+        self._batches: Dict[tuple, _Batch] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return "Coalescer(max_wait={0}, max_batch={1}, calls={2}, requests={3})".format(
+            self.max_wait, self.max_batch, self.calls, self.requests
+        )
+
+    def accepts(self, body: dict) -> bool:
+        """Checks whether a call can be coalesced with other calls.
+
+        Args:
+            body: the body of the call.
+
+        Returns:
+            bool : True if the call has fewer than ``max_batch`` texts.
+        """
+        texts = body.get("texts") if body is not None else None
+        return isinstance(texts, list) and 0 < len(texts) < self.max_batch
+
+    def post(
+        self,
+        client,
+        url: str,
+        body: dict,
+        deadline: Deadline = None,
+        accept: str = None,
+    ):
+        """Sends a call within a batched request, from any thread.
+
+        Args:
+            client: the client sending the requests.
+            url: the url of the endpoint.
+            body: the body of the call.
+            deadline: optional, the deadline of the call.
+            accept: optional, the Accept header negotiating the format of the response.
+
+        Returns:
+            SlicedResponse : the response of the batched request restricted to the call.
+        """
+        future = futures.Future()
+        batch, leader = self._join(
+            url, body, accept, deadline, future, threading.Event, scope=None
+        )
+        if leader:
+            # sent by a thread of its own, so that the first call of the batch stops
+            # waiting at its deadline like the other ones
+            threading.Thread(
+                target=self._send, args=(client, batch), daemon=True
+            ).start()
+        try:
+            return future.result(
+                timeout=None if deadline is None else deadline.remaining()
+            )
+        except futures.TimeoutError:
+            raise deadline.exceeded(url)
+
+    async def apost(
+        self,
+        client,
+        url: str,
+        body: dict,
+        deadline: Deadline = None,
+        accept: str = None,
+    ):
+        """Coroutine sending a call within a batched request.
+
+        Args:
+            client: the asynchronous client sending the requests.
+            url: the url of the endpoint.
+            body: the body of the call.
+            deadline: optional, the deadline of the call.
+            accept: optional, the Accept header negotiating the format of the response.
+
+        Returns:
+            SlicedResponse : the response of the batched request restricted to the call.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch, leader = self._join(
+            url, body, accept, deadline, future, asyncio.Event, scope=loop
+        )
+        if leader:
+            # sent by a task of its own, so that cancelling the first call does not
+            # cancel the request of the other calls of the batch
+            batch.task = asyncio.ensure_future(self._asend(client, batch))
+        try:
+            # shielded, so that a call giving up does not cancel the shared future
+            return await asyncio.wait_for(
+                asyncio.shield(future),
+                None if deadline is None else deadline.remaining(),
+            )
+        except asyncio.TimeoutError:
+            raise deadline.exceeded(url)
+
+    def _send(self, client, batch: _Batch):
+        """Waits for a batch to be full, or for ``max_wait`` seconds, and sends it.
+
+        Args:
+            client: the client sending the requests.
+            batch: the batch.
+        """
+        try:
+            try:
+                batch.event.wait(self.max_wait)
+            finally:
+                self._close(batch)
+            res = client.post(
+                batch.url,
+                batch.get_body(),
+                deadline=batch.deadline,
+                accept=batch.accept,
+            )
+        except BaseException as e:
+            # the calls of the batch are always resolved
+            self._resolve(batch, error=e)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            self._resolve(batch, response=res)
+
+    async def _asend(self, client, batch: _Batch):
+        """Coroutine waiting for a batch to be full, or for ``max_wait`` seconds,
+        and sending it.
+
+        Args:
+            client: the asynchronous client sending the requests.
+            batch: the batch.
+        """
+        try:
+            try:
+                await asyncio.wait_for(batch.event.wait(), self.max_wait)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._close(batch)
+            res = await client.post(
+                batch.url,
+                batch.get_body(),
+                deadline=batch.deadline,
+                accept=batch.accept,
+            )
+        except BaseException as e:
+            # the calls of the batch are always resolved
+            self._resolve(batch, error=e)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            self._resolve(batch, response=res)
+
+    def _join(
+        self,
+        url: str,
+        body: dict,
+        accept: Optional[str],
+        deadline: Deadline,
+        future,
+        event_type,
+        scope,
+    ):
+        """Adds a call to the pending batch of its endpoint and parameters, creating
+        the batch if needed.
+
+        Args:
+            url: the url of the endpoint.
+            body: the body of the call.
+            accept: the Accept header of the call, None for the default one.
+            deadline: the deadline of the call, None for no deadline.
+            future: the future resolved with the response of the call.
+            event_type: the class of the event set when the batch is full.
+            scope: the event loop of the call, None for the calls from threads.
+
+        Returns:
+            Tuple[_Batch, bool] : the batch, and True if the call is the first of the batch.
+        """
+        params = {key: value for key, value in body.items() if key != "texts"}
+        key = (url, scope, accept, json.dumps(params, sort_keys=True, default=str))
+        texts = body["texts"]
+        with self._lock:
+            self.calls += 1
+            batch = self._batches.get(key)
+            if batch is not None and len(batch.texts) + len(texts) > self.max_batch:
+                # the pending batch is sent right away, a new one is started
+                del self._batches[key]
+                batch.event.set()
+                batch = None
+            leader = batch is None
+            if leader:
+                batch = self._batches[key] = _Batch(
+                    key, url, body, accept, event_type()
+                )
+            batch.add(texts, deadline, future)
+            if len(batch.texts) >= self.max_batch:
+                self._batches.pop(key, None)
+                batch.event.set()
+        return batch, leader
+
+    def _close(self, batch: _Batch):
+        """Stops a batch from accepting new calls.
+
+        Args:
+            batch: the batch.
+        """
+        with self._lock:
+            if self._batches.get(batch.key) is batch:
+                del self._batches[batch.key]
+            self.requests += 1
+
+    @staticmethod
+    def _resolve(batch: _Batch, response=None, error: Exception = None):
+        """Resolves the futures of the calls of a sent batch.
+
+        Args:
+            batch: the batch.
+            response: the response of the batched request.
+            error: the exception raised by the batched request.
+        """
+        for start, end, future in batch.calls:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(SlicedResponse(response, start, end))
@@ -0,0 +1,81 @@
+"""Module containing the utilities building columnar outputs, as pandas DataFrames
+or Apache Arrow tables, from the results of OxAPI."""
+from typing import TYPE_CHECKING, Dict, List, Sequence
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+
+def transpose(rows: Sequence[Sequence], width: int) -> List[list]:
+    """Turns the rows of a result into columns.
+
+    Args:
+        rows: the rows, each holding ``width`` values.
+        width: the number of columns.
+
+    Returns:
+        List[list] : the columns.
+    """
+    if not rows:
+        return [[] for _ in range(width)]
+    return [list(column) for column in zip(*rows)]
+
+
+def get_columns(names: Sequence[str], columns: Sequence[list]) -> Dict[str, list]:
+    """Builds the columns of an output, padding the shorter ones with None as done
+    by the concatenation of DataFrames.
+
+    Args:
+        names: the names of the columns.
+        columns: the values of the columns, in the same order.
+
+    Returns:
+        Dict[str, list] : the columns, all with the same length.
+    """
+    length = max((len(column) for column in columns), default=0)
+    return {
+        name: column
+        if len(column) == length
+        else column + [None] * (length - len(column))
+        for name, column in zip(names, columns)
+    }
+
+
+def to_pandas(columns: Dict[str, list]) -> "pd.DataFrame":
+    """Builds a DataFrame from columns.
+
+    Args:
+        columns: the columns.
+
+    Returns:
+        pandas.DataFrame : the DataFrame.
+    """
+    import pandas as pd
+
+    if not any(columns.values()):
+        # typed like the columns of an empty DataFrame built from rows
+        return pd.DataFrame(columns, dtype=object)
+    return pd.DataFrame(columns)
+
+
+def to_arrow(columns: Dict[str, list], types: Dict[str, str]) -> "pa.Table":
+    """Builds an Arrow table with typed columns.
+
+    It requires the ``pyarrow`` package (``pip install oxapi[arrow]``).
+
+    Args:
+        columns: the columns.
+        types: the type of each column, e.g. 'string' or 'float64'.
+
+    Returns:
+        pyarrow.Table : the table.
+    """
+    import pyarrow as pa
+
+    return pa.table(
+        {
+            name: pa.array(values, type=pa.type_for_alias(types[name]))
+            for name, values in columns.items()
+        }
+    )
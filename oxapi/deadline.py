@@ -0,0 +1,131 @@
+"""Module containing the deadline budgets bounding the duration of the calls to
+OxAPI."""
+import time
+from typing import Optional, Tuple, Union
+
+from oxapi.error import DeadlineExceededException
+
+
+class Deadline:
+    """Time budget of a call, shared by all its attempts.
+
+    The budget starts when the deadline is created; every attempt, and every wait
+    between attempts, consumes it, so that the call as a whole never lasts longer
+    than the budget.
+    """
+
+    def __init__(self, budget: float):
+        """Constructor.
+
+        Args:
+            budget: the time in seconds available to complete the call.
+        """
+        if budget <= 0:
+            raise ValueError("The budget of a Deadline must be positive")
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def __repr__(self) -> str:
+        return "Deadline(budget={0}, remaining={1:.3f})".format(
+            self.budget, self.remaining()
+        )
+
+    @staticmethod
+    def start(budget: Union[float, "Deadline", None]) -> Optional["Deadline"]:
+        """Starts a deadline from a budget in seconds.
+
+        Args:
+            budget: the time budget in seconds, an already started Deadline, or None for no deadline.
+
+        Returns:
+            Optional[Deadline] : the started deadline, None if no budget is given.
+        """
+        if budget is None or isinstance(budget, Deadline):
+            return budget
+        return Deadline(budget)
+
+    @staticmethod
+    def earliest(*deadlines: Optional["Deadline"]) -> Optional["Deadline"]:
+        """Returns the deadline expiring first.
+
+        Args:
+            *deadlines: the deadlines, None for no deadline.
+
+        Returns:
+            Optional[Deadline] : the deadline expiring first, None if no deadline is given.
+        """
+        deadlines = [deadline for deadline in deadlines if deadline is not None]
+        if not deadlines:
+            return None
+        return min(deadlines, key=lambda deadline: deadline.expires_at)
+
+    @staticmethod
+    def latest(*deadlines: Optional["Deadline"]) -> Optional["Deadline"]:
+        """Returns the deadline expiring last, no deadline outlasting all of them.
+
+        Args:
+            *deadlines: the deadlines, None for no deadline.
+
+        Returns:
+            Optional[Deadline] : the deadline expiring last, None if one of them is None or if no deadline is given.
+        """
+        if not deadlines or any(deadline is None for deadline in deadlines):
+            return None
+        return max(deadlines, key=lambda deadline: deadline.expires_at)
+
+    def remaining(self) -> float:
+        """Computes the remaining budget.
+
+        Returns:
+            float : the remaining time in seconds, 0 if the deadline has expired.
+        """
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        """Checks whether the budget has been consumed.
+
+        Returns:
+            bool : True if the deadline has expired.
+        """
+        return self.remaining() <= 0
+
+    def check(self, url: str = None):
+        """Raises an exception if the deadline has expired.
+
+        Args:
+            url: optional, the url of the endpoint, for the error message.
+        """
+        if self.expired():
+            raise self.exceeded(url)
+
+    def exceeded(self, url: str = None) -> DeadlineExceededException:
+        """Builds the exception reporting that the deadline has expired.
+
+        Args:
+            url: optional, the url of the endpoint, for the error message.
+
+        Returns:
+            DeadlineExceededException : the exception.
+        """
+        return DeadlineExceededException(
+            message="Deadline of {0}s exceeded{1}".format(
+                self.budget, "" if url is None else " calling " + url
+            )
+        )
+
+    def clamp(
+        self, timeout: Tuple[Optional[float], Optional[float]]
+    ) -> Tuple[float, float]:
+        """Caps a (connect, read) timeout to the remaining budget.
+
+        Args:
+            timeout: the connect and read timeouts in seconds, None for no timeout.
+
+        Returns:
+            Tuple[float, float] : the connect and read timeouts, none of them exceeding the remaining budget.
+        """
+        # a null timeout is rejected by the HTTP libraries
+        remaining = max(self.remaining(), 0.001)
+        return tuple(
+            remaining if value is None else min(value, remaining) for value in timeout
+        )
@@ -0,0 +1,357 @@
+"""Module containing the selection of the fastest OxAPI endpoint among several
+regions."""
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import oxapi
+
+DEFAULT_BASE_URL = "https://api.oxolo.com"
+
+
+class EndpointSelector:
+    """Selects the fastest healthy endpoint among a list of base urls.
+
+    The round-trip time to each endpoint is measured by opening a TCP connection to
+    it. The measurements are performed in background, cached on disk and refreshed
+    once older than ``ttl`` seconds. An endpoint reported as failing is avoided for
+    ``cooldown`` seconds, so that calls fail over to the next fastest endpoint.
+    """
+
+    def __init__(
+        self,
+        base_urls: List[str],
+        ttl: float = 3600.0,
+        cooldown: float = 30.0,
+        probe_timeout: float = 2.0,
+        probes: int = 3,
+        cache_path: str = None,
+    ):
+        """Constructor.
+
+        Args:
+            base_urls: the base urls of the endpoints, in order of preference when no measurement is available.
+            ttl: validity in seconds of the round-trip time measurements.
+            cooldown: time in seconds during which an endpoint reported as failing is avoided.
+            probe_timeout: timeout in seconds of each connection opened to measure the round-trip time.
+            probes: number of connections opened to each endpoint, the fastest one being kept.
+            cache_path: optional, path of the JSON file caching the measurements; by default a file in the
+            directory given by the OXAPI_CACHE_DIR environment variable, or in ~/.cache/oxapi.
+        """
+        if len(base_urls) == 0:
+            raise ValueError("At least one base url is needed to select an endpoint")
+        self.base_urls = [url.rstrip("/") for url in base_urls]
+        self.ttl = ttl
+        self.cooldown = cooldown
+        self.probe_timeout = probe_timeout
+        self.probes = probes
+        self.cache_path = (
+            cache_path
+            if cache_path is not None
+            else os.path.join(get_cache_dir(), "endpoints.json")
+        )
+        self.rtts: Dict[str, Optional[float]] = {}
+        self.probed_at = None
+        self._failures: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._probing = None
+        self._load()
+
+    def __repr__(self) -> str:
+        return "EndpointSelector(base_urls={0}, rtts={1})".format(
+            self.base_urls, self.rtts
+        )
+
+    def get_base_url(self) -> str:
+        """Returns the base url of the fastest healthy endpoint, starting a
+        background measurement if the cached one is missing or expired.
+
+        Returns:
+            str : the selected base url.
+        """
+        if self.is_stale():
+            self.probe_in_background()
+        now = time.monotonic()
+        with self._lock:
+            healthy = [
+                url
+                for url in self.base_urls
+                if self._failures.get(url, 0) <= now
+                and self.rtts.get(url, 0) is not None
+            ]
+            if not healthy:
+                # every endpoint is failing: use the one recovering first
+                return min(self.base_urls, key=lambda url: self._failures.get(url, 0))
+            return min(healthy, key=lambda url: self.rtts.get(url) or 0)
+
+    def is_stale(self) -> bool:
+        """Checks whether the measurements are missing or expired.
+
+        Returns:
+            bool : True if the endpoints should be measured again.
+        """
+        return self.probed_at is None or time.time() - self.probed_at > self.ttl
+
+    def probe_in_background(self) -> threading.Thread:
+        """Measures the round-trip time of the endpoints in a daemon thread, unless
+        a measurement is already running.
+
+        Returns:
+            threading.Thread : the thread performing the measurement.
+        """
+        with self._lock:
+            if self._probing is None or not self._probing.is_alive():
+                self._probing = threading.Thread(
+                    target=self.probe, name="oxapi-endpoint-probe", daemon=True
+                )
+                self._probing.start()
+            return self._probing
+
+    def probe(self) -> Dict[str, Optional[float]]:
+        """Measures the round-trip time of the endpoints and caches it on disk.
+
+        Returns:
+            Dict[str, Optional[float]] : the round-trip time in seconds of each endpoint, None if unreachable.
+        """
+        rtts = {url: self._measure(url) for url in self.base_urls}
+        with self._lock:
+            self.rtts = rtts
+            self.probed_at = time.time()
+        oxapi.logger.debug("Measured round-trip times: {0}".format(rtts))
+        self._save()
+        return rtts
+
+    def report_failure(self, base_url: str):
+        """Avoids an endpoint for the cooldown time.
+
+        Args:
+            base_url: the base url of the failing endpoint.
+        """
+        with self._lock:
+            self._failures[base_url] = time.monotonic() + self.cooldown
+        oxapi.logger.warning(
+            "Endpoint {0} is failing, switching to another region for {1}s".format(
+                base_url, self.cooldown
+            )
+        )
+
+    def report_success(self, base_url: str):
+        """Marks an endpoint as healthy again.
+
+        Args:
+            base_url: the base url of the endpoint.
+        """
+        with self._lock:
+            self._failures.pop(base_url, None)
+
+    def find_base_url(self, url: str) -> Optional[str]:
+        """Finds the endpoint a url belongs to.
+
+        Args:
+            url: a full url.
+
+        Returns:
+            Optional[str] : the base url of the endpoint, None if the url does not belong to any of them.
+        """
+        for base_url in self.base_urls:
+            if url == base_url or url.startswith(base_url + "/"):
+                return base_url
+        return None
+
+    def _measure(self, base_url: str) -> Optional[float]:
+        """Measures the round-trip time to an endpoint as the time needed to open a
+        TCP connection to it.
+
+        Args:
+            base_url: the base url of the endpoint.
+
+        Returns:
+            Optional[float] : the fastest measurement in seconds, None if unreachable.
+        """
+        parts = urlsplit(base_url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        best = None
+        for _ in range(0, self.probes):
+            start = time.perf_counter()
+            try:
+                with socket.create_connection(
+                    (parts.hostname, port), timeout=self.probe_timeout
+                ):
+                    rtt = time.perf_counter() - start
+            except OSError:
+                continue
+            best = rtt if best is None else min(best, rtt)
+        return best
+
+    def _cache_key(self) -> str:
+        """Builds the key of the endpoints in the cache file.
+
+        Returns:
+            str : the key.
+        """
+        return " ".join(sorted(self.base_urls))
+
+    def _load(self):
+        """Loads the measurements from the cache file, if not expired."""
+        try:
+            with open(self.cache_path) as f:
+                entry = json.load(f)[self._cache_key()]
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        if time.time() - entry["probed_at"] <= self.ttl:
+            self.rtts = entry["rtts"]
+            self.probed_at = entry["probed_at"]
+
+    def _save(self):
+        """Writes the measurements to the cache file."""
+        try:
+            with open(self.cache_path) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+        cache[self._cache_key()] = {"probed_at": self.probed_at, "rtts": self.rtts}
+        try:
+            directory = os.path.dirname(self.cache_path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(cache, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            oxapi.logger.debug("Unable to cache the round-trip times: {0}".format(e))
+
+
+def get_cache_dir() -> str:
+    """Returns the directory where OxAPI caches data on disk.
+
+    Returns:
+        str : the path of the directory.
+    """
+    return os.getenv(
+        "OXAPI_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "oxapi")
+    )
+
+
+_selectors: Dict[tuple, EndpointSelector] = {}
+_selectors_lock = threading.Lock()
+
+
+def get_selector(base_urls: List[str]) -> EndpointSelector:
+    """Returns the selector for a list of base urls, created at first use.
+
+    Args:
+        base_urls: the base urls of the endpoints.
+
+    Returns:
+        EndpointSelector : the selector shared by all the calls to these endpoints.
+    """
+    key = tuple(url.rstrip("/") for url in base_urls)
+    with _selectors_lock:
+        if key not in _selectors:
+            _selectors[key] = EndpointSelector(list(base_urls))
+        return _selectors[key]
+
+
+def set_selector(selector: EndpointSelector) -> EndpointSelector:
+    """Registers a selector, replacing the one created for the same base urls.
+
+    Args:
+        selector: the selector.
+
+    Returns:
+        EndpointSelector : the selector itself.
+    """
+    with _selectors_lock:
+        _selectors[tuple(selector.base_urls)] = selector
+    return selector
+
+
+def get_base_url() -> str:
+    """Resolves the base url to be called from ``oxapi.base_url``, which can be a
+    single url, a list of urls of different regions or an EndpointSelector.
+
+    Returns:
+        str : the base url.
+    """
+    base_url = oxapi.base_url
+    if base_url is None:
+        return DEFAULT_BASE_URL
+    if isinstance(base_url, str):
+        return base_url
+    if isinstance(base_url, EndpointSelector):
+        return set_selector(base_url).get_base_url()
+    return get_selector(base_url).get_base_url()
+
+
+def _find(url: str):
+    """Finds the selector and the endpoint a url belongs to.
+
+    Args:
+        url: a full url.
+
+    Returns:
+        the selector and the base url, (None, None) if the url does not belong to a selector.
+    """
+    with _selectors_lock:
+        selectors = list(_selectors.values())
+    for selector in selectors:
+        base_url = selector.find_base_url(url)
+        if base_url is not None:
+            return selector, base_url
+    return None, None
+
+
+def report_response(url: str, response=None):
+    """Updates the health of the endpoint of a url after a call: a call failed
+    without a response or with a server error makes the endpoint avoided.
+
+    Args:
+        url: the full url of the call.
+        response: optional, the response of the API, None if the request failed without a response.
+    """
+    if response is None or response.status_code >= 500:
+        report_failure(url)
+    else:
+        report_success(url)
+
+
+def report_failure(url: str):
+    """Reports that a call to a url failed, so that its endpoint is avoided.
+
+    Args:
+        url: the full url of the call.
+    """
+    selector, base_url = _find(url)
+    if selector is not None:
+        selector.report_failure(base_url)
+
+
+def report_success(url: str):
+    """Reports that a call to a url succeeded.
+
+    Args:
+        url: the full url of the call.
+    """
+    selector, base_url = _find(url)
+    if selector is not None:
+        selector.report_success(base_url)
+
+
+def reroute(url: str) -> str:
+    """Moves a url to the currently selected endpoint of its selector.
+
+    Args:
+        url: the full url of a call.
+
+    Returns:
+        str : the url on the selected endpoint; the url itself if it does not belong to a selector.
+    """
+    selector, base_url = _find(url)
+    if selector is None:
+        return url
+    return selector.get_base_url() + url[len(base_url) :]
@@ -37,5 +37,13 @@ class NotAllowedException(OxAPIError):
     pass
 
 
+class DeadlineExceededException(OxAPIError):
+    pass
+
+
+class CircuitOpenException(OxAPIError):
+    pass
+
+
 class ModelNotFoundException(Exception):
     pass
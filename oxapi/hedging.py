@@ -0,0 +1,95 @@
+"""Module containing the policy for hedging the calls to OxAPI."""
+import math
+import threading
+from collections import deque
+
+
+class HedgingPolicy:
+    """Policy for hedged requests.
+
+    When the response to a call does not arrive within a delay derived from a
+    percentile of the latencies recently observed for the same endpoint, a duplicate
+    request is sent and the first response is used. The share of duplicated requests
+    is capped, so that hedging cannot increase the load on the API by more than
+    ``max_ratio``.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        initial_delay: float = 1.0,
+        min_delay: float = 0.05,
+        max_ratio: float = 0.1,
+        window: int = 200,
+        min_samples: int = 20,
+    ):
+        """Constructor.
+
+        Args:
+            percentile: percentile of the observed latencies after which a duplicate request is sent.
+            initial_delay: delay in seconds used until enough latencies have been observed for an endpoint.
+            min_delay: minimum delay in seconds before sending a duplicate request.
+            max_ratio: maximum ratio between duplicate requests and requests.
+            window: number of most recent latencies kept for each endpoint.
+            min_samples: number of latencies needed before the percentile is used.
+        """
+        if not 0 < percentile < 100:
+            raise ValueError("percentile of a HedgingPolicy must be between 0 and 100")
+        if not 0 <= max_ratio <= 1:
+            raise ValueError("max_ratio of a HedgingPolicy must be between 0 and 1")
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_ratio = max_ratio
+        self.window = window
+        self.min_samples = min_samples
+        self.requests = 0
+        self.hedges = 0
+        self._latencies = {}
+        self._lock = threading.Lock()
+
+    def record(self, url: str, latency: float):
+        """Records the latency of a call.
+
+        Args:
+            url: the url of the endpoint.
+            latency: the latency of the call in seconds.
+        """
+        with self._lock:
+            if url not in self._latencies:
+                self._latencies[url] = deque(maxlen=self.window)
+            self._latencies[url].append(latency)
+
+    def get_delay(self, url: str) -> float:
+        """Computes the delay after which a duplicate request is sent.
+
+        Args:
+            url: the url of the endpoint.
+
+        Returns:
+            float : the delay in seconds.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies.get(url, ()))
+        if len(latencies) < self.min_samples:
+            return max(self.initial_delay, self.min_delay)
+        rank = max(math.ceil(self.percentile / 100 * len(latencies)) - 1, 0)
+        return max(latencies[rank], self.min_delay)
+
+    def start_request(self):
+        """Counts a new request."""
+        with self._lock:
+            self.requests += 1
+
+    def try_hedge(self) -> bool:
+        """Checks whether a duplicate request may be sent without exceeding the
+        maximum ratio, and counts it.
+
+        Returns:
+            bool : True if the duplicate request may be sent.
+        """
+        with self._lock:
+            if self.hedges + 1 > self.max_ratio * self.requests:
+                return False
+            self.hedges += 1
+            return True
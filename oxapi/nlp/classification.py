@@ -1,16 +1,21 @@
-from typing import List, Union
-
-import pandas as pd
+from typing import TYPE_CHECKING, List, Union
 
 import oxapi
-from oxapi.abstract.api import ModelAPI
+from oxapi.abstract.api import ModelAPI, memoize_format
+from oxapi.columnar import get_columns, to_arrow, to_pandas, transpose
 from oxapi.error import ModelNotFoundException
 from oxapi.utils import OxapiNLPClassificationModel, OxapiType
 
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
 
 class Classification(ModelAPI):
     """Class for creating OxAPI calls to Transformation models."""
 
+    __slots__ = ()
+
     @classmethod
     def run(
         cls,
@@ -20,6 +25,7 @@ class Classification(ModelAPI):
         version: str = None,
         verbose: bool = False,
         raise_exceptions: bool = True,
+        deadline: float = None,
     ):
         """Function to run and perform a call to OxAPI Classification model.
 
@@ -31,6 +37,7 @@ class Classification(ModelAPI):
             verbose (bool): optional, True to enable verbose mode
             raise_exceptions (bool): default True, set to False to disable the raising of exceptions in case of error -
             you will be receiving only warnings.
+            deadline (float): optional, time budget in seconds of the call and its retries; DeadlineExceededException is raised when exceeded.
 
         Returns:
             Classification : an object of Classification class for fetching the result.
@@ -45,22 +52,74 @@ class Classification(ModelAPI):
             api_version=api_version,
             version=version,
         )
-        api, res = super().run(
-            api=api, verbose=verbose, body=body, raise_exceptions=raise_exceptions
+        api, result = super().run(
+            api=api,
+            verbose=verbose,
+            body=body,
+            raise_exceptions=raise_exceptions,
+            deadline=deadline,
+        )
+        api.set_params(result=result, input_texts=texts)
+        return api
+
+    @classmethod
+    async def arun(
+        cls,
+        model: str,
+        texts: List[str],
+        api_version: str = None,
+        version: str = None,
+        verbose: bool = False,
+        raise_exceptions: bool = True,
+        deadline: float = None,
+    ):
+        """Coroutine to run and perform a call to OxAPI Classification model without
+        blocking the event loop.
+
+        Args:
+            model (str): model to be invoked by the Classification API.
+            texts (List[str]): the list of text passed to the Classification model.
+            api_version (str): version of the API; if nothing is passed, default value will be used.
+            version (str): version of the model; if nothing is passed, default value will be used.
+            verbose (bool): optional, True to enable verbose mode
+            raise_exceptions (bool): default True, set to False to disable the raising of exceptions in case of error -
+            you will be receiving only warnings.
+            deadline (float): optional, time budget in seconds of the call and its retries; DeadlineExceededException is raised when exceeded.
+
+        Returns:
+            Classification : an object of Classification class for fetching the result.
+        """
+        api = cls.prepare(
+            model=model,
+            texts=texts,
+            api_version=api_version,
+            version=version,
+            deadline=deadline,
+        )
+        api, result = await super().arun(
+            api=api,
+            verbose=verbose,
+            body=api._body,
+            raise_exceptions=raise_exceptions,
+            deadline=deadline,
         )
-        api.set_params(result=res.json() if res is not None else res, input_texts=texts)
+        api.set_params(result=result)
         return api
 
+    @memoize_format
     def format_result(
         self, result_format: str = "pd"
-    ) -> Union[pd.DataFrame, dict, None]:
+    ) -> Union["pd.DataFrame", "pa.Table", dict, None]:
         """Function for getting the result processed in the available formats.
 
+        The 'pd' and 'arrow' formats are built column by column from the results, with a column for the text and one
+        for each label.
+
         Args:
-            result_format (str): default 'pd', desired format for the output. Available formats are: ['pd', 'dict'].
+            result_format (str): default 'pd', desired format for the output. Available formats are: ['pd', 'arrow', 'dict'].
 
         Returns:
-            Union[pandas.Dataframe, dict, None] : the result in the desired format; None if no result is available.
+            Union[pandas.Dataframe, pyarrow.Table, dict, None] : the result in the desired format; None if no result is available.
         """
         try:
             self.input_texts
@@ -72,46 +131,56 @@ class Classification(ModelAPI):
             return None
 
         labels = self.model.get_labels()
+        results = self.result["results"]
         if self.model == OxapiNLPClassificationModel.DIALOG_TOPICS:
             input_texts = ["\n".join(self.input_texts)]
+            outputs = [list(results)]
         else:
             input_texts = self.input_texts
+            outputs = transpose(results, len(labels))
 
         if result_format == "pd":
-            tmp_in = pd.DataFrame(input_texts, columns=["text"])
-            tmp_out = pd.DataFrame(self.result["results"], columns=labels)
-            return pd.concat([tmp_in, tmp_out], axis=1)
+            return to_pandas(get_columns(["text"] + labels, [input_texts] + outputs))
+        elif result_format == "arrow":
+            types = {label: "string" for label in labels}
+            types.update(text="string", confidence_score="float64")
+            return to_arrow(
+                get_columns(["text"] + labels, [input_texts] + outputs), types
+            )
         elif result_format == "dict":
-
             if self.model == OxapiNLPClassificationModel.DIALOG_TOPICS:
-                tmp_out = {
-                    i: {
-                        "text": input_texts[0],
-                        "output": {"label": self.result["results"][0]},
-                    }
+                return {
+                    i: {"text": input_texts[0], "output": {"label": results[0]}}
                     for i in range(0, len(input_texts))
                 }
-            else:
-                tmp_out = {
-                    i: {"text": input_texts[i], "output": {}}
-                    for i in range(0, len(input_texts))
-                }
-                for k in tmp_out.keys():
-                    for i in range(0, len(self.result["results"][k])):
-                        tmp_out[k]["output"][labels[i]] = self.result["results"][k][i]
-
-            return tmp_out
+            return {
+                i: {"text": input_texts[i], "output": dict(zip(labels, results[i]))}
+                for i in range(0, len(input_texts))
+            }
         else:
             raise ValueError(
                 "{0} is not a valid format for the output.\
-            Available formats: ['pd', 'dict']".format(
+            Available formats: ['pd', 'arrow', 'dict']".format(
                     result_format
                 )
             )
 
+    def _chunkable(self) -> bool:
+        """Checks whether the texts of the call can be split into chunks.
+
+        Returns:
+            bool : False for dialog-topics, which classifies all the texts as a single dialog.
+        """
+        return self.model != OxapiNLPClassificationModel.DIALOG_TOPICS
+
     @classmethod
     def prepare(
-        cls, model: str, texts: List[str], api_version: str = None, version: str = None
+        cls,
+        model: str,
+        texts: List[str],
+        api_version: str = None,
+        version: str = None,
+        deadline: float = None,
     ):
         """Function to run a call to OxAPI Classification model without
         performing it. It will only set the parameters. A `Classification`
@@ -123,6 +192,7 @@ class Classification(ModelAPI):
             texts (List[str]): the list of text passed to the Classification model.
             api_version (str): version of the API; if nothing is passed, default value will be used.
             version (str): version of the model; if nothing is passed, default value will be used.
+            deadline (float): optional, time budget in seconds of the call and its retries when run in an `AsyncCallPipe`.
 
         Returns:
             Classification : an object of Classification class having the parameters set.
@@ -137,7 +207,7 @@ class Classification(ModelAPI):
             api_version=api_version,
             version=version,
         )
-        api.set_params(body=body, input_texts=texts)
+        api.set_params(body=body, input_texts=texts, deadline=deadline)
         return api
 
     @classmethod
@@ -1,15 +1,38 @@
-from typing import List, Union
-
-import pandas as pd
+import copy
+import time
+from concurrent import futures
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import oxapi
-from oxapi.abstract.api import ModelAPI
+from oxapi.abstract.api import ModelAPI, memoize_format
+from oxapi.cache import CompletionCache
 from oxapi.error import ModelNotFoundException
 from oxapi.utils import OxapiNLPCompletionModel, OxapiType
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 class Completion(ModelAPI):
-    """Class for creating OxAPI calls to Completion models."""
+    """Class for creating OxAPI calls to Completion models.
+
+    The results of the deterministic calls are kept in the ``cache`` of the class,
+    if any.
+    """
+
+    __slots__ = ()
+
+    cache: CompletionCache = None
 
     @classmethod
     def run(
@@ -20,6 +43,7 @@ class Completion(ModelAPI):
         version: str = None,
         verbose: bool = False,
         raise_exceptions: bool = True,
+        deadline: float = None,
         **kwargs
     ):
         """Function to run and perform a call to OxAPI Completion model.
@@ -32,6 +56,7 @@ class Completion(ModelAPI):
             verbose (bool): optional, True to enable verbose mode
             raise_exceptions (bool): deafult True, set to False to disable the raising of exceptions in case of error - \
                 you will be receiving only warnings.
+            deadline (float): optional, time budget in seconds of the call and its retries; DeadlineExceededException is raised when exceeded.
             **kwargs: additional parameters for the API call. See the OxAPI documentation: https://api.oxolo.com/documentation#parameters
 
         Returns:
@@ -48,15 +73,209 @@ class Completion(ModelAPI):
             api_version=api_version,
             version=version,
         )
-        api, res = super().run(
-            api=api, verbose=verbose, body=body, raise_exceptions=raise_exceptions
+        api, result = super().run(
+            api=api,
+            verbose=verbose,
+            body=body,
+            raise_exceptions=raise_exceptions,
+            deadline=deadline,
+        )
+        api.set_params(result=result, prompt=prompt)
+        return api
+
+    @classmethod
+    async def arun(
+        cls,
+        model: str,
+        prompt: str,
+        api_version: str = None,
+        version: str = None,
+        verbose: bool = False,
+        raise_exceptions: bool = True,
+        deadline: float = None,
+        **kwargs
+    ):
+        """Coroutine to run and perform a call to OxAPI Completion model without
+        blocking the event loop.
+
+        Args:
+            model (str): model to be invoked by the Completion API.
+            prompt (str): the prompt to be passed to the Completion model.
+            api_version (str): version of the API; if nothing is passed, default value will be used.
+            version (str): version of the model; if nothing is passed, default value will be used.
+            verbose (bool): optional, True to enable verbose mode
+            raise_exceptions (bool): default True, set to False to disable the raising of exceptions in case of error - \
+                you will be receiving only warnings.
+            deadline (float): optional, time budget in seconds of the call and its retries; DeadlineExceededException is raised when exceeded.
+            **kwargs: additional parameters for the API call. See the OxAPI documentation: https://api.oxolo.com/documentation#parameters
+
+        Returns:
+            Completion : an object of Completion class for fetching the result.
+        """
+        api = cls.prepare(
+            model=model,
+            prompt=prompt,
+            api_version=api_version,
+            version=version,
+            deadline=deadline,
+            **kwargs
+        )
+        api, result = await super().arun(
+            api=api,
+            verbose=verbose,
+            body=api._body,
+            raise_exceptions=raise_exceptions,
+            deadline=deadline,
         )
-        api.set_params(result=res.json() if res is not None else res, prompt=prompt)
+        api.set_params(result=result)
         return api
 
+    @classmethod
+    def run_many(
+        cls,
+        model: str,
+        prompts: Iterable[str],
+        api_version: str = None,
+        version: str = None,
+        max_in_flight: int = 8,
+        ordered: bool = True,
+        progress: Callable[[int, int], None] = None,
+        deadline: float = None,
+        **kwargs
+    ) -> Dict[str, list]:
+        """Function to run a call to OxAPI Completion model for each of many prompts,
+        with a bounded number of calls running at the same time.
+
+        Args:
+            model (str): model to be invoked by the Completion API.
+            prompts (Iterable[str]): the prompts to be passed to the Completion model.
+            api_version (str): version of the API; if nothing is passed, default value will be used.
+            version (str): version of the model; if nothing is passed, default value will be used.
+            max_in_flight (int): default 8, maximum number of calls running at the same time.
+            ordered (bool): default True, True to return the rows in the order of the prompts, False in order of completion.
+            progress (Callable[[int, int], None]): optional, function called with the number of completed calls and the number of prompts after each call.
+            deadline (float): optional, time budget in seconds of each call and its retries.
+            **kwargs: additional parameters for the API call. See the OxAPI documentation: https://api.oxolo.com/documentation#parameters
+
+        Returns:
+            Dict[str, list] : the columns 'index', 'prompt', 'output', 'latency' (in seconds) and 'error' (None for the successful calls).
+        """
+        columns = {
+            "index": [],
+            "prompt": [],
+            "output": [],
+            "latency": [],
+            "error": [],
+        }
+        rows = list(
+            cls.iter_many(
+                model=model,
+                prompts=prompts,
+                api_version=api_version,
+                version=version,
+                max_in_flight=max_in_flight,
+                progress=progress,
+                deadline=deadline,
+                **kwargs
+            )
+        )
+        if ordered:
+            rows.sort(key=lambda row: row["index"])
+        for row in rows:
+            for name, column in columns.items():
+                column.append(row[name])
+        return columns
+
+    @classmethod
+    def iter_many(
+        cls,
+        model: str,
+        prompts: Iterable[str],
+        api_version: str = None,
+        version: str = None,
+        max_in_flight: int = 8,
+        progress: Callable[[int, int], None] = None,
+        deadline: float = None,
+        **kwargs
+    ) -> Iterator[dict]:
+        """Function to run a call to OxAPI Completion model for each of many prompts,
+        yielding each call as soon as it completes.
+
+        The prompts are consumed lazily, so that at most ``max_in_flight`` calls exist
+        at the same time. Failed calls are retried according to the retry policy of
+        the client.
+
+        Args:
+            model (str): model to be invoked by the Completion API.
+            prompts (Iterable[str]): the prompts to be passed to the Completion model.
+            api_version (str): version of the API; if nothing is passed, default value will be used.
+            version (str): version of the model; if nothing is passed, default value will be used.
+            max_in_flight (int): default 8, maximum number of calls running at the same time.
+            progress (Callable[[int, int], None]): optional, function called with the number of completed calls and the number of prompts (None if unknown) after each call.
+            deadline (float): optional, time budget in seconds of each call and its retries.
+            **kwargs: additional parameters for the API call. See the OxAPI documentation: https://api.oxolo.com/documentation#parameters
+
+        Returns:
+            Iterator[dict] : for each prompt, in order of completion, its 'index', 'prompt', 'output', 'latency' (in seconds) and 'error' (None for a successful call).
+        """
+        Completion.__check_input_model(model)
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        total = len(prompts) if hasattr(prompts, "__len__") else None
+
+        def complete(index: int, prompt: str) -> dict:
+            started = time.monotonic()
+            output, error = None, None
+            try:
+                api = cls.run(
+                    model=model,
+                    prompt=prompt,
+                    api_version=api_version,
+                    version=version,
+                    raise_exceptions=False,
+                    deadline=deadline,
+                    **kwargs
+                )
+                error = api.error
+                if api.result is not None:
+                    output = api.result["results"][0]
+            except Exception as e:
+                oxapi.logger.warning(
+                    "Request failed for prompt {0}: {1}".format(index, e)
+                )
+                error = e
+            return {
+                "index": index,
+                "prompt": prompt,
+                "output": output,
+                "latency": time.monotonic() - started,
+                "error": error,
+            }
+
+        pending = enumerate(prompts)
+        completed = 0
+        running = set()
+        with futures.ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            while True:
+                for index, prompt in pending:
+                    running.add(executor.submit(complete, index, prompt))
+                    if len(running) >= max_in_flight:
+                        break
+                if not running:
+                    return
+                done, running = futures.wait(
+                    running, return_when=futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    completed += 1
+                    if progress is not None:
+                        progress(completed, total)
+                    yield future.result()
+
+    @memoize_format
     def format_result(
         self, result_format: str = "str"
-    ) -> Union[str, pd.DataFrame, None]:
+    ) -> Union[str, "pd.DataFrame", None]:
         """Function for getting the result processed in the available formats.
 
         Args:
@@ -65,6 +284,8 @@ class Completion(ModelAPI):
         Returns:
             Union[str, pandas.DataFrame, None] : the result in the desired format; None if no result is available.
         """
+        import pandas as pd
+
         try:
             self.prompt
         except AttributeError:
@@ -95,6 +316,7 @@ class Completion(ModelAPI):
         prompt: str,
         api_version: str = None,
         version: str = None,
+        deadline: float = None,
         **kwargs
     ):
         """Function to run a call to OxAPI Completion model without performing
@@ -106,6 +328,7 @@ class Completion(ModelAPI):
             prompt (str): the prompt to be passed to the Completion model.
             api_version (str): version of the API; if nothing is passed, default value will be used.
             version (str): version of the model; if nothing is passed, default value will be used.
+            deadline (float): optional, time budget in seconds of the call and its retries when run in an `AsyncCallPipe`.
             **kwargs: additional parameters for the API call. See the OxAPI documentation: https://api.oxolo.com/documentation#parameters
 
         Returns:
@@ -122,9 +345,51 @@ class Completion(ModelAPI):
             api_version=api_version,
             version=version,
         )
-        api.set_params(body=body, prompt=prompt)
+        api.set_params(body=body, prompt=prompt, deadline=deadline)
         return api
 
+    def _lookup_cache(
+        self, body: dict
+    ) -> Tuple[Optional[List[tuple]], Optional[list], Optional[dict]]:
+        """Looks up the result of a deterministic call in the cache.
+
+        Args:
+            body: the body of the call.
+
+        Returns:
+            Tuple[Optional[List[tuple]], Optional[list], Optional[dict]] : the cache key of the call, its cached result
+            (None for a miss) and the body to be sent to the API, None if the result is cached; the key and the result
+            are None, and the body unchanged, if the call is not cached.
+        """
+        if self.cache is None or not self.cache.accepts(body):
+            return None, None, body
+        key = self.cache.get_key(self.model.value, self.version, self.api_version, body)
+        cached = self.cache.get_many([key])
+        return [key], cached, body if cached[0] is None else None
+
+    def _merge_cache(
+        self, keys: Optional[List[tuple]], cached: Optional[list], result: dict
+    ) -> Optional[dict]:
+        """Stores a copy of the result received from the API in the cache, or returns
+        a copy of the cached one, so that the callers modifying their result do not
+        alter the cache.
+
+        Args:
+            keys: the cache key of the call, None if the call is not cached.
+            cached: the cached result, None for a miss.
+            result: the decoded result of the call, None in case of error.
+
+        Returns:
+            Optional[dict] : the result of the call, None in case of error.
+        """
+        if keys is None:
+            return result
+        if cached[0] is not None:
+            return copy.deepcopy(cached[0])
+        if result is not None:
+            self.cache.put_many(keys, [copy.deepcopy(result)])
+        return result
+
     @classmethod
     def list_models(cls) -> List[str]:
         """Function to list of models for Classification.
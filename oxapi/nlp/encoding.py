@@ -1,15 +1,32 @@
-from typing import List, Union
-
-import numpy as np
+from typing import TYPE_CHECKING, List, Optional, Union
 
 import oxapi
-from oxapi.abstract.api import ModelAPI
+from oxapi.abstract.api import ModelAPI, memoize_format
+from oxapi.cache import EmbeddingCache
+from oxapi.coalescing import SlicedResponse
 from oxapi.error import ModelNotFoundException
 from oxapi.utils import OxapiNLPEncodingModel, OxapiType
+from oxapi.wire import JSON, decode_embeddings, get_accept
+
+if TYPE_CHECKING:
+    import numpy as np
 
 
 class Encoding(ModelAPI):
-    """Class for creating OxAPI calls to Encoding models."""
+    """Class for creating OxAPI calls to Encoding models.
+
+    The embeddings of single texts are kept in the ``cache`` of the class, if any,
+    and only the texts missing from it are sent to the API.
+
+    The ``wire_format`` of the class negotiates a binary response format with the
+    API ('base64' or 'octet-stream'), decoded into a float32 matrix without copies;
+    the responses of the servers not supporting it are decoded from JSON.
+    """
+
+    __slots__ = ()
+
+    cache: EmbeddingCache = None
+    wire_format: str = JSON
 
     @classmethod
     def run(
@@ -20,6 +37,7 @@ class Encoding(ModelAPI):
         version: str = None,
         verbose: bool = False,
         raise_exceptions: bool = True,
+        deadline: float = None,
     ):
         """Function to run and perform a call to OxAPI Encoding model.
 
@@ -31,6 +49,7 @@ class Encoding(ModelAPI):
             verbose (bool): optional, True to enable verbose mode
             raise_exceptions (bool): default True, set to False to disable the raising of exceptions in case of error -
             you will be receiving only warnings.
+            deadline (float): optional, time budget in seconds of the call and its retries; DeadlineExceededException is raised when exceeded.
 
         Returns:
             Encoding : an object of Encoding class for fetching the result.
@@ -45,21 +64,83 @@ class Encoding(ModelAPI):
             api_version=api_version,
             version=version,
         )
-        api, res = super().run(
-            api=api, verbose=verbose, body=body, raise_exceptions=raise_exceptions
+        api, result = super().run(
+            api=api,
+            verbose=verbose,
+            body=body,
+            raise_exceptions=raise_exceptions,
+            deadline=deadline,
         )
-        api.set_params(result=res.json() if res is not None else res, input_texts=texts)
+        api.set_params(result=result, input_texts=texts)
         return api
 
-    def format_result(self, result_format: str = "np") -> Union[np.ndarray, dict, None]:
+    @classmethod
+    async def arun(
+        cls,
+        model: str,
+        texts: List[str],
+        api_version: str = None,
+        version: str = None,
+        verbose: bool = False,
+        raise_exceptions: bool = True,
+        deadline: float = None,
+    ):
+        """Coroutine to run and perform a call to OxAPI Encoding model without
+        blocking the event loop.
+
+        Args:
+            model (str): model to be invoked by the Encoding API.
+            texts (List[str]): the list of text passed to the Encoding model.
+            api_version (str): version of the API; if nothing is passed, default value will be used.
+            version (str): version of the model; if nothing is passed, default value will be used.
+            verbose (bool): optional, True to enable verbose mode
+            raise_exceptions (bool): default True, set to False to disable the raising of exceptions in case of error -
+            you will be receiving only warnings.
+            deadline (float): optional, time budget in seconds of the call and its retries; DeadlineExceededException is raised when exceeded.
+
+        Returns:
+            Encoding : an object of Encoding class for fetching the result.
+        """
+        api = cls.prepare(
+            model=model,
+            texts=texts,
+            api_version=api_version,
+            version=version,
+            deadline=deadline,
+        )
+        api, result = await super().arun(
+            api=api,
+            verbose=verbose,
+            body=api._body,
+            raise_exceptions=raise_exceptions,
+            deadline=deadline,
+        )
+        api.set_params(result=result)
+        return api
+
+    @memoize_format
+    def format_result(
+        self,
+        result_format: str = "np",
+        dtype: str = "float64",
+        normalize: bool = False,
+    ) -> Union["np.ndarray", dict, None]:
         """Function for getting the result processed in the available formats.
 
+        The embeddings are decoded into a single C-contiguous matrix; in 'dict' format, the embedding of each text is
+        a view on a row of this matrix. Embeddings received in a binary wire format are not copied when they already
+        have the desired type and are not normalized, in which case the matrix is read-only.
+
         Args:
             result_format (str): default 'np', desired format for the output. Available formats are: ['np', 'dict'].
+            dtype (str): default 'float64', type of the values of the embeddings. Available types are: ['float64', 'float32', 'float16'].
+            normalize (bool): default False, True to scale every embedding to unit L2 norm.
 
         Returns:
             Union[numpy.ndarray, dict, None] : the result in the desired format; None if no result is available.
         """
+        import numpy as np
+
         try:
             self.input_texts
         except AttributeError:
@@ -68,27 +149,56 @@ class Encoding(ModelAPI):
         if self.result is None:
             oxapi.logger.warning("Results are not available")
             return None
-        if result_format == "np":
-            return np.array([np.array(el) for el in self.result["results"]])
-        elif result_format == "dict":
-            return {
-                i: {
-                    "text": self.input_texts[i],
-                    "embedding": np.array(self.result["results"][i]),
-                }
-                for i in range(0, len(self.input_texts))
-            }
-        else:
+        if result_format not in ("np", "dict"):
             raise ValueError(
                 "{0} is not a valid format for the output.\
             Available formats: ['np', 'dict']".format(
                     result_format
                 )
             )
+        if dtype not in ("float64", "float32", "float16"):
+            raise ValueError(
+                "{0} is not a valid type for the embeddings.\
+            Available types: ['float64', 'float32', 'float16']".format(
+                    dtype
+                )
+            )
+        # decoded in a single pass, without intermediate arrays; normalized in place
+        # on a copy only, as binary results may be read-only views on the response
+        if normalize:
+            matrix = np.array(self.result["results"], dtype=dtype, order="C")
+        else:
+            matrix = np.asarray(self.result["results"], dtype=dtype, order="C")
+        if normalize and matrix.size > 0:
+            # norms accumulated in float32 at least, to avoid float16 overflows
+            norms = np.sqrt(
+                np.einsum(
+                    "ij,ij->i",
+                    matrix,
+                    matrix,
+                    dtype=np.promote_types(matrix.dtype, np.float32),
+                )
+            )
+            norms[norms == 0] = 1
+            matrix /= norms[:, np.newaxis].astype(matrix.dtype)
+        if result_format == "np":
+            return matrix
+        return {
+            i: {
+                "text": self.input_texts[i],
+                "embedding": matrix[i],
+            }
+            for i in range(0, len(self.input_texts))
+        }
 
     @classmethod
     def prepare(
-        cls, model: str, texts: List[str], api_version: str = None, version: str = None
+        cls,
+        model: str,
+        texts: List[str],
+        api_version: str = None,
+        version: str = None,
+        deadline: float = None,
     ):
         """Function to run a call to OxAPI Encoding model without performing
         it. It will only set the parameters. An `Encoding` object instantiated
@@ -99,6 +209,7 @@ class Encoding(ModelAPI):
             texts (List[str]): the list of text passed to the Encoding model.
             api_version (str): version of the API; if nothing is passed, default value will be used.
             version (str): version of the model; if nothing is passed, default value will be used.
+            deadline (float): optional, time budget in seconds of the call and its retries when run in an `AsyncCallPipe`.
 
         Returns:
             Encoding : an object of Encoding class having the parameters set.
@@ -113,9 +224,63 @@ class Encoding(ModelAPI):
             api_version=api_version,
             version=version,
         )
-        api.set_params(body=body, input_texts=texts)
+        api.set_params(body=body, input_texts=texts, deadline=deadline)
         return api
 
+    def _get_accept(self) -> Optional[str]:
+        """Returns the Accept header negotiating the wire format of the class.
+
+        Returns:
+            Optional[str] : the value of the header, None for JSON.
+        """
+        return get_accept(self.wire_format)
+
+    def _decode_response(self, response) -> dict:
+        """Decodes the successful response of the API, whatever its wire format.
+
+        Args:
+            response: the response of the API.
+
+        Returns:
+            dict : the decoded result.
+        """
+        if isinstance(response, SlicedResponse):
+            return response.decode(decode_embeddings)
+        return decode_embeddings(response)
+
+    def _merge_cache(
+        self, keys: Optional[List[tuple]], cached: Optional[list], result: dict
+    ) -> Optional[dict]:
+        """Stores the embeddings received from the API in the cache and stitches them
+        with the cached ones, in the order of the texts.
+
+        The cached float32 vectors and the received embeddings are written straight
+        into the rows of a float32 matrix, without converting them to lists.
+
+        Args:
+            keys: the cache keys of the texts, None if the call is not cached.
+            cached: the cached vectors, None for the misses.
+            result: the decoded result of the call for the missing texts, None in case of error.
+
+        Returns:
+            Optional[dict] : the result for all the texts, None in case of error.
+        """
+        if keys is None or result is None:
+            return result
+        import numpy as np
+
+        missing = [i for i, value in enumerate(cached) if value is None]
+        self.cache.put_many([keys[i] for i in missing], result["results"])
+        hits = [i for i, value in enumerate(cached) if value is not None]
+        if not hits:
+            return result
+        matrix = np.empty((len(cached), len(cached[hits[0]])), dtype=np.float32)
+        for i in hits:
+            matrix[i] = cached[i]
+        if missing:
+            matrix[missing] = result["results"]
+        return dict(result, results=matrix)
+
     @classmethod
     def list_models(cls) -> List[str]:
         """Function to list of models for Encoding.
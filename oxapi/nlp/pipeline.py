@@ -1,7 +1,7 @@
 from typing import List, Union
 
 import oxapi
-from oxapi.abstract.api import ModelAPI
+from oxapi.abstract.api import ModelAPI, memoize_format
 from oxapi.error import ModelNotFoundException
 from oxapi.utils import OxapiNLPPipelineModel, OxapiType
 
@@ -9,6 +9,8 @@ from oxapi.utils import OxapiNLPPipelineModel, OxapiType
 class Pipeline(ModelAPI):
     """Class for creating OxAPI calls to Pipeline models."""
 
+    __slots__ = ()
+
     @classmethod
     def run(
         cls,
@@ -18,6 +20,7 @@ class Pipeline(ModelAPI):
         version: str = None,
         verbose: bool = False,
         raise_exceptions: bool = True,
+        deadline: float = None,
     ):
         """Function to run and perform a call to OxAPI Pipeline model.
 
@@ -29,6 +32,7 @@ class Pipeline(ModelAPI):
             verbose (bool): optional, True to enable verbose mode
             raise_exceptions (bool): default True, set to False to disable the raising of exceptions in case of error -
             you will be receiving only warnings.
+            deadline (float): optional, time budget in seconds of the call and its retries; DeadlineExceededException is raised when exceeded.
 
         Returns:
             Pipeline : an object of Pipeline class for fetching the result.
@@ -43,12 +47,61 @@ class Pipeline(ModelAPI):
             api_version=api_version,
             version=version,
         )
-        api, res = super().run(
-            api=api, verbose=verbose, body=body, raise_exceptions=raise_exceptions
+        api, result = super().run(
+            api=api,
+            verbose=verbose,
+            body=body,
+            raise_exceptions=raise_exceptions,
+            deadline=deadline,
+        )
+        api.set_params(result=result, input_texts=texts)
+        return api
+
+    @classmethod
+    async def arun(
+        cls,
+        model: str,
+        texts: List[str],
+        api_version: str = None,
+        version: str = None,
+        verbose: bool = False,
+        raise_exceptions: bool = True,
+        deadline: float = None,
+    ):
+        """Coroutine to run and perform a call to OxAPI Pipeline model without
+        blocking the event loop.
+
+        Args:
+            model (str): model to be invoked by the Pipeline API.
+            texts (List[str]): the list of text passed to the Pipeline model.
+            api_version (str): version of the API; if nothing is passed, default value will be used.
+            version (str): version of the model; if nothing is passed, default value will be used.
+            verbose (bool): optional, True to enable verbose mode
+            raise_exceptions (bool): default True, set to False to disable the raising of exceptions in case of error -
+            you will be receiving only warnings.
+            deadline (float): optional, time budget in seconds of the call and its retries; DeadlineExceededException is raised when exceeded.
+
+        Returns:
+            Pipeline : an object of Pipeline class for fetching the result.
+        """
+        api = cls.prepare(
+            model=model,
+            texts=texts,
+            api_version=api_version,
+            version=version,
+            deadline=deadline,
+        )
+        api, result = await super().arun(
+            api=api,
+            verbose=verbose,
+            body=api._body,
+            raise_exceptions=raise_exceptions,
+            deadline=deadline,
         )
-        api.set_params(result=res.json() if res is not None else res, input_texts=texts)
+        api.set_params(result=result)
         return api
 
+    @memoize_format
     def format_result(self, result_format: str = "dict") -> Union[dict, None]:
         """Function for getting the result processed in the available formats.
 
@@ -80,7 +133,12 @@ class Pipeline(ModelAPI):
 
     @classmethod
     def prepare(
-        cls, model: str, texts: List[str], api_version: str = None, version: str = None
+        cls,
+        model: str,
+        texts: List[str],
+        api_version: str = None,
+        version: str = None,
+        deadline: float = None,
     ):
         """Function to run a call to OxAPI Pipeline model without performing
         it. It will only set the parameters. A `Pipeline` object instantiated
@@ -91,6 +149,7 @@ class Pipeline(ModelAPI):
             texts (List[str]): the list of text passed to the Pipeline model.
             api_version (str): version of the API; if nothing is passed, default value will be used.
             version (str): version of the model; if nothing is passed, default value will be used.
+            deadline (float): optional, time budget in seconds of the call and its retries when run in an `AsyncCallPipe`.
 
         Returns:
             Pipeline : an object of Pipeline class having the parameters set.
@@ -105,7 +164,7 @@ class Pipeline(ModelAPI):
             api_version=api_version,
             version=version,
         )
-        api.set_params(body=body, input_texts=texts)
+        api.set_params(body=body, input_texts=texts, deadline=deadline)
         return api
 
     @classmethod
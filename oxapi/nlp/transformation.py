@@ -1,16 +1,21 @@
-from typing import List, Union
-
-import pandas as pd
+from typing import TYPE_CHECKING, List, Union
 
 import oxapi
-from oxapi.abstract.api import ModelAPI
+from oxapi.abstract.api import ModelAPI, memoize_format
+from oxapi.columnar import get_columns, to_arrow, to_pandas, transpose
 from oxapi.error import ModelNotFoundException
 from oxapi.utils import OxapiNLPTransformationModel, OxapiType
 
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
 
 class Transformation(ModelAPI):
     """Class for creating OxAPI calls to Transformation models."""
 
+    __slots__ = ()
+
     @classmethod
     def run(
         cls,
@@ -20,6 +25,7 @@ class Transformation(ModelAPI):
         version: str = None,
         verbose: bool = False,
         raise_exceptions: bool = True,
+        deadline: float = None,
     ):
         """Function to run and perform a call to OxAPI Transformation model.
 
@@ -31,6 +37,7 @@ class Transformation(ModelAPI):
             verbose (bool): optional, True to enable verbose mode
             raise_exceptions (bool): default True, set to False to disable the raising of exceptions in case of error -
             you will be receiving only warnings.
+            deadline (float): optional, time budget in seconds of the call and its retries; DeadlineExceededException is raised when exceeded.
 
         Returns:
             Transformation : an object of Transformation class for fetching the result.
@@ -45,22 +52,71 @@ class Transformation(ModelAPI):
             api_version=api_version,
             version=version,
         )
-        api, res = super().run(
-            api=api, verbose=verbose, body=body, raise_exceptions=raise_exceptions
+        api, result = super().run(
+            api=api,
+            verbose=verbose,
+            body=body,
+            raise_exceptions=raise_exceptions,
+            deadline=deadline,
         )
-        api.set_params(result=res.json() if res is not None else res, input_texts=texts)
+        api.set_params(result=result, input_texts=texts)
         return api
 
+    @classmethod
+    async def arun(
+        cls,
+        model: str,
+        texts: List[str],
+        api_version: str = None,
+        version: str = None,
+        verbose: bool = False,
+        raise_exceptions: bool = True,
+        deadline: float = None,
+    ):
+        """Coroutine to run and perform a call to OxAPI Transformation model without
+        blocking the event loop.
+
+        Args:
+            model (str): model to be invoked by the Transformation API.
+            texts (List[str]): the list of text passed to the Transformation model.
+            api_version (str): version of the API; if nothing is passed, default value will be used.
+            version (str): version of the model; if nothing is passed, default value will be used.
+            verbose (bool): optional, True to enable verbose mode
+            raise_exceptions (bool): default True, set to False to disable the raising of exceptions in case of error -
+            you will be receiving only warnings.
+            deadline (float): optional, time budget in seconds of the call and its retries; DeadlineExceededException is raised when exceeded.
+
+        Returns:
+            Transformation : an object of Transformation class for fetching the result.
+        """
+        api = cls.prepare(
+            model=model,
+            texts=texts,
+            api_version=api_version,
+            version=version,
+            deadline=deadline,
+        )
+        api, result = await super().arun(
+            api=api,
+            verbose=verbose,
+            body=api._body,
+            raise_exceptions=raise_exceptions,
+            deadline=deadline,
+        )
+        api.set_params(result=result)
+        return api
+
+    @memoize_format
     def format_result(
         self, result_format: str = "pd"
-    ) -> Union[pd.DataFrame, dict, None]:
+    ) -> Union["pd.DataFrame", "pa.Table", dict, None]:
         """Function for getting the result processed in the available formats.
 
         Args:
-            result_format (str): default 'pd', desired format for the output. Available formats are: ['pd', 'dict'].
+            result_format (str): default 'pd', desired format for the output. Available formats are: ['pd', 'arrow', 'dict'].
 
         Returns:
-            Union[pandas.Dataframe, dict, None] : the result in the desired format; None if no result is available.
+            Union[pandas.Dataframe, pyarrow.Table, dict, None] : the result in the desired format; None if no result is available.
         """
         try:
             self.input_texts
@@ -70,10 +126,18 @@ class Transformation(ModelAPI):
         if self.result is None:
             oxapi.logger.warning("Results are not available")
             return None
+        outputs = self.result["results"]
+        if outputs and isinstance(outputs[0], (list, tuple)):
+            # each output given as a row with a single value
+            outputs = transpose(outputs, 1)[0]
+        columns = [list(self.input_texts), list(outputs)]
         if result_format == "pd":
-            tmp_in = pd.DataFrame(self.input_texts, columns=["text"])
-            tmp_out = pd.DataFrame(self.result["results"], columns=["output"])
-            return pd.concat([tmp_in, tmp_out], axis=1)
+            return to_pandas(get_columns(["text", "output"], columns))
+        elif result_format == "arrow":
+            return to_arrow(
+                get_columns(["text", "output"], columns),
+                {"text": "string", "output": "string"},
+            )
         elif result_format == "dict":
             return {
                 i: {"text": self.input_texts[i], "output": self.result["results"][i]}
@@ -82,14 +146,19 @@ class Transformation(ModelAPI):
         else:
             raise ValueError(
                 "{0} is not a valid format for the output.\
-            Available formats: ['pd', 'dict']".format(
+            Available formats: ['pd', 'arrow', 'dict']".format(
                     result_format
                 )
             )
 
     @classmethod
     def prepare(
-        cls, model: str, texts: List[str], api_version: str = None, version: str = None
+        cls,
+        model: str,
+        texts: List[str],
+        api_version: str = None,
+        version: str = None,
+        deadline: float = None,
     ):
         """Function to run a call to OxAPI Transformation model without
         performing it. It will only set the parameters. A `Transformation`
@@ -101,6 +170,7 @@ class Transformation(ModelAPI):
             texts (List[str]): the list of text passed to the Transformation model.
             api_version (str): version of the API; if nothing is passed, default value will be used.
             version (str): version of the model; if nothing is passed, default value will be used.
+            deadline (float): optional, time budget in seconds of the call and its retries when run in an `AsyncCallPipe`.
 
         Returns:
             Transformation : an object of Transformation class having the parameters set.
@@ -115,7 +185,7 @@ class Transformation(ModelAPI):
             api_version=api_version,
             version=version,
         )
-        api.set_params(body=body, input_texts=texts)
+        api.set_params(body=body, input_texts=texts, deadline=deadline)
         return api
 
     @classmethod
@@ -0,0 +1,70 @@
+"""Module containing the rate limiting utilities used when calling OxAPI."""
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """Token bucket limiting the rate at which requests (or texts) are sent.
+
+    The bucket refills at ``rate`` tokens per second up to ``capacity`` tokens. A
+    request needing more tokens than available waits until the bucket has refilled
+    enough; requests bigger than the capacity are let through by putting the bucket
+    in debt, so that they are still sent at the configured rate on average.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        """Constructor.
+
+        Args:
+            rate: number of tokens added to the bucket every second.
+            capacity: maximum number of tokens in the bucket, i.e. the allowed burst;
+            by default one second worth of tokens.
+        """
+        if rate <= 0:
+            raise ValueError("The rate of a TokenBucket must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """Takes the tokens from the bucket.
+
+        Args:
+            tokens: number of tokens to take.
+
+        Returns:
+            float : the number of seconds to wait before the tokens are available.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._last) * self.rate
+            )
+            self._last = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens: float = 1):
+        """Blocks until the tokens are available.
+
+        Args:
+            tokens: number of tokens to take.
+        """
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1):
+        """Waits, without blocking the event loop, until the tokens are available.
+
+        Args:
+            tokens: number of tokens to take.
+        """
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
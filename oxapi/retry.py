@@ -0,0 +1,108 @@
+"""Module containing the retry policy applied to the calls to OxAPI."""
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Iterable, Optional
+
+
+class RetryPolicy:
+    """Policy deciding whether, and after how long, a failed call to OxAPI is
+    retried.
+
+    A call is retried when the request fails without a response (e.g. a connection
+    error) or when the response has one of the retryable status codes. The waiting
+    time grows exponentially with the number of attempts, optionally with random
+    jitter, and honors the ``Retry-After`` header sent by the API.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        backoff_factor: float = 0.5,
+        max_backoff: float = 30.0,
+        jitter: bool = True,
+        retry_statuses: Iterable[int] = (429, 500, 502, 503, 504),
+        respect_retry_after: bool = True,
+    ):
+        """Constructor.
+
+        Args:
+            max_attempts: maximum number of attempts for each call, including the first one.
+            backoff_factor: waiting time in seconds before the first retry, doubled at every further attempt.
+            max_backoff: maximum waiting time in seconds computed by the exponential backoff.
+            jitter: if True, the waiting time is drawn uniformly between 0 and the exponential backoff.
+            retry_statuses: the HTTP status codes of the responses to be retried.
+            respect_retry_after: if True, the waiting time is at least the one required by the Retry-After header.
+        """
+        if max_attempts < 1:
+            raise ValueError("max_attempts of a RetryPolicy must be at least 1")
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self.respect_retry_after = respect_retry_after
+
+    def __repr__(self) -> str:
+        return "RetryPolicy(max_attempts={0}, backoff_factor={1}, max_backoff={2}, retry_statuses={3})".format(
+            self.max_attempts,
+            self.backoff_factor,
+            self.max_backoff,
+            sorted(self.retry_statuses),
+        )
+
+    def is_retryable(self, response) -> bool:
+        """Checks whether a call has failed in a way that is worth retrying.
+
+        Args:
+            response: the response of the API, None if the request failed without a response.
+
+        Returns:
+            bool : True if the call should be retried.
+        """
+        return response is None or response.status_code in self.retry_statuses
+
+    def get_backoff(self, attempt: int, response=None) -> float:
+        """Computes the time to wait before the next attempt.
+
+        Args:
+            attempt: the number of attempts performed so far (1 after the first failure).
+            response: optional, the response of the failed attempt.
+
+        Returns:
+            float : the waiting time in seconds.
+        """
+        backoff = min(self.backoff_factor * 2 ** (attempt - 1), self.max_backoff)
+        if self.jitter:
+            backoff = random.uniform(0, backoff)
+        if self.respect_retry_after and response is not None:
+            retry_after = RetryPolicy.parse_retry_after(response)
+            if retry_after is not None:
+                backoff = max(backoff, retry_after)
+        return backoff
+
+    @staticmethod
+    def parse_retry_after(response) -> Optional[float]:
+        """Reads the Retry-After header of a response.
+
+        Args:
+            response: the response of the API.
+
+        Returns:
+            Optional[float] : the waiting time in seconds required by the API, None if not available.
+        """
+        headers = response.headers or {}
+        value = headers.get("Retry-After")
+        if value is None:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            date = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=timezone.utc)
+        return max((date - datetime.now(timezone.utc)).total_seconds(), 0.0)
@@ -0,0 +1,165 @@
+"""Module containing the single-flight layer sharing a single request among the
+identical calls to OxAPI running at the same time."""
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent import futures
+from typing import Awaitable, Callable, Dict
+
+from oxapi.deadline import Deadline
+
+
+class SingleFlight:
+    """Single-flight layer letting only one of the identical calls running at the
+    same time reach the API, the other ones waiting for its outcome.
+
+    Calls are identical when they have the same url and the same body, compared
+    through a canonical hash. Calls from threads and coroutines of different event
+    loops never share a request.
+
+    The shared call is performed by a thread or a task of its own, and is not bound
+    to the deadline of any of its callers; each caller stops waiting at its own
+    deadline.
+    """
+
+    def __init__(self):
+        """Constructor."""
+        self.calls = 0
+        self.shared = 0
+        self._flights: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return "SingleFlight(calls={0}, shared={1}, in_flight={2})".format(
+            self.calls, self.shared, len(self._flights)
+        )
+
+    @staticmethod
+    def get_key(url: str, body: dict) -> str:
+        """Computes the canonical hash of a call.
+
+        Args:
+            url: the url of the endpoint.
+            body: the body of the call.
+
+        Returns:
+            str : the hexadecimal SHA-256 digest of the url and the canonical JSON encoding of the body.
+        """
+        encoded = json.dumps(
+            body, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+        )
+        return hashlib.sha256((url + "\n" + encoded).encode("utf-8")).hexdigest()
+
+    def do(self, url: str, body: dict, function: Callable, deadline: Deadline = None):
+        """Performs a call from a thread, unless an identical call is already
+        running, in which case its outcome is returned.
+
+        Args:
+            url: the url of the endpoint.
+            body: the body of the call.
+            function: the function performing the call.
+            deadline: optional, the deadline of the call, bounding the wait for an identical call.
+
+        Returns:
+            the value returned by the function.
+        """
+        key = (None, self.get_key(url, body))
+        future, leader = self._join(key, futures.Future)
+        if leader:
+            # performed by a thread of its own, so that the caller which started it
+            # stops waiting at its deadline like the other ones
+            threading.Thread(
+                target=self._perform, args=(key, future, function), daemon=True
+            ).start()
+        try:
+            return future.result(
+                timeout=None if deadline is None else deadline.remaining()
+            )
+        except futures.TimeoutError:
+            raise deadline.exceeded(url)
+
+    def _perform(self, key: tuple, future: futures.Future, function: Callable):
+        """Performs a shared call from a thread and resolves its future.
+
+        Args:
+            key: the key of the call.
+            future: the future of the flight.
+            function: the function performing the call.
+        """
+        try:
+            result = function()
+        except BaseException as e:
+            # the calls waiting for the outcome are always resolved
+            self._leave(key)
+            future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            self._leave(key)
+            future.set_result(result)
+
+    async def ado(
+        self,
+        url: str,
+        body: dict,
+        function: Callable[[], Awaitable],
+        deadline: Deadline = None,
+    ):
+        """Coroutine performing a call, unless an identical call is already running
+        in the same event loop, in which case its outcome is returned.
+
+        The call is performed in its own task, so that cancelling the caller which
+        started it does not cancel it for the identical calls waiting for it.
+
+        Args:
+            url: the url of the endpoint.
+            body: the body of the call.
+            function: the coroutine function performing the call.
+            deadline: optional, the deadline of the call, bounding the wait for an identical call.
+
+        Returns:
+            the value returned by the coroutine.
+        """
+        loop = asyncio.get_running_loop()
+        key = (loop, self.get_key(url, body))
+        task, leader = self._join(key, lambda: loop.create_task(function()))
+        if leader:
+            task.add_done_callback(lambda _: self._leave(key))
+        try:
+            # shielded, so that a caller giving up does not cancel the shared call
+            return await asyncio.wait_for(
+                asyncio.shield(task),
+                None if deadline is None else deadline.remaining(),
+            )
+        except asyncio.TimeoutError:
+            raise deadline.exceeded(url)
+
+    def _join(self, key: tuple, future_factory: Callable):
+        """Joins the flight of a call, starting it if no identical call is running.
+
+        Args:
+            key: the key of the call.
+            future_factory: the function creating the future of a new flight.
+
+        Returns:
+            Tuple[object, bool] : the future of the flight, and True if the call has to be performed.
+        """
+        with self._lock:
+            self.calls += 1
+            future = self._flights.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = self._flights[key] = future_factory()
+            return future, True
+
+    def _leave(self, key: tuple):
+        """Ends the flight of a call, so that the following calls are performed
+        again.
+
+        Args:
+            key: the key of the call.
+        """
+        with self._lock:
+            self._flights.pop(key, None)
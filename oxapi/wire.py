@@ -0,0 +1,119 @@
+"""Module containing the binary wire formats of the embeddings returned by OxAPI,
+decoded into NumPy arrays without parsing every float of a JSON list."""
+import base64
+import json
+import struct
+from typing import Optional
+
+JSON = "json"
+BASE64 = "base64"
+OCTET_STREAM = "octet-stream"
+
+WIRE_FORMATS = (JSON, BASE64, OCTET_STREAM)
+
+# number of rows and number of columns of the matrix, before its values
+SHAPE_HEADER = struct.Struct("<II")
+
+_ACCEPT = {
+    JSON: None,
+    BASE64: "application/json; embeddings=base64, application/json; q=0.5",
+    OCTET_STREAM: "application/octet-stream, application/json; q=0.5",
+}
+
+
+def get_accept(wire_format: str) -> Optional[str]:
+    """Builds the Accept header negotiating a wire format, with JSON as fallback
+    for the servers that do not support it.
+
+    Args:
+        wire_format: the wire format, one of ['json', 'base64', 'octet-stream'].
+
+    Returns:
+        Optional[str] : the value of the Accept header, None for plain JSON.
+    """
+    if wire_format not in WIRE_FORMATS:
+        raise ValueError(
+            "{0} is not a valid wire format. Available formats: {1}".format(
+                wire_format, list(WIRE_FORMATS)
+            )
+        )
+    return _ACCEPT[wire_format]
+
+
+def get_media_type(response) -> str:
+    """Returns the media type of a response, without its parameters.
+
+    Args:
+        response: the response of the API.
+
+    Returns:
+        str : the media type, 'application/json' if the response does not declare one.
+    """
+    content_type = (response.headers or {}).get("Content-Type") or "application/json"
+    return content_type.split(";")[0].strip().lower()
+
+
+def decode_embeddings(response) -> dict:
+    """Decodes the response of an Encoding model, whatever its wire format.
+
+    An octet-stream body holds the number of rows and columns of the matrix as two
+    little-endian uint32, followed by its little-endian float32 values; the results
+    are a read-only view on the body. A JSON body holds either the embeddings as
+    lists of floats, or a base64 matrix as ``{"dtype", "shape", "data"}``, decoded
+    into a read-only view on the decoded bytes.
+
+    Args:
+        response: the response of the API.
+
+    Returns:
+        dict : the decoded result, whose results are a numpy.ndarray for the binary formats.
+    """
+    import numpy as np
+
+    if get_media_type(response) == "application/octet-stream":
+        content = response.content
+        rows, columns = SHAPE_HEADER.unpack_from(content)
+        results = np.frombuffer(
+            content, dtype="<f4", count=rows * columns, offset=SHAPE_HEADER.size
+        )
+        return {"results": results.reshape(rows, columns)}
+    result = response.json()
+    results = result.get("results") if isinstance(result, dict) else None
+    if isinstance(results, dict) and "data" in results:
+        matrix = np.frombuffer(
+            base64.b64decode(results["data"]), dtype=results.get("dtype", "<f4")
+        )
+        result["results"] = matrix.reshape(results["shape"])
+    return result
+
+
+def encode_embeddings(embeddings, wire_format: str = OCTET_STREAM) -> bytes:
+    """Encodes a matrix of embeddings in a binary wire format, as done by the
+    servers supporting it.
+
+    Args:
+        embeddings: the embeddings, one row per text.
+        wire_format: the wire format, either 'base64' or 'octet-stream'.
+
+    Returns:
+        bytes : the body of the response.
+    """
+    import numpy as np
+
+    matrix = np.ascontiguousarray(embeddings, dtype="<f4")
+    if matrix.ndim != 2:
+        matrix = matrix.reshape(len(matrix), -1 if len(matrix) else 0)
+    if wire_format == OCTET_STREAM:
+        return SHAPE_HEADER.pack(*matrix.shape) + matrix.tobytes()
+    if wire_format == BASE64:
+        results = {
+            "dtype": "<f4",
+            "shape": list(matrix.shape),
+            "data": base64.b64encode(matrix.tobytes()).decode("ascii"),
+        }
+        return json.dumps({"results": results}).encode("utf-8")
+    raise ValueError(
+        "{0} is not a valid binary wire format. Available formats: {1}".format(
+            wire_format, [BASE64, OCTET_STREAM]
+        )
+    )
@@ -28,6 +28,7 @@ INSTALL_REQUIRES = [
     "hypothesis>=6.54.3",
     "jedi>=0.10",
 ]
+EXTRAS_REQUIRE = {"async": ["aiohttp>=3.8"], "arrow": ["pyarrow>=8.0"]}
 
 PROJECT_URLS = {"Source Code": "https://github.com/Oxolo/oxapi-python"}
 
@@ -39,6 +40,7 @@ setup(
     author_email=AUTHOR_EMAIL,
     packages=PACKAGES,
     install_requires=INSTALL_REQUIRES,
+    extras_require=EXTRAS_REQUIRE,
     long_description=long_description,
     long_description_content_type="text/markdown",
     project_urls=PROJECT_URLS,
@@ -1,3 +1,5 @@
+import asyncio
+import tracemalloc
 from unittest import mock
 
 import pytest
@@ -11,6 +13,7 @@ from oxapi.error import (
     OxAPIError,
 )
 from oxapi.nlp.classification import Classification
+from oxapi.nlp.encoding import Encoding
 from oxapi.utils import OxapiNLPClassificationModel, OxapiType
 from tests.testing_utils import MockedResponse
 
@@ -62,11 +65,85 @@ class TestModelAPI:
         api.set_params(param1=1, param2=2)
         assert api.param1 == 1 and api.param2 == 2
 
+    def test_slots(self):
+        """Testing that the API calls have no instance dictionary."""
+        api = Classification.prepare("dialog-tag", ["test"])
+        assert not hasattr(api, "__dict__")
+        with pytest.raises(AttributeError):
+            api.param1
+
+    def test_repr_bounded(self):
+        """Testing that the representation of a large result is truncated."""
+        api = Encoding.prepare(model="all-mpnet-base-v2", texts=["test"] * 50000)
+        api.set_params(result={"results": [[0.125] * 768] * 50000})
+        text = repr(api)
+        assert len(text) < 500 and "Model: all-mpnet-base-v2" in text
+        assert str(api) == text
+
+    def test_memoized_format(self):
+        """Testing the memoization of the formatted outputs, per format, until the
+        result changes, once enabled."""
+        api = Classification.prepare("dialog-tag", ["hi", "hello"])
+        api.set_params(result={"results": [["greeting", 0.9], ["greeting", 0.8]]})
+        assert api.format_result() is not api.format_result()
+        with mock.patch.object(Classification, "memoization", True):
+            first = api.format_result()
+            assert api.format_result("pd") is first
+            assert api.format_result(result_format="pd") is first
+            assert api.format_result("dict") is not first
+            api.set_params(result={"results": [["question", 0.5], ["question", 0.4]]})
+            second = api.format_result()
+        assert second is not first and second["label"].tolist() == ["question"] * 2
+
+    def test_release_body(self, mocked_answer_classification):
+        """Testing that the body of a successful call is released when enabled.
+
+        Args:
+            mocked_answer_classification: the mocked answer.
+        """
+        oxapi.api_key = "test"
+        with mock.patch(
+            "oxapi.client.AsyncOxAPIClient.post",
+            new=mock.AsyncMock(return_value=mocked_answer_classification),
+        ):
+            api = asyncio.run(Classification.arun(model="dialog-tag", texts=["hi"]))
+            assert api._body == {"texts": ["hi"]}
+            with mock.patch.object(Classification, "release_body", True):
+                api = asyncio.run(Classification.arun(model="dialog-tag", texts=["hi"]))
+        assert api._body is None and api.input_texts == ["hi"]
+        assert api.result == {"results": [["mocked_label", 1.0]]}
+
+    def test_memory(self):
+        """Benchmarking the memory held by the API calls of a large batch, before and
+        after the release of their bodies."""
+        count = 20000
+        tracemalloc.start()
+        try:
+            start = tracemalloc.take_snapshot()
+            calls = [
+                Classification.prepare("dialog-tag", ["text"]) for _ in range(count)
+            ]
+            prepared = tracemalloc.take_snapshot()
+            with mock.patch.object(Classification, "release_body", True):
+                for call in calls:
+                    call._release_body()
+            released = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+        held = sum(stat.size_diff for stat in prepared.compare_to(start, "filename"))
+        freed = -sum(
+            stat.size_diff for stat in released.compare_to(prepared, "filename")
+        )
+        assert not hasattr(calls[0], "__dict__")
+        # the call itself, its body and its list of texts
+        assert held / count < 600
+        assert freed / count > 100 and all(call._body is None for call in calls)
+
     def test_general_error(self):
         """Testing general OxAPIError exception raising."""
         oxapi.api_key = "test"
         with mock.patch(
-            "oxapi.abstract.api.requests.post",
+            "oxapi.client.requests.Session.post",
             return_value=TestModelAPI.build_mocked_error(500),
         ):
             with pytest.raises(OxAPIError):
@@ -79,7 +156,7 @@ class TestModelAPI:
         """Testing NotFoundException exception raising."""
         oxapi.api_key = "test"
         with mock.patch(
-            "oxapi.abstract.api.requests.post",
+            "oxapi.client.requests.Session.post",
             return_value=TestModelAPI.build_mocked_error(404),
         ):
             with pytest.raises(NotFoundException):
@@ -92,7 +169,7 @@ class TestModelAPI:
         """Testing NotAllowedException exception raising."""
         oxapi.api_key = "test"
         with mock.patch(
-            "oxapi.abstract.api.requests.post",
+            "oxapi.client.requests.Session.post",
             return_value=TestModelAPI.build_mocked_error(403),
         ):
             with pytest.raises(NotAllowedException):
@@ -105,7 +182,7 @@ class TestModelAPI:
         """Testing InvalidAPIKeyException exception raising."""
         oxapi.api_key = "test"
         with mock.patch(
-            "oxapi.abstract.api.requests.post",
+            "oxapi.client.requests.Session.post",
             return_value=TestModelAPI.build_mocked_error(401),
         ):
             with pytest.raises(InvalidAPIKeyException):
@@ -118,7 +195,7 @@ class TestModelAPI:
         """Testing general OxAPIError exception to string."""
         oxapi.api_key = "test"
         with mock.patch(
-            "oxapi.abstract.api.requests.post",
+            "oxapi.client.requests.Session.post",
             return_value=TestModelAPI.build_mocked_error(500),
         ):
             try:
@@ -138,7 +215,7 @@ class TestModelAPI:
         oxapi.api_key = "test"
 
         with mock.patch(
-            "oxapi.abstract.api.requests.post",
+            "oxapi.client.requests.Session.post",
             return_value=mocked_answer_classification,
         ):
             api = Classification.run(model="dialog-content-filter", texts=["dizio"])
@@ -1,9 +1,13 @@
+import asyncio
+import json
 import unittest.mock as mock
 
 import pandas as pd
 import pytest
 
 import oxapi
+from oxapi.batching import ChunkingPolicy
+from oxapi.cache import ResultCache
 from oxapi.error import ModelNotFoundException
 from oxapi.nlp.classification import Classification
 from oxapi.utils import OxapiNLPClassificationModel, OxapiType
@@ -49,6 +53,83 @@ class TestClassification:
             },
         )
 
+    def test_dialog_topics_not_chunked(self, monkeypatch, mocked_answer_dialog_topic):
+        """Testing that the texts of a dialog are always sent together.
+
+        Args:
+            mocked_answer_dialog_topic: the mocked answer.
+        """
+        oxapi.api_key = "test"
+        monkeypatch.setattr(Classification, "chunking", ChunkingPolicy(max_texts=1))
+        with mock.patch(
+            "oxapi.client.requests.Session.post",
+            return_value=mocked_answer_dialog_topic,
+        ) as mocked_post:
+            api = Classification.run(model="dialog-topics", texts=["hi", "hello"])
+        assert mocked_post.call_count == 1
+        assert api.result == {"results": ["mocked_label"]}
+
+    def test_run_deduplicated(self, monkeypatch):
+        """Testing that the repeated texts are sent once and their results copied
+        back to every occurrence."""
+        oxapi.api_key = "test"
+        monkeypatch.setattr(Classification, "deduplication", True)
+        texts = ["ok", "thanks", "ok", "yes", "thanks"]
+
+        def post(url, data, **kwargs):
+            return MockedResponse(
+                status_code=200,
+                message={"results": [[t, 1.0] for t in json.loads(data)["texts"]]},
+            )
+
+        with mock.patch(
+            "oxapi.client.requests.Session.post", side_effect=post
+        ) as mocked_post:
+            api = Classification.run(model="dialog-content-filter", texts=texts)
+        assert json.loads(mocked_post.call_args[1]["data"])["texts"] == [
+            "ok",
+            "thanks",
+            "yes",
+        ]
+        assert api.result == {"results": [[t, 1.0] for t in texts]}
+        assert list(api.format_result()["text"]) == texts
+
+        async def apost(client, url, body, **kwargs):
+            return post(url, json.dumps(body))
+
+        with mock.patch("oxapi.client.AsyncOxAPIClient.post", new=apost):
+            api = asyncio.run(
+                Classification.arun(model="dialog-content-filter", texts=texts)
+            )
+        assert api.result == {"results": [[t, 1.0] for t in texts]}
+
+    def test_run_cached(self, monkeypatch):
+        """Testing that only the texts missing from the cache are sent, the
+        formatted result being unchanged."""
+        oxapi.api_key = "test"
+        monkeypatch.setattr(Classification, "cache", ResultCache())
+        sent = []
+
+        def post(url, data, **kwargs):
+            texts = json.loads(data)["texts"]
+            sent.append(texts)
+            return MockedResponse(
+                status_code=200, message={"results": [[t, 1.0] for t in texts]}
+            )
+
+        with mock.patch("oxapi.client.requests.Session.post", side_effect=post):
+            first = Classification.run(model="dialog-tag", texts=["hi", "bye"])
+            api = Classification.run(model="dialog-tag", texts=["bye", "yes", "hi"])
+            again = Classification.run(model="dialog-tag", texts=["hi", "bye"])
+            Classification.run(model="dialog-topics", texts=["hi", "bye"])
+            # the results are copies, modifying them leaves the cache intact
+            api.result["results"][0][0] = "modified"
+            api.result["results"][1].append("modified")
+            hit = Classification.run(model="dialog-tag", texts=["bye", "yes"])
+        assert sent == [["hi", "bye"], ["yes"], ["hi", "bye"]]
+        assert again.format_result().equals(first.format_result())
+        assert hit.result == {"results": [["bye", 1.0], ["yes", 1.0]]}
+
     def test_create(self, mocked_answer):
         """Testing run function.
 
@@ -57,10 +138,28 @@ class TestClassification:
         """
         oxapi.api_key = "test"
 
-        with mock.patch("oxapi.abstract.api.requests.post", return_value=mocked_answer):
+        with mock.patch(
+            "oxapi.client.requests.Session.post", return_value=mocked_answer
+        ):
             api = Classification.run(model="dialog-content-filter", texts=["esposito"])
             assert api.result is not None
 
+    def test_arun(self, mocked_answer):
+        """Testing arun coroutine.
+
+        Args:
+            mocked_answer: the mocked answer from aiohttp.
+        """
+        oxapi.api_key = "test"
+        with mock.patch(
+            "oxapi.client.AsyncOxAPIClient.post",
+            new=mock.AsyncMock(return_value=mocked_answer),
+        ):
+            api = asyncio.run(
+                Classification.arun(model="dialog-content-filter", texts=["esposito"])
+            )
+            assert isinstance(api, Classification) and api.result is not None
+
     def test_prepare(self):
         """Testing prepare function."""
         oxapi.api_key = "test"
@@ -75,12 +174,57 @@ class TestClassification:
 
         """
         oxapi.api_key = "test"
-        with mock.patch("oxapi.abstract.api.requests.post", return_value=mocked_answer):
+        with mock.patch(
+            "oxapi.client.requests.Session.post", return_value=mocked_answer
+        ):
             api = Classification.run(model="dialog-content-filter", texts=["esposito"])
 
         res = api.format_result()
         assert isinstance(res, pd.DataFrame)
 
+    @pytest.mark.parametrize(
+        "model, results",
+        [
+            ("dialog-tag", [["question", 0.5], ["greeting", 1]]),
+            (
+                "dialog-emotions",
+                [["joy", "joy", "positive", 0.9], ["fear", "fear", "negative", 0.1]],
+            ),
+            ("dialog-topics", ["weather", "travel"]),
+            ("dialog-tag", []),
+        ],
+    )
+    def test_format_result_arrow(self, model, results):
+        """Testing format_result function (arrow format), and the pandas format built
+        from the same columns as before."""
+        texts = ["hi", "how is the weather?"] if results else []
+        api = Classification.prepare(model=model, texts=texts)
+        api.set_params(result={"results": results})
+        labels = api.model.get_labels()
+        if model == "dialog-topics":
+            texts = ["\n".join(texts)]
+        expected = pd.concat(
+            [
+                pd.DataFrame(texts, columns=["text"]),
+                pd.DataFrame(results, columns=labels),
+            ],
+            axis=1,
+        )
+        assert api.format_result().equals(expected)
+        table = api.format_result("arrow")
+        assert table.column_names == ["text"] + labels
+        assert table.num_rows == len(expected)
+        if "confidence_score" in labels:
+            assert str(table.schema.field("confidence_score").type) == "double"
+            assert table.column("confidence_score").to_pylist() == [
+                float(result[-1]) for result in results
+            ]
+        assert all(
+            str(table.schema.field(name).type) == "string"
+            for name in ["text"] + labels
+            if name != "confidence_score"
+        )
+
     def test_format_result_dict(self, mocked_answer):
         """Testing format_results function (dict format).
 
@@ -88,7 +232,9 @@ class TestClassification:
             mocked_answer: the mocked answer from grequests.
         """
         oxapi.api_key = "test"
-        with mock.patch("oxapi.abstract.api.requests.post", return_value=mocked_answer):
+        with mock.patch(
+            "oxapi.client.requests.Session.post", return_value=mocked_answer
+        ):
             api = Classification.run(model="dialog-content-filter", texts=["esposito"])
 
         res = api.format_result("dict")
@@ -101,7 +247,9 @@ class TestClassification:
             mocked_answer: the mocked answer from grequests.
         """
         oxapi.api_key = "test"
-        with mock.patch("oxapi.abstract.api.requests.post", return_value=mocked_answer):
+        with mock.patch(
+            "oxapi.client.requests.Session.post", return_value=mocked_answer
+        ):
             api = Classification.run(model="dialog-content-filter", texts=["esposito"])
 
         with pytest.raises(ValueError) as ve:
@@ -148,7 +296,7 @@ class TestClassification:
         """
         oxapi.api_key = "test"
         with mock.patch(
-            "oxapi.abstract.api.requests.post",
+            "oxapi.client.requests.Session.post",
             return_value=mocked_answer_dialog_topic,
         ):
             api = Classification.run(model="dialog-topics", texts=["esposito"])
@@ -166,7 +314,7 @@ class TestClassification:
         """
         oxapi.api_key = "test"
         with mock.patch(
-            "oxapi.abstract.api.requests.post",
+            "oxapi.client.requests.Session.post",
             return_value=mocked_answer_dialog_emotions,
         ):
             api = Classification.run(model="dialog-emotions", texts=["esposito"])
@@ -1,9 +1,13 @@
+import asyncio
+import json
 import unittest.mock as mock
 
 import pandas as pd
 import pytest
+import requests
 
 import oxapi
+from oxapi.cache import CompletionCache
 from oxapi.error import ModelNotFoundException
 from oxapi.nlp.completion import Completion
 from oxapi.utils import OxapiNLPCompletionModel, OxapiType
@@ -29,13 +33,130 @@ class TestCompletion:
             mocked_answer: the mocked answer from grequests.
         """
         oxapi.api_key = "test"
-        with mock.patch("oxapi.abstract.api.requests.post", return_value=mocked_answer):
+        with mock.patch(
+            "oxapi.client.requests.Session.post", return_value=mocked_answer
+        ):
             api = Completion.run(
                 model="gpt-neo-2-7b",
                 prompt="I am a good programmer, therefore ",
             )
             assert api.result is not None
 
+    def test_arun(self, mocked_answer):
+        """Testing arun coroutine.
+
+        Args:
+            mocked_answer: the mocked answer from aiohttp.
+        """
+        oxapi.api_key = "test"
+        with mock.patch(
+            "oxapi.client.AsyncOxAPIClient.post",
+            new=mock.AsyncMock(return_value=mocked_answer),
+        ):
+            api = asyncio.run(
+                Completion.arun(
+                    model="gpt-neo-2-7b", prompt="I am a good programmer, therefore "
+                )
+            )
+            assert isinstance(api, Completion) and api.result is not None
+
+    def test_run_many(self):
+        """Testing run_many function, failed calls included."""
+        oxapi.api_key = "test"
+
+        def post(url, data, **kwargs):
+            prompt = json.loads(data)["prompt"]
+            if prompt == "fail":
+                return MockedResponse(status_code=400, message={"message": "error"})
+            if prompt == "down":
+                raise requests.ConnectionError()
+            return MockedResponse(status_code=200, message={"results": [prompt + "!"]})
+
+        progress = []
+        with mock.patch("oxapi.client.requests.Session.post", side_effect=post):
+            result = Completion.run_many(
+                model="gpt-neo-2-7b",
+                prompts=["a", "fail", "b", "down", "c"],
+                max_in_flight=2,
+                progress=lambda done, total: progress.append((done, total)),
+                max_length=10,
+            )
+        assert result["index"] == [0, 1, 2, 3, 4]
+        assert result["prompt"] == ["a", "fail", "b", "down", "c"]
+        assert result["output"] == ["a!", None, "b!", None, "c!"]
+        assert [error is None for error in result["error"]] == [
+            True,
+            False,
+            True,
+            False,
+            True,
+        ]
+        assert all(latency >= 0 for latency in result["latency"])
+        assert progress == [(i, 5) for i in range(1, 6)]
+
+    def test_iter_many(self, mocked_answer):
+        """Testing iter_many function with lazily generated prompts.
+
+        Args:
+            mocked_answer: the mocked answer.
+        """
+        oxapi.api_key = "test"
+        with mock.patch(
+            "oxapi.client.requests.Session.post", return_value=mocked_answer
+        ) as mocked_post:
+            rows = list(
+                Completion.iter_many(
+                    model="gpt-neo-2-7b",
+                    prompts=(str(i) for i in range(10)),
+                    max_in_flight=3,
+                )
+            )
+        assert mocked_post.call_count == 10
+        assert sorted(row["index"] for row in rows) == list(range(10))
+        assert all(row["output"] == "I love writing tests." for row in rows)
+        with pytest.raises(ValueError):
+            list(
+                Completion.iter_many(model="gpt-neo-2-7b", prompts=[], max_in_flight=0)
+            )
+
+    def test_run_cached(self, monkeypatch, mocked_answer):
+        """Testing that only the deterministic completions are cached.
+
+        Args:
+            mocked_answer: the mocked answer.
+        """
+        oxapi.api_key = "test"
+        cache = CompletionCache()
+        monkeypatch.setattr(Completion, "cache", cache)
+        with mock.patch(
+            "oxapi.client.requests.Session.post", return_value=mocked_answer
+        ) as mocked_post:
+            for _ in range(3):
+                api = Completion.run(
+                    model="gpt-neo-2-7b", prompt="Hello", max_length=5, do_sample=False
+                )
+                assert api.format_result() == "I love writing tests."
+                # the results are copies, modifying them leaves the cache intact
+                api.result["results"].append("modified")
+            assert mocked_post.call_count == 1
+            Completion.run(
+                model="gpt-neo-2-7b", prompt="Hello", max_length=6, do_sample=False
+            )
+            Completion.run(model="gpt-neo-2-7b", prompt="Hello", do_sample=True)
+            Completion.run(model="gpt-neo-2-7b", prompt="Hello", do_sample=True)
+            assert mocked_post.call_count == 4
+        with mock.patch(
+            "oxapi.client.AsyncOxAPIClient.post", new=mock.AsyncMock()
+        ) as mocked_apost:
+            api = asyncio.run(
+                Completion.arun(
+                    model="gpt-neo-2-7b", prompt="Hello", max_length=5, do_sample=False
+                )
+            )
+        assert mocked_apost.call_count == 0
+        assert api.result == {"results": ["I love writing tests."]}
+        assert (cache.hits, cache.misses, cache.refused) == (3, 2, 2)
+
     def test_prepare(self):
         """Testin prepare function."""
         oxapi.api_key = "test"
@@ -52,7 +173,9 @@ class TestCompletion:
 
         """
         oxapi.api_key = "test"
-        with mock.patch("oxapi.abstract.api.requests.post", return_value=mocked_answer):
+        with mock.patch(
+            "oxapi.client.requests.Session.post", return_value=mocked_answer
+        ):
             api = Completion.run(
                 model="gpt-neo-2-7b",
                 prompt="I am a good programmer, therefore ",
@@ -69,7 +192,9 @@ class TestCompletion:
 
         """
         oxapi.api_key = "test"
-        with mock.patch("oxapi.abstract.api.requests.post", return_value=mocked_answer):
+        with mock.patch(
+            "oxapi.client.requests.Session.post", return_value=mocked_answer
+        ):
             api = Completion.run(
                 model="gpt-neo-2-7b",
                 prompt="I am a good programmer, therefore ",
@@ -86,7 +211,9 @@ class TestCompletion:
 
         """
         oxapi.api_key = "test"
-        with mock.patch("oxapi.abstract.api.requests.post", return_value=mocked_answer):
+        with mock.patch(
+            "oxapi.client.requests.Session.post", return_value=mocked_answer
+        ):
             api = Completion.run(
                 model="gpt-neo-2-7b",
                 prompt="I am a good programmer, therefore ",
@@ -133,7 +260,9 @@ class TestCompletion:
 
         """
         oxapi.api_key = "test"
-        with mock.patch("oxapi.abstract.api.requests.post", return_value=mocked_answer):
+        with mock.patch(
+            "oxapi.client.requests.Session.post", return_value=mocked_answer
+        ):
             api = Completion.run(
                 model="gpt-neo-2-7b",
                 prompt="I am a good programmer, therefore ",
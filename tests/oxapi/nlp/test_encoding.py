@@ -1,13 +1,20 @@
+import asyncio
+import json
+import time
 import unittest.mock as mock
 
 import numpy as np
 import pytest
+import requests
 
 import oxapi
-from oxapi.error import ModelNotFoundException
+from oxapi.batching import AdaptiveChunkingPolicy, ChunkingPolicy
+from oxapi.cache import DiskEmbeddingStore, EmbeddingCache
+from oxapi.error import DeadlineExceededException, ModelNotFoundException
 from oxapi.nlp.encoding import Encoding
 from oxapi.utils import OxapiNLPEncodingModel, OxapiType
-from tests.testing_utils import MockedResponse
+from oxapi.wire import encode_embeddings
+from tests.testing_utils import LocalServer, MockedResponse
 
 
 class TestEncoding:
@@ -32,10 +39,169 @@ class TestEncoding:
             mocked_answer: the mocked answer from grequests.
         """
         oxapi.api_key = "test"
-        with mock.patch("oxapi.abstract.api.requests.post", return_value=mocked_answer):
+        with mock.patch(
+            "oxapi.client.requests.Session.post", return_value=mocked_answer
+        ):
             api = Encoding.run(model="all-mpnet-base-v2", texts=["esposito"])
             assert api.result is not None
 
+    def test_arun(self, mocked_answer):
+        """Testing arun coroutine.
+
+        Args:
+            mocked_answer: the mocked answer from aiohttp.
+        """
+        oxapi.api_key = "test"
+        with mock.patch(
+            "oxapi.client.AsyncOxAPIClient.post",
+            new=mock.AsyncMock(return_value=mocked_answer),
+        ):
+            api = asyncio.run(
+                Encoding.arun(model="all-mpnet-base-v2", texts=["esposito"])
+            )
+            assert isinstance(api, Encoding) and api.result is not None
+
+    def test_run_chunked(self, monkeypatch):
+        """Testing that a large list of texts is sent in chunks and the results
+        reassembled in order."""
+        oxapi.api_key = "test"
+        monkeypatch.setattr(Encoding, "chunking", ChunkingPolicy(max_texts=2))
+        texts = ["zero", "one", "two", "three", "four"]
+
+        def post(url, data, **kwargs):
+            chunk = json.loads(data)["texts"]
+            return MockedResponse(
+                status_code=200,
+                message={"results": [[float(texts.index(t))] for t in chunk]},
+            )
+
+        with mock.patch(
+            "oxapi.client.requests.Session.post", side_effect=post
+        ) as mocked_post:
+            api = Encoding.run(model="all-mpnet-base-v2", texts=texts)
+        assert mocked_post.call_count == 3
+        assert api.result == {"results": [[0.0], [1.0], [2.0], [3.0], [4.0]]}
+        assert api.format_result().shape == (5, 1)
+
+        async def apost(client, url, body, **kwargs):
+            return post(url, json.dumps(body))
+
+        with mock.patch("oxapi.client.AsyncOxAPIClient.post", new=apost):
+            api = asyncio.run(Encoding.arun(model="all-mpnet-base-v2", texts=texts))
+        assert api.result == {"results": [[0.0], [1.0], [2.0], [3.0], [4.0]]}
+
+    def test_run_chunked_error(self, monkeypatch):
+        """Testing that the failure of a chunk fails the whole call."""
+        oxapi.api_key = "test"
+        monkeypatch.setattr(Encoding, "chunking", ChunkingPolicy(max_texts=1))
+        answers = [
+            MockedResponse(status_code=200, message={"results": [[1.0]]}),
+            MockedResponse(status_code=500, message={"message": "error"}),
+        ]
+        with mock.patch("oxapi.client.requests.Session.post", side_effect=answers):
+            api = Encoding.run(
+                model="all-mpnet-base-v2",
+                texts=["one", "two"],
+                raise_exceptions=False,
+            )
+        assert api.result is None and api.error is not None
+
+    def test_run_adaptive(self, monkeypatch):
+        """Testing that the chunks rejected as too large are split again and
+        resent."""
+        oxapi.api_key = "test"
+        policy = AdaptiveChunkingPolicy(max_texts=4, max_concurrency=1)
+        monkeypatch.setattr(Encoding, "chunking", policy)
+        texts = ["zero", "one", "two", "three", "four"]
+
+        def post(url, data, **kwargs):
+            chunk = json.loads(data)["texts"]
+            if len(chunk) > 2:
+                return MockedResponse(status_code=413, message={"message": "large"})
+            return MockedResponse(
+                status_code=200,
+                message={"results": [[float(texts.index(t))] for t in chunk]},
+            )
+
+        with mock.patch(
+            "oxapi.client.requests.Session.post", side_effect=post
+        ) as mocked_post:
+            api = Encoding.run(model="all-mpnet-base-v2", texts=texts)
+        assert api.result == {"results": [[0.0], [1.0], [2.0], [3.0], [4.0]]}
+        # the first chunk of 4 texts is resent as 2 chunks of 2 texts
+        assert mocked_post.call_count == 4
+
+        async def apost(client, url, body, **kwargs):
+            return post(url, json.dumps(body))
+
+        policy.max_texts = 4
+        with mock.patch("oxapi.client.AsyncOxAPIClient.post", new=apost):
+            api = asyncio.run(Encoding.arun(model="all-mpnet-base-v2", texts=texts))
+        assert api.result == {"results": [[0.0], [1.0], [2.0], [3.0], [4.0]]}
+
+    @pytest.mark.parametrize("persistent", [False, True])
+    def test_run_cached(self, monkeypatch, tmp_path, persistent):
+        """Testing that only the texts missing from the cache are sent.
+
+        Args:
+            persistent: True to test the disk store, False the in-memory cache.
+        """
+        oxapi.api_key = "test"
+        cache = DiskEmbeddingStore(str(tmp_path)) if persistent else EmbeddingCache()
+        monkeypatch.setattr(Encoding, "cache", cache)
+        embeddings = {"zero": [0.0], "one": [1.0], "two": [2.0]}
+        sent = []
+
+        def post(url, data, **kwargs):
+            texts = json.loads(data)["texts"]
+            sent.append(texts)
+            return MockedResponse(
+                status_code=200, message={"results": [embeddings[t] for t in texts]}
+            )
+
+        with mock.patch("oxapi.client.requests.Session.post", side_effect=post):
+            Encoding.run(model="all-mpnet-base-v2", texts=["one"])
+            api = Encoding.run(model="all-mpnet-base-v2", texts=["zero", "one", "two"])
+            # the cache hits are merged as float32 rows of the result matrix
+            results = api.result["results"]
+            assert results.dtype == np.float32
+            assert results.tolist() == [[0.0], [1.0], [2.0]]
+            api = Encoding.run(model="all-mpnet-base-v2", texts=["two", "zero"])
+            assert api.result["results"].tolist() == [[2.0], [0.0]]
+            # another version of the model does not share the cache
+            Encoding.run(model="all-mpnet-base-v2", texts=["one"], version="v2")
+
+        async def apost(client, url, body, **kwargs):
+            return post(url, json.dumps(body))
+
+        with mock.patch("oxapi.client.AsyncOxAPIClient.post", new=apost):
+            api = asyncio.run(
+                Encoding.arun(model="all-mpnet-base-v2", texts=["one", "zero"])
+            )
+        assert api.result["results"].tolist() == [[1.0], [0.0]]
+        assert sent == [["one"], ["zero", "two"], ["one"]]
+        assert api.format_result().shape == (2, 1)
+
+    def test_deadline(self):
+        """Testing run function exceeding its deadline."""
+        oxapi.api_key = "test"
+
+        def post(*args, **kwargs):
+            time.sleep(kwargs["timeout"][1])
+            raise requests.Timeout()
+
+        with mock.patch("oxapi.client.requests.Session.post", side_effect=post):
+            with pytest.raises(DeadlineExceededException):
+                Encoding.run(model="all-mpnet-base-v2", texts=["test"], deadline=0.05)
+            api = Encoding.run(
+                model="all-mpnet-base-v2",
+                texts=["test"],
+                raise_exceptions=False,
+                deadline=0.05,
+            )
+        assert api.result is None
+        assert isinstance(api.error, DeadlineExceededException)
+
     def test_prepare(self):
         """Testing prepare function."""
         oxapi.api_key = "test"
@@ -49,7 +215,9 @@ class TestEncoding:
             mocked_answer: the mocked answer from grequests.
         """
         oxapi.api_key = "test"
-        with mock.patch("oxapi.abstract.api.requests.post", return_value=mocked_answer):
+        with mock.patch(
+            "oxapi.client.requests.Session.post", return_value=mocked_answer
+        ):
             api = Encoding.run(model="all-mpnet-base-v2", texts=["esposito"])
 
         res = api.format_result()
@@ -62,12 +230,94 @@ class TestEncoding:
             mocked_answer: the mocked answer from grequests.
         """
         oxapi.api_key = "test"
-        with mock.patch("oxapi.abstract.api.requests.post", return_value=mocked_answer):
+        with mock.patch(
+            "oxapi.client.requests.Session.post", return_value=mocked_answer
+        ):
             api = Encoding.run(model="all-mpnet-base-v2", texts=["esposito"])
 
         res = api.format_result("dict")
         assert isinstance(res, dict)
 
+    @pytest.mark.parametrize(
+        "wire_format, content_type",
+        [
+            ("octet-stream", "application/octet-stream"),
+            ("base64", "application/json"),
+        ],
+    )
+    def test_run_binary(self, wire_format, content_type):
+        """Testing the negotiation and the decoding of a binary wire format."""
+        oxapi.api_key = "test"
+        embeddings = [[0.5, -1.0], [3.0, 4.0]]
+        content = encode_embeddings(embeddings, wire_format)
+        with LocalServer(content=content, content_type=content_type) as server:
+            with mock.patch(
+                "oxapi.abstract.api.get_base_url", return_value=server.url
+            ), mock.patch.object(Encoding, "wire_format", wire_format):
+                api = Encoding.run(model="all-mpnet-base-v2", texts=["a", "b"])
+        assert server.requests[0]["headers"]["Accept"].startswith(
+            "application/"
+            + ("octet-stream" if wire_format == "octet-stream" else "json")
+        )
+        results = api.result["results"]
+        assert isinstance(results, np.ndarray) and results.dtype == np.float32
+        assert results.tolist() == embeddings
+        matrix = api.format_result(dtype="float32")
+        assert matrix.base is results.base and np.shares_memory(matrix, results)
+        assert api.format_result().tolist() == embeddings
+
+    def test_run_binary_fallback(self):
+        """Testing the JSON fallback when the server does not support the binary
+        wire formats."""
+        oxapi.api_key = "test"
+        with LocalServer(message={"results": [[1.0, 2.0]]}) as server:
+            with mock.patch(
+                "oxapi.abstract.api.get_base_url", return_value=server.url
+            ), mock.patch.object(Encoding, "wire_format", "octet-stream"):
+                api = Encoding.run(model="all-mpnet-base-v2", texts=["a"])
+        assert "application/json" in server.requests[0]["headers"]["Accept"]
+        assert api.result == {"results": [[1.0, 2.0]]}
+
+    def test_run_binary_chunked(self):
+        """Testing the reassembly of the chunks received in a binary wire format."""
+        oxapi.api_key = "test"
+
+        def post(url, data, **kwargs):
+            texts = json.loads(data)["texts"]
+            return MockedResponse(
+                status_code=200,
+                message=None,
+                headers={"Content-Type": "application/octet-stream"},
+                content=encode_embeddings([[len(text)] for text in texts]),
+            )
+
+        with mock.patch(
+            "oxapi.client.requests.Session.post", side_effect=post
+        ), mock.patch.object(Encoding, "chunking", ChunkingPolicy(max_texts=2)):
+            with mock.patch.object(Encoding, "wire_format", "octet-stream"):
+                api = Encoding.run(
+                    model="all-mpnet-base-v2", texts=["a", "bb", "ccc", "dddd", "a"]
+                )
+        assert api.result["results"].tolist() == [[1.0], [2.0], [3.0], [4.0], [1.0]]
+
+    def test_format_result_dtype(self):
+        """Testing format_result function with a smaller type and normalization."""
+        api = Encoding.prepare(model="all-mpnet-base-v2", texts=["a", "b", "c"])
+        api.set_params(result={"results": [[3.0, 4.0], [0.0, 0.0], [300.0, 400.0]]})
+        res = api.format_result(dtype="float32")
+        assert res.dtype == np.float32 and res.flags.c_contiguous
+        assert res.tolist() == [[3.0, 4.0], [0.0, 0.0], [300.0, 400.0]]
+        res = api.format_result(dtype="float16", normalize=True)
+        assert res.dtype == np.float16
+        np.testing.assert_allclose(
+            res.astype(np.float32), [[0.6, 0.8], [0.0, 0.0], [0.6, 0.8]], atol=1e-3
+        )
+        res = api.format_result("dict", dtype="float32")
+        matrix = res[0]["embedding"].base
+        assert all(np.shares_memory(res[i]["embedding"], matrix) for i in range(3))
+        with pytest.raises(ValueError):
+            api.format_result(dtype="int8")
+
     def test_format_result_wrong_format(self, mocked_answer):
         """Testing format_result function (wrong format).
 
@@ -75,7 +325,9 @@ class TestEncoding:
             mocked_answer: the mocked answer from grequests.
         """
         oxapi.api_key = "test"
-        with mock.patch("oxapi.abstract.api.requests.post", return_value=mocked_answer):
+        with mock.patch(
+            "oxapi.client.requests.Session.post", return_value=mocked_answer
+        ):
             api = Encoding.run(model="all-mpnet-base-v2", texts=["esposito"])
 
         with pytest.raises(ValueError) as ve:
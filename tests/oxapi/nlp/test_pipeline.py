@@ -1,3 +1,4 @@
+import asyncio
 import unittest.mock as mock
 
 import pytest
@@ -30,10 +31,26 @@ class TestPipeline:
             mocked_answer: the mocked answer from grequests.
         """
         oxapi.api_key = "test"
-        with mock.patch("oxapi.abstract.api.requests.post", return_value=mocked_answer):
+        with mock.patch(
+            "oxapi.client.requests.Session.post", return_value=mocked_answer
+        ):
             api = Pipeline.run(model="en-core-web-lg", texts=["esposito"])
             assert api.result is not None
 
+    def test_arun(self, mocked_answer):
+        """Testing arun coroutine.
+
+        Args:
+            mocked_answer: the mocked answer from aiohttp.
+        """
+        oxapi.api_key = "test"
+        with mock.patch(
+            "oxapi.client.AsyncOxAPIClient.post",
+            new=mock.AsyncMock(return_value=mocked_answer),
+        ):
+            api = asyncio.run(Pipeline.arun(model="en-core-web-lg", texts=["esposito"]))
+            assert isinstance(api, Pipeline) and api.result is not None
+
     def test_prepare(self):
         """Testing prepare function."""
         oxapi.api_key = "test"
@@ -48,7 +65,9 @@ class TestPipeline:
 
         """
         oxapi.api_key = "test"
-        with mock.patch("oxapi.abstract.api.requests.post", return_value=mocked_answer):
+        with mock.patch(
+            "oxapi.client.requests.Session.post", return_value=mocked_answer
+        ):
             api = Pipeline.run(model="en-core-web-lg", texts=["esposito"])
 
         res = api.format_result()
@@ -62,7 +81,9 @@ class TestPipeline:
 
         """
         oxapi.api_key = "test"
-        with mock.patch("oxapi.abstract.api.requests.post", return_value=mocked_answer):
+        with mock.patch(
+            "oxapi.client.requests.Session.post", return_value=mocked_answer
+        ):
             api = Pipeline.run(model="en-core-web-lg", texts=["esposito"])
 
         with pytest.raises(ValueError) as ve:
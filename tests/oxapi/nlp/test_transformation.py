@@ -1,3 +1,4 @@
+import asyncio
 import unittest.mock as mock
 
 import pandas as pd
@@ -29,10 +30,28 @@ class TestTransformation:
             mocked_answer: the mocked answer from grequests.
         """
         oxapi.api_key = "test"
-        with mock.patch("oxapi.abstract.api.requests.post", return_value=mocked_answer):
+        with mock.patch(
+            "oxapi.client.requests.Session.post", return_value=mocked_answer
+        ):
             api = Transformation.run(model="punctuation-imputation", texts=["test"])
             assert api.result is not None
 
+    def test_arun(self, mocked_answer):
+        """Testing arun coroutine.
+
+        Args:
+            mocked_answer: the mocked answer from aiohttp.
+        """
+        oxapi.api_key = "test"
+        with mock.patch(
+            "oxapi.client.AsyncOxAPIClient.post",
+            new=mock.AsyncMock(return_value=mocked_answer),
+        ):
+            api = asyncio.run(
+                Transformation.arun(model="punctuation-imputation", texts=["test"])
+            )
+            assert isinstance(api, Transformation) and api.result is not None
+
     def test_prepare(self):
         """Testing prepare function."""
         oxapi.api_key = "test"
@@ -47,12 +66,27 @@ class TestTransformation:
 
         """
         oxapi.api_key = "test"
-        with mock.patch("oxapi.abstract.api.requests.post", return_value=mocked_answer):
+        with mock.patch(
+            "oxapi.client.requests.Session.post", return_value=mocked_answer
+        ):
             api = Transformation.run(model="punctuation-imputation", texts=["test"])
 
         res = api.format_result()
         assert isinstance(res, pd.DataFrame)
 
+    def test_format_result_arrow(self):
+        """Testing format_result function (arrow format), and the pandas format built
+        from the same columns."""
+        api = Transformation.prepare(
+            model="punctuation-imputation", texts=["test", "hi"]
+        )
+        api.set_params(result={"results": [["Test!"], ["Hi."]]})
+        table = api.format_result("arrow")
+        assert table.column_names == ["text", "output"]
+        assert table.column("output").to_pylist() == ["Test!", "Hi."]
+        expected = pd.DataFrame({"text": ["test", "hi"], "output": ["Test!", "Hi."]})
+        assert api.format_result().equals(expected)
+
     def test_format_result_dict(self, mocked_answer):
         """
         Testing format_result function (dict format)
@@ -61,7 +95,9 @@ class TestTransformation:
 
         """
         oxapi.api_key = "test"
-        with mock.patch("oxapi.abstract.api.requests.post", return_value=mocked_answer):
+        with mock.patch(
+            "oxapi.client.requests.Session.post", return_value=mocked_answer
+        ):
             api = Transformation.run(model="punctuation-imputation", texts=["test"])
 
         res = api.format_result("dict")
@@ -75,7 +111,9 @@ class TestTransformation:
 
         """
         oxapi.api_key = "test"
-        with mock.patch("oxapi.abstract.api.requests.post", return_value=mocked_answer):
+        with mock.patch(
+            "oxapi.client.requests.Session.post", return_value=mocked_answer
+        ):
             api = Transformation.run(model="punctuation-imputation", texts=["esposito"])
 
         with pytest.raises(ValueError) as ve:
@@ -1,11 +1,20 @@
+import asyncio
+import json
+import time
 import unittest.mock as mock
 
 import pytest
+import requests
 
 import oxapi
 from oxapi.asynch import AsyncCallPipe
+from oxapi.cache import ResultCache
+from oxapi.circuit import CircuitBreaker
+from oxapi.client import OxAPIClient, get_client, set_client
+from oxapi.error import CircuitOpenException, DeadlineExceededException
 from oxapi.nlp.encoding import Encoding
 from oxapi.nlp.transformation import Transformation
+from oxapi.retry import RetryPolicy
 from tests.testing_utils import MockedResponse
 
 
@@ -84,6 +93,42 @@ class TestAsyncCallPipe:
 
             assert res[0].result is not None and res[1].result is not None
 
+    def test_run_cached(self, monkeypatch):
+        """Testing that the cached calls and texts are not sent."""
+        oxapi.api_key = "test"
+        monkeypatch.setattr(Transformation, "cache", ResultCache())
+        sent = []
+
+        def answer(texts):
+            sent.append(texts)
+            return MockedResponse(
+                status_code=200, message={"results": [t + "." for t in texts]}
+            )
+
+        def grequests_map(requests, **kwargs):
+            return [answer(json.loads(r.kwargs["data"])["texts"]) for r in requests]
+
+        def prepare(texts):
+            return Transformation.prepare(model="punctuation-imputation", texts=texts)
+
+        with mock.patch("grequests.map", side_effect=grequests_map):
+            AsyncCallPipe([prepare(["a", "b"])]).run()
+            res = AsyncCallPipe([prepare(["a", "b"]), prepare(["b", "c"])]).run()
+        assert res[0].result == {"results": ["a.", "b."]}
+        assert res[1].result == {"results": ["b.", "c."]}
+        assert res[1]._body == {"texts": ["b", "c"]}
+
+        async def post(client, url, body, **kwargs):
+            return answer(body["texts"])
+
+        with mock.patch("oxapi.client.AsyncOxAPIClient.post", new=post):
+            pipe = AsyncCallPipe([prepare(["c", "d"]), prepare(["a"])])
+            res = asyncio.run(pipe.arun())
+            assert res[0].result == {"results": ["c.", "d."]}
+            assert res[1].result == {"results": ["a."]}
+            assert [i for i, _ in pipe.iter_completed()] == [0, 1]
+        assert sent == [["a", "b"], ["c"], ["d"]]
+
     def test_flush(self):
         """Testing flush function."""
         oxapi.api_key = "test"
@@ -96,3 +141,303 @@ class TestAsyncCallPipe:
             res = asy.run()
 
             assert res is None
+
+    def test_arun(self, mocked_answer):
+        """Testing arun coroutine.
+
+        Args:
+            mocked_answer: the mocked answer from aiohttp.
+        """
+        oxapi.api_key = "test"
+        texts = ["test", "test again"]
+        api1 = Encoding.prepare(model="all-mpnet-base-v2", texts=texts)
+        api2 = Transformation.prepare(model="punctuation-imputation", texts=texts)
+        asy = AsyncCallPipe([api1, api2])
+        with mock.patch(
+            "oxapi.client.AsyncOxAPIClient.post",
+            new=mock.AsyncMock(side_effect=mocked_answer),
+        ):
+            res = asyncio.run(asy.arun())
+
+            assert res[0].result == mocked_answer[0].json()
+            assert res[1].result == mocked_answer[1].json()
+
+    def test_deadline(self, mocked_answer):
+        """Testing the deadlines of the calls of a pipe.
+
+        Args:
+            mocked_answer: the mocked answer from grequests.
+        """
+        oxapi.api_key = "test"
+        texts = ["test", "test again"]
+        api1 = Encoding.prepare(model="all-mpnet-base-v2", texts=texts, deadline=0.05)
+        api2 = Transformation.prepare(model="punctuation-imputation", texts=texts)
+        asy = AsyncCallPipe([api1, api2])
+
+        timeouts = []
+
+        def request(method, url, **kwargs):
+            timeouts.append(kwargs["timeout"])
+            return mocked_answer[1]
+
+        def send_all(requests, **kwargs):
+            # waiting behind the limits of the pipe before being sent
+            time.sleep(0.06)
+            for request in requests:
+                request.send()
+            assert isinstance(requests[0].exception, DeadlineExceededException)
+            return [None, requests[1].response]
+
+        with mock.patch("grequests.map", side_effect=send_all), mock.patch(
+            "requests.Session.request", side_effect=request
+        ):
+            res = asy.run(deadline=10)
+        # only the second call is sent, with the budget left when it is sent
+        assert len(timeouts) == 1 and timeouts[0][1] <= 10 - 0.06
+        assert isinstance(res[0].error, DeadlineExceededException)
+        assert res[1].result is not None
+
+    def test_circuit_open(self, mocked_answer):
+        """Testing that the calls to a short-circuited endpoint are not sent.
+
+        Args:
+            mocked_answer: the mocked answer from grequests.
+        """
+        oxapi.api_key = "test"
+        texts = ["test", "test again"]
+        api1 = Encoding.prepare(model="all-mpnet-base-v2", texts=texts)
+        api2 = Transformation.prepare(model="punctuation-imputation", texts=texts)
+        asy = AsyncCallPipe([api1, api2])
+        previous = get_client()
+        client = OxAPIClient(circuit_breaker=CircuitBreaker(failure_threshold=1))
+        client.circuit_breaker.record_failure(api1.get_url())
+        set_client(client)
+        try:
+            with mock.patch(
+                "grequests.map", return_value=[mocked_answer[1]]
+            ) as mocked_map:
+                res = asy.run()
+        finally:
+            set_client(previous)
+        assert len(mocked_map.call_args.kwargs["requests"]) == 1
+        assert isinstance(res[0].error, CircuitOpenException)
+        assert res[1].result is not None
+
+    def test_arun_deadline(self, mocked_answer):
+        """Testing that the deadline of a pipe is passed to the client.
+
+        Args:
+            mocked_answer: the mocked answer from aiohttp.
+        """
+        oxapi.api_key = "test"
+        texts = ["test", "test again"]
+        api1 = Encoding.prepare(model="all-mpnet-base-v2", texts=texts, deadline=0.05)
+        api2 = Transformation.prepare(model="punctuation-imputation", texts=texts)
+        asy = AsyncCallPipe([api1, api2])
+        mocked_post = mock.AsyncMock(
+            side_effect=[DeadlineExceededException(), mocked_answer[1]]
+        )
+        with mock.patch("oxapi.client.AsyncOxAPIClient.post", new=mocked_post):
+            res = asyncio.run(asy.arun(deadline=10))
+        deadlines = [c.kwargs["deadline"] for c in mocked_post.call_args_list]
+        assert deadlines[0].budget == 0.05 and deadlines[1].budget == 10
+        assert isinstance(res[0].error, DeadlineExceededException)
+        assert res[1].result is not None
+
+    def test_arun_connection_error(self, mocked_answer):
+        """Testing arun coroutine with a failing call.
+
+        Args:
+            mocked_answer: the mocked answer from aiohttp.
+        """
+        oxapi.api_key = "test"
+        texts = ["test", "test again"]
+        api1 = Encoding.prepare(model="all-mpnet-base-v2", texts=texts)
+        api2 = Transformation.prepare(model="punctuation-imputation", texts=texts)
+        asy = AsyncCallPipe([api1, api2])
+        with mock.patch(
+            "oxapi.client.AsyncOxAPIClient.post",
+            new=mock.AsyncMock(side_effect=[ConnectionError(), mocked_answer[1]]),
+        ):
+            res = asyncio.run(asy.arun())
+
+            assert res[0].result is None and res[1].result is not None
+
+    def test_run_max_in_flight(self, mocked_answer):
+        """Testing that the max in flight limit is passed to grequests.
+
+        Args:
+            mocked_answer: the mocked answer from grequests.
+        """
+        oxapi.api_key = "test"
+        texts = ["test", "test again"]
+        api1 = Encoding.prepare(model="all-mpnet-base-v2", texts=texts)
+        api2 = Transformation.prepare(model="punctuation-imputation", texts=texts)
+        asy = AsyncCallPipe([api1, api2], max_in_flight=1)
+        with mock.patch("grequests.map", return_value=mocked_answer) as mocked_map:
+            asy.run()
+
+            assert mocked_map.call_args.kwargs["size"] == 1
+
+    def test_run_rate_limited(self, mocked_answer):
+        """Testing that each sent request takes its tokens from the buckets.
+
+        Args:
+            mocked_answer: the mocked answer from grequests.
+        """
+        oxapi.api_key = "test"
+        texts = ["test", "test again"]
+        api1 = Encoding.prepare(model="all-mpnet-base-v2", texts=texts)
+        api2 = Transformation.prepare(model="punctuation-imputation", texts=texts)
+        asy = AsyncCallPipe([api1, api2], requests_per_second=10, texts_per_second=50)
+
+        def send_all(requests, **kwargs):
+            for request in requests:
+                request.send(stream=False)
+            return mocked_answer
+
+        with mock.patch("grequests.AsyncRequest.send"), mock.patch(
+            "grequests.map", side_effect=send_all
+        ), mock.patch("oxapi.asynch.TokenBucket.acquire") as mocked_acquire:
+            res = asy.run()
+
+            assert [c.args for c in mocked_acquire.call_args_list] == [
+                (1,),
+                (2,),
+                (1,),
+                (2,),
+            ]
+            assert res[0].result is not None
+
+    def test_arun_bounded(self, mocked_answer):
+        """Testing that arun never exceeds the max in flight limit.
+
+        Args:
+            mocked_answer: the mocked answer from aiohttp.
+        """
+        oxapi.api_key = "test"
+        calls = [
+            Encoding.prepare(model="all-mpnet-base-v2", texts=["test"])
+            for _ in range(10)
+        ]
+        asy = AsyncCallPipe(calls, max_in_flight=3, requests_per_second=1000)
+        in_flight = []
+
+        async def post(client, url, body, **kwargs):
+            in_flight.append(1)
+            assert len(in_flight) <= 3
+            await asyncio.sleep(0.01)
+            in_flight.pop()
+            return mocked_answer[1]
+
+        with mock.patch("oxapi.client.AsyncOxAPIClient.post", new=post):
+            res = asyncio.run(asy.arun())
+
+            assert all(call.result is not None for call in res)
+
+    def test_iter_completed(self, mocked_answer):
+        """Testing iter_completed function.
+
+        Args:
+            mocked_answer: the mocked answer from grequests.
+        """
+        oxapi.api_key = "test"
+        texts = ["test", "test again"]
+        api1 = Transformation.prepare(model="punctuation-imputation", texts=texts)
+        api2 = Encoding.prepare(model="all-mpnet-base-v2", texts=texts)
+        asy = AsyncCallPipe([api1, api2])
+
+        def request(method, url, **kwargs):
+            if "punctuation-imputation" in url:
+                time.sleep(0.05)
+                return mocked_answer[0]
+            return mocked_answer[1]
+
+        with mock.patch("requests.Session.request", side_effect=request):
+            res = list(asy.iter_completed())
+
+            assert [i for i, _ in res] == [1, 0]
+            assert res[0][1] is api2 and api2.result == mocked_answer[1].json()
+            assert res[1][1] is api1 and api1.result == mocked_answer[0].json()
+
+    def test_iter_completed_empty(self):
+        """Testing iter_completed function on empty call list."""
+        asy = AsyncCallPipe()
+        assert list(asy.iter_completed()) == []
+
+    def test_aiter_completed(self, mocked_answer):
+        """Testing aiter_completed async generator.
+
+        Args:
+            mocked_answer: the mocked answer from aiohttp.
+        """
+        oxapi.api_key = "test"
+        slow = Transformation.prepare(model="punctuation-imputation", texts=["slow"])
+        fast = Encoding.prepare(model="all-mpnet-base-v2", texts=["fast"])
+        asy = AsyncCallPipe([slow, fast])
+
+        async def post(client, url, body, **kwargs):
+            if body["texts"] == ["slow"]:
+                await asyncio.sleep(0.05)
+                return mocked_answer[0]
+            return mocked_answer[1]
+
+        async def collect():
+            return [(i, call) async for i, call in asy.aiter_completed()]
+
+        with mock.patch("oxapi.client.AsyncOxAPIClient.post", new=post):
+            res = asyncio.run(collect())
+
+            assert [i for i, _ in res] == [1, 0]
+            assert res[0][1] is fast and fast.result is not None
+            assert res[1][1] is slow and slow.result is not None
+
+    def test_run_retry(self, mocked_answer):
+        """Testing that only the failed calls are retried.
+
+        Args:
+            mocked_answer: the mocked answer from grequests.
+        """
+        oxapi.api_key = "test"
+        texts = ["test", "test again"]
+        api1 = Transformation.prepare(model="punctuation-imputation", texts=texts)
+        api2 = Encoding.prepare(model="all-mpnet-base-v2", texts=texts)
+        asy = AsyncCallPipe([api1, api2], retry_policy=RetryPolicy(backoff_factor=0))
+        unavailable = MockedResponse(status_code=503, message={"message": "error"})
+        with mock.patch(
+            "grequests.map",
+            side_effect=[[unavailable, mocked_answer[1]], [mocked_answer[0]]],
+        ) as mocked_map:
+            res = asy.run()
+
+            assert len(mocked_map.call_args_list[1].kwargs["requests"]) == 1
+            assert res[0].result is not None and res[0].error is None
+            assert res[1].result is not None
+
+    def test_iter_completed_retry(self, mocked_answer):
+        """Testing that failed calls are retried when iterating on completion.
+
+        Args:
+            mocked_answer: the mocked answer from grequests.
+        """
+        oxapi.api_key = "test"
+        texts = ["test", "test again"]
+        api1 = Transformation.prepare(model="punctuation-imputation", texts=texts)
+        api2 = Encoding.prepare(model="all-mpnet-base-v2", texts=texts)
+        asy = AsyncCallPipe([api1, api2], retry_policy=RetryPolicy(backoff_factor=0))
+        sent = []
+
+        def request(method, url, **kwargs):
+            sent.append(url)
+            if "punctuation-imputation" not in url:
+                return mocked_answer[1]
+            if len([url for url in sent if "punctuation-imputation" in url]) == 1:
+                time.sleep(0.05)
+                raise requests.ConnectionError()
+            return mocked_answer[0]
+
+        with mock.patch("requests.Session.request", side_effect=request):
+            res = list(asy.iter_completed())
+
+            assert [i for i, _ in res] == [1, 0]
+            assert api1.result is not None and api2.result is not None
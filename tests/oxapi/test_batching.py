@@ -0,0 +1,143 @@
+import pytest
+
+from oxapi.batching import (
+    AdaptiveChunkingPolicy,
+    ChunkingPolicy,
+    ChunkQueue,
+    deduplicate,
+    expand_results,
+    merge_results,
+)
+from tests.testing_utils import MockedResponse
+
+
+class TestChunkingPolicy:
+    """Tests for ChunkingPolicy class."""
+
+    def test_invalid_limits(self):
+        """Testing error at instantiation with non positive limits."""
+        with pytest.raises(ValueError):
+            ChunkingPolicy(max_texts=0)
+        with pytest.raises(ValueError):
+            ChunkingPolicy(max_bytes=0)
+
+    def test_split_count(self):
+        """Testing the split by number of texts."""
+        policy = ChunkingPolicy(max_texts=2)
+        assert policy.split(["a", "b", "c", "d", "e"]) == [(0, 2), (2, 4), (4, 5)]
+        assert policy.split(["a"]) == [(0, 1)]
+        assert policy.split([]) == []
+
+    def test_split_bytes(self):
+        """Testing the split by size, a larger text being sent alone."""
+        policy = ChunkingPolicy(max_bytes=10)
+        texts = ["aa", "bb", "cccccccccccc", "d", "e"]
+        assert policy.split(texts) == [(0, 2), (2, 3), (3, 5)]
+
+
+class TestAdaptiveChunkingPolicy:
+    """Tests for AdaptiveChunkingPolicy class."""
+
+    @staticmethod
+    def response(status_code: int) -> MockedResponse:
+        """Creates a mocked response.
+
+        Args:
+            status_code: the status code of the response.
+
+        Returns:
+            MockedResponse : the mocked response.
+        """
+        return MockedResponse(status_code=status_code, message={})
+
+    def test_invalid_factor(self):
+        """Testing error at instantiation with an invalid decrease factor."""
+        with pytest.raises(ValueError):
+            AdaptiveChunkingPolicy(decrease_factor=1)
+
+    def test_increase(self):
+        """Testing the additive increase after fast successful chunks."""
+        policy = AdaptiveChunkingPolicy(
+            max_texts=10, max_concurrency=2, texts_step=5, texts_limit=18
+        )
+        assert not policy.record(10, 0.1, self.response(200))
+        assert policy.get_values() == {"max_texts": 15, "max_concurrency": 2}
+        policy.record(3, 0.1, self.response(200))
+        assert policy.get_values() == {"max_texts": 15, "max_concurrency": 3}
+        policy.record(15, 0.1, self.response(200))
+        assert policy.max_texts == 18
+        assert policy.get_concurrency_limit() == 16
+
+    def test_decrease(self):
+        """Testing the multiplicative decrease after slow or failed chunks."""
+        policy = AdaptiveChunkingPolicy(
+            max_texts=40, max_concurrency=8, target_latency=1.0
+        )
+        policy.record(40, 2.0, self.response(200))
+        assert policy.get_values() == {"max_texts": 20, "max_concurrency": 8}
+        policy.record(20, 0.1, self.response(429))
+        assert policy.get_values() == {"max_texts": 20, "max_concurrency": 4}
+        policy.record(20, 1.0)
+        assert policy.get_values() == {"max_texts": 10, "max_concurrency": 2}
+        policy.record(10, 0.1, self.response(400))
+        assert policy.get_values() == {"max_texts": 10, "max_concurrency": 2}
+
+    def test_too_large(self):
+        """Testing that a chunk rejected as too large is resent, unless it holds a
+        single text."""
+        policy = AdaptiveChunkingPolicy(max_texts=8, min_texts=2)
+        assert policy.record(6, 0.1, self.response(413))
+        assert policy.max_texts == 3
+        assert policy.record(3, 0.1, self.response(413))
+        assert policy.max_texts == 2
+        assert not policy.record(1, 0.1, self.response(413))
+
+
+class TestChunkQueue:
+    """Tests for ChunkQueue class."""
+
+    def test_requeue(self):
+        """Testing that the chunks follow the current limits and that the requeued
+        chunks are split again first."""
+        policy = ChunkingPolicy(max_texts=3)
+        queue = ChunkQueue(policy, ["a", "b", "c", "d", "e", "f", "g"])
+        assert queue.next() == (0, 3)
+        policy.max_texts = 2
+        queue.requeue(0, 3)
+        assert queue.next() == (0, 2)
+        assert queue.next() == (2, 3)
+        assert queue.next() == (3, 5)
+        assert queue.next() == (5, 7)
+        assert queue.next() is None
+
+
+class TestMergeResults:
+    """Tests for merge_results function."""
+
+    def test_merge(self):
+        """Testing that the results are concatenated in order."""
+        merged = merge_results(
+            [{"results": [1, 2], "model": "m"}, {"results": [3], "model": "m"}]
+        )
+        assert merged == {"results": [1, 2, 3], "model": "m"}
+
+
+class TestDeduplicate:
+    """Tests for deduplicate and expand_results functions."""
+
+    def test_deduplicate(self):
+        """Testing that the unique texts are kept in order of first occurrence."""
+        unique, positions = deduplicate(["ok", "yes", "ok", "no", "yes"])
+        assert unique == ["ok", "yes", "no"]
+        assert positions == [0, 1, 0, 2, 1]
+        assert expand_results({"results": [1, 2, 3], "model": "m"}, positions) == {
+            "results": [1, 2, 1, 3, 2],
+            "model": "m",
+        }
+
+    def test_unique(self):
+        """Testing that unique or unhashable texts are left untouched."""
+        texts = ["ok", "yes"]
+        assert deduplicate(texts) == (texts, None)
+        dialogs = [["hi", "hello"], ["hi", "hello"]]
+        assert deduplicate(dialogs) == (dialogs, None)
@@ -0,0 +1,254 @@
+import multiprocessing
+import time
+
+import numpy as np
+import pytest
+
+from oxapi.cache import (
+    CompletionCache,
+    DiskEmbeddingStore,
+    EmbeddingCache,
+    ResultCache,
+    SQLiteResultBackend,
+)
+
+
+class TestEmbeddingCache:
+    """Tests for EmbeddingCache class."""
+
+    def test_invalid_size(self):
+        """Testing error at instantiation with a non positive size."""
+        with pytest.raises(ValueError):
+            EmbeddingCache(max_bytes=0)
+
+    def test_get_key(self):
+        """Testing that the key depends on the model, the versions and the text."""
+        key = EmbeddingCache.get_key("all-mpnet-base-v2", "v1", "v1", "hello")
+        assert key == EmbeddingCache.get_key("all-mpnet-base-v2", "v1", "v1", "hello")
+        assert key != EmbeddingCache.get_key("all-mpnet-base-v2", "v2", "v1", "hello")
+        assert key != EmbeddingCache.get_key("all-mpnet-base-v2", "v1", "v1", "hi")
+
+    def test_put_get(self):
+        """Testing that the embeddings are stored as float32 vectors."""
+        cache = EmbeddingCache()
+        cache.put(("m", "v1", "v1", b"a"), [1.0, 2.0])
+        vector = cache.get(("m", "v1", "v1", b"a"))
+        assert vector.dtype == np.float32 and vector.tolist() == [1.0, 2.0]
+        assert cache.get(("m", "v1", "v1", b"b")) is None
+        assert cache.size == 8 and len(cache) == 1
+        assert cache.hits == 1 and cache.misses == 1
+
+    def test_eviction(self):
+        """Testing that the least recently used embeddings are evicted first."""
+        cache = EmbeddingCache(max_bytes=24)
+        for name in ["a", "b", "c"]:
+            cache.put(name, [1.0, 2.0])
+        cache.get("a")
+        cache.put("d", [1.0, 2.0])
+        assert cache.get_many(["a", "b", "c", "d"])[1] is None
+        assert cache.size == 24 and cache.evictions == 1
+        # larger than the whole cache
+        cache.put("e", [1.0] * 10)
+        assert cache.get("e") is None and len(cache) == 3
+        cache.clear()
+        assert len(cache) == 0 and cache.size == 0
+
+
+def key(name) -> bytes:
+    """Builds the key of the embedding of a text in a DiskEmbeddingStore.
+
+    Args:
+        name: the text.
+
+    Returns:
+        bytes : the key.
+    """
+    return DiskEmbeddingStore.get_key("all-mpnet-base-v2", "v1", "v1", str(name))
+
+
+def write_embeddings(path: str, start: int):
+    """Writes embeddings to a store from another process.
+
+    Args:
+        path: the directory of the store.
+        start: the value of the first embedding.
+    """
+    store = DiskEmbeddingStore(path)
+    for i in range(start, start + 20):
+        store.put(key(i), [float(i)] * 4)
+
+
+class TestDiskEmbeddingStore:
+    """Tests for DiskEmbeddingStore class."""
+
+    def test_invalid_parameters(self, tmp_path):
+        """Testing error at instantiation with invalid parameters."""
+        with pytest.raises(ValueError):
+            DiskEmbeddingStore(str(tmp_path), max_bytes=0)
+        with pytest.raises(ValueError):
+            DiskEmbeddingStore(str(tmp_path), compact_ratio=0)
+
+    def test_put_get(self, tmp_path):
+        """Testing that the embeddings are returned as read-only views, and are
+        visible to the other instances on the same directory."""
+        store = DiskEmbeddingStore(str(tmp_path / "store"))
+        hello = store.get_key("all-mpnet-base-v2", "v1", "v1", "hello")
+        assert hello != store.get_key("all-mpnet-base-v2", "v2", "v1", "hello")
+        assert store.get(hello) is None
+        with pytest.raises(ValueError):
+            store.put(b"short", [1.0])
+        store.put_many([hello, key("other")], [[1.0, 2.0], [3.0]])
+        vector = store.get(hello)
+        assert vector.dtype == np.float32 and vector.tolist() == [1.0, 2.0]
+        assert not vector.flags.writeable and not vector.flags.owndata
+        other = DiskEmbeddingStore(str(tmp_path / "store"))
+        assert [v.tolist() for v in other.get_many([key("other"), hello])] == [
+            [3.0],
+            [1.0, 2.0],
+        ]
+        other.put(key("new"), [4.0])
+        assert store.get(key("new")).tolist() == [4.0]
+        assert len(store) == 3 and store.size == 16
+        store.clear()
+        assert other.get(hello) is None and len(other) == 0
+
+    def test_processes(self, tmp_path):
+        """Testing concurrent writes from several processes."""
+        path = str(tmp_path)
+        processes = [
+            multiprocessing.Process(target=write_embeddings, args=(path, start))
+            for start in (0, 20, 40)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        store = DiskEmbeddingStore(path)
+        vectors = store.get_many([key(i) for i in range(60)])
+        assert [vector.tolist() for vector in vectors] == [
+            [float(i)] * 4 for i in range(60)
+        ]
+
+    def test_compaction(self, tmp_path):
+        """Testing that the oldest embeddings are dropped when the store is full,
+        the views obtained before remaining valid."""
+        store = DiskEmbeddingStore(str(tmp_path), max_bytes=64, compact_ratio=0.5)
+        for i in range(4):
+            store.put(key(i), [float(i)] * 4)
+        view = store.get(key("0"))
+        store.put(key("4"), [4.0] * 4)
+        assert store.compactions == 1 and store.size == 32
+        assert store.get_many([key("0"), key("1"), key("2")]) == [None, None, None]
+        assert store.get(key("3")).tolist() == [3.0] * 4
+        assert store.get(key("4")).tolist() == [4.0] * 4
+        assert view.tolist() == [0.0] * 4
+        other = DiskEmbeddingStore(str(tmp_path))
+        assert len(other) == 2
+
+    def test_interrupted_write(self, tmp_path):
+        """Testing that a partially written record is ignored and overwritten."""
+        store = DiskEmbeddingStore(str(tmp_path))
+        store.put(key("a"), [1.0])
+        with open(str(tmp_path / "index"), "ab") as index:
+            index.write(key("partial"))
+        with open(str(tmp_path / "vectors.f32"), "ab") as vectors:
+            vectors.write(key("xx"))
+        assert len(store) == 1
+        store.put(key("b"), [2.0])
+        other = DiskEmbeddingStore(str(tmp_path))
+        assert [v.tolist() for v in other.get_many([key("a"), key("b")])] == [
+            [1.0],
+            [2.0],
+        ]
+        other.compact()
+        assert store.size == 8 and store.get(key("b")).tolist() == [2.0]
+
+
+class TestResultCache:
+    """Tests for ResultCache class."""
+
+    @pytest.fixture(params=["memory", "sqlite"])
+    def backend(self, request, tmp_path):
+        """Creates the backends of the cache.
+
+        Returns:
+            the backend, None for the default in-memory one.
+        """
+        if request.param == "memory":
+            return None
+        return SQLiteResultBackend(str(tmp_path / "results.db"))
+
+    def test_invalid_ttl(self):
+        """Testing error at instantiation with a non positive ttl."""
+        with pytest.raises(ValueError):
+            ResultCache(ttl=0)
+
+    def test_put_get(self, backend):
+        """Testing that the results are returned until they expire."""
+        cache = ResultCache(backend=backend, ttl=0.05)
+        keys = [cache.get_key("dialog-tag", "v1", "v1", t) for t in ["a", "b"]]
+        assert cache.get_many(keys) == [None, None]
+        cache.put_many(keys, [["tag", 1.0], ["other", 0.5]])
+        assert cache.get_many(keys) == [["tag", 1.0], ["other", 0.5]]
+        assert cache.hits == 2 and cache.misses == 2
+        time.sleep(0.06)
+        assert cache.get_many(keys) == [None, None]
+        assert len(cache.backend) == 0
+
+    def test_version_change(self, backend):
+        """Testing that the results of the previous versions of a model are
+        removed once a newer version is called, and only then."""
+        cache = ResultCache(backend=backend, ttl=None)
+        old = cache.get_key("dialog-tag", "v1", "v1", "a")
+        other = cache.get_key("dialog-content-filter", "v1", "v1", "a")
+        cache.put_many([old, other], ["old", "other"])
+        new = cache.get_key("dialog-tag", "v2", "v1", "a")
+        assert cache.get_many([new, old, other]) == [None, None, "other"]
+        cache.put_many([new], ["new"])
+        # alternating with a pinned older version keeps the results of both
+        for _ in range(2):
+            old = cache.get_key("dialog-tag", "v1", "v1", "a")
+            cache.put_many([old], ["old"])
+            new = cache.get_key("dialog-tag", "v2", "v1", "a")
+            assert cache.get_many([new, old]) == ["new", "old"]
+        newest = cache.get_key("dialog-tag", "v10", "v1", "a")
+        assert cache.get_many([newest, new, old]) == [None, None, None]
+
+    def test_persistence(self, tmp_path):
+        """Testing that the SQLite results are shared by several caches."""
+        path = str(tmp_path / "results.db")
+        cache = ResultCache(backend=SQLiteResultBackend(path))
+        key = cache.get_key("dialog-tag", "v1", "v1", "a")
+        cache.put_many([key], [{"label": "tag"}])
+        cache.backend.close()
+        other = ResultCache(backend=SQLiteResultBackend(path))
+        assert other.get_many([key]) == [{"label": "tag"}]
+        other.clear()
+        assert other.get_many([key]) == [None]
+
+
+class TestCompletionCache:
+    """Tests for CompletionCache class."""
+
+    def test_accepts(self):
+        """Testing that only the calls disabling sampling are cached."""
+        cache = CompletionCache()
+        assert cache.accepts({"prompt": "a", "do_sample": False})
+        assert not cache.accepts({"prompt": "a", "do_sample": True})
+        assert not cache.accepts({"prompt": "a", "temperature": 0.7})
+        assert cache.refused == 2
+
+    def test_get_key(self):
+        """Testing that the key depends on the canonical parameters."""
+        cache = CompletionCache()
+        key = cache.get_key(
+            "gpt-j-6b", "v1", "v1", {"prompt": "a", "do_sample": False, "top_p": 1.0}
+        )
+        assert key == cache.get_key(
+            "gpt-j-6b", "v1", "v1", {"top_p": 1, "do_sample": False, "prompt": "a"}
+        )
+        assert key != cache.get_key(
+            "gpt-j-6b", "v1", "v1", {"prompt": "b", "do_sample": False, "top_p": 1}
+        )
+        cache.put_many([key], [{"results": ["done"]}])
+        assert cache.get_many([key]) == [{"results": ["done"]}]
@@ -0,0 +1,157 @@
+import asyncio
+import time
+import unittest.mock as mock
+
+import pytest
+import requests
+
+import oxapi
+from oxapi.circuit import CircuitBreaker
+from oxapi.client import AsyncOxAPIClient, OxAPIClient, get_client, set_client
+from oxapi.error import CircuitOpenException
+from oxapi.nlp.classification import Classification
+from tests.testing_utils import MockedResponse
+
+URL = "https://api.oxolo.com/nlp/v1/classification/dialog-emotions"
+
+
+class TestCircuitBreaker:
+    """Tests for CircuitBreaker class."""
+
+    def test_invalid_threshold(self):
+        """Testing error at instantiation with a non positive threshold."""
+        with pytest.raises(ValueError):
+            CircuitBreaker(failure_threshold=0)
+
+    def test_open(self):
+        """Testing that the circuit opens after consecutive failures only."""
+        breaker = CircuitBreaker(failure_threshold=3)
+        breaker.record(URL)
+        breaker.record(URL, MockedResponse(status_code=503, message={}))
+        breaker.record(URL, MockedResponse(status_code=400, message={}))
+        breaker.record(URL)
+        breaker.record(URL)
+        assert breaker.get_state(URL) == "closed"
+        breaker.before_call(URL)
+        breaker.record(URL)
+        assert breaker.get_state(URL) == "open"
+        with pytest.raises(CircuitOpenException):
+            breaker.before_call(URL)
+        assert breaker.get_state("https://api.oxolo.com/other") == "closed"
+        assert breaker.get_states() == {URL: {"state": "open", "failures": 3}}
+
+    def test_half_open(self):
+        """Testing the probe calls after the recovery timeout."""
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+        breaker.record_failure(URL)
+        time.sleep(0.06)
+        assert breaker.get_state(URL) == "half-open"
+        breaker.before_call(URL)
+        with pytest.raises(CircuitOpenException):
+            breaker.before_call(URL)
+        breaker.record_failure(URL)
+        assert breaker.get_state(URL) == "open"
+        time.sleep(0.06)
+        breaker.before_call(URL)
+        breaker.record_success(URL)
+        assert breaker.get_state(URL) == "closed"
+
+    def test_reset(self):
+        """Testing the manual closing of the circuits."""
+        breaker = CircuitBreaker(failure_threshold=1)
+        breaker.record_failure(URL)
+        breaker.reset(URL)
+        assert breaker.get_state(URL) == "closed"
+        breaker.record_failure(URL)
+        breaker.reset()
+        assert breaker.get_states() == {}
+
+
+class TestCircuitBreakerClient:
+    """Tests for the circuit breaker in the request path."""
+
+    def test_fail_fast(self):
+        """Testing that the client stops calling an endpoint that is down."""
+        oxapi.api_key = "test"
+        client = OxAPIClient(circuit_breaker=CircuitBreaker(failure_threshold=2))
+        answer = MockedResponse(status_code=503, message={"message": "unavailable"})
+        with mock.patch.object(
+            requests.Session, "post", return_value=answer
+        ) as mocked_post:
+            client.post(URL, {"texts": []})
+            with mock.patch.object(
+                requests.Session, "post", side_effect=requests.ConnectionError()
+            ):
+                with pytest.raises(requests.ConnectionError):
+                    client.post(URL, {"texts": []})
+            with pytest.raises(CircuitOpenException):
+                client.post(URL, {"texts": []})
+        assert mocked_post.call_count == 1
+        assert client.circuit_breaker.get_state(URL) == "open"
+
+    def test_probe_broken_response(self):
+        """Testing that a probe failing with an unexpected error frees the circuit."""
+        oxapi.api_key = "test"
+        client = OxAPIClient(
+            circuit_breaker=CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+        )
+        client.circuit_breaker.record_failure(URL)
+        with mock.patch.object(
+            requests.Session,
+            "post",
+            side_effect=requests.exceptions.ChunkedEncodingError(),
+        ):
+            with pytest.raises(requests.exceptions.ChunkedEncodingError):
+                client.post(URL, {"texts": []})
+        assert client.circuit_breaker.get_state(URL) == "half-open"
+        answer = MockedResponse(status_code=200, message={"results": []})
+        with mock.patch.object(requests.Session, "post", return_value=answer):
+            assert client.post(URL, {"texts": []}) is answer
+        assert client.circuit_breaker.get_state(URL) == "closed"
+
+    def test_probe_cancelled(self):
+        """Testing that a cancelled asynchronous probe frees the circuit."""
+        oxapi.api_key = "test"
+        client = AsyncOxAPIClient(
+            circuit_breaker=CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+        )
+        client.circuit_breaker.record_failure(URL)
+        answer = MockedResponse(status_code=200, message={"results": []})
+
+        async def send(*args, **kwargs):
+            await asyncio.sleep(10)
+
+        async def run():
+            with mock.patch.object(AsyncOxAPIClient, "_send", side_effect=send):
+                task = asyncio.ensure_future(client.post(URL, {"texts": []}))
+                await asyncio.sleep(0.01)
+                task.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await task
+            with mock.patch.object(
+                AsyncOxAPIClient, "_send", new=mock.AsyncMock(return_value=answer)
+            ):
+                return await client.post(URL, {"texts": []})
+
+        assert asyncio.run(run()) is answer
+        assert client.circuit_breaker.get_state(URL) == "closed"
+
+    def test_run(self):
+        """Testing the error of a short-circuited run."""
+        oxapi.api_key = "test"
+        previous = get_client()
+        client = OxAPIClient(circuit_breaker=CircuitBreaker(failure_threshold=1))
+        set_client(client)
+        try:
+            api = Classification.prepare(model="dialog-emotions", texts=["test"])
+            client.circuit_breaker.record_failure(api.get_url())
+            with mock.patch.object(requests.Session, "post") as mocked_post:
+                with pytest.raises(CircuitOpenException):
+                    Classification.run(model="dialog-emotions", texts=["test"])
+                api = Classification.run(
+                    model="dialog-emotions", texts=["test"], raise_exceptions=False
+                )
+            assert mocked_post.call_count == 0
+            assert isinstance(api.error, CircuitOpenException) and api.result is None
+        finally:
+            set_client(previous)
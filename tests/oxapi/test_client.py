@@ -0,0 +1,370 @@
+import asyncio
+import gzip
+import json
+import threading
+import time
+import unittest.mock as mock
+
+import pytest
+import requests
+
+import oxapi
+from oxapi.client import (
+    AsyncOxAPIClient,
+    BaseOxAPIClient,
+    OxAPIClient,
+    get_async_client,
+    get_client,
+    set_async_client,
+    set_client,
+)
+from oxapi.error import DeadlineExceededException
+from oxapi.hedging import HedgingPolicy
+from oxapi.nlp.encoding import Encoding
+from oxapi.retry import RetryPolicy
+from tests.testing_utils import LocalServer, MockedResponse
+
+
+class TestOxAPIClient:
+    """Tests for OxAPIClient class."""
+
+    def test_base_instantiation(self):
+        """Test error at abstract class instantiation."""
+        with pytest.raises(NotImplementedError):
+            BaseOxAPIClient()
+
+    def test_compression(self):
+        """Testing the compression of the request bodies above the threshold."""
+        oxapi.api_key = "test"
+        small = {"texts": ["test"]}
+        large = {"texts": ["a long transcript"] * 100}
+        with LocalServer(message={"results": []}) as server:
+            with OxAPIClient(compress_threshold=100) as client:
+                client.post(server.url, small)
+                client.post(server.url, large)
+                stats = client.stats.as_dict()
+        small_request, large_request = server.requests
+        assert "Content-Encoding" not in small_request["headers"]
+        assert json.loads(small_request["body"]) == small
+        assert large_request["headers"]["Content-Encoding"] == "gzip"
+        assert "gzip" in large_request["headers"]["Accept-Encoding"]
+        assert json.loads(gzip.decompress(large_request["body"])) == large
+        assert stats["requests"] == 2 and stats["responses"] == 2
+        assert stats["bytes_sent"] < stats["bytes_sent_uncompressed"]
+        assert stats["bytes_received"] == 2 * len(b'{"results": []}')
+
+    def test_no_compression(self):
+        """Testing that request bodies are not compressed by default."""
+        oxapi.api_key = "test"
+        body = {"texts": ["a long transcript"] * 100}
+        data, headers = OxAPIClient().encode_body(body)
+        assert json.loads(data) == body and "Content-Encoding" not in headers
+
+    def test_session_reused(self):
+        """Testing that the same pooled session is used across calls."""
+        client = OxAPIClient(pool_connections=2, pool_maxsize=4)
+        session = client.session
+        assert client.session is session
+        adapter = session.get_adapter("https://api.oxolo.com")
+        assert adapter._pool_maxsize == 4 and adapter._pool_connections == 2
+        client.close()
+        assert client._session is None
+
+    def test_headers(self):
+        """Testing the authorization header."""
+        oxapi.api_key = "test"
+        assert OxAPIClient.get_headers()["Authorization"] == "test"
+
+    def test_set_client(self):
+        """Testing the replacement of the default client."""
+        previous = get_client()
+        client = OxAPIClient()
+        set_client(client)
+        try:
+            assert get_client() is client
+        finally:
+            set_client(previous)
+
+    def test_run_uses_default_client(self):
+        """Testing that ModelAPI.run goes through the default client."""
+        oxapi.api_key = "test"
+        mocked_answer = MockedResponse(status_code=200, message={"results": [[1.0]]})
+        with mock.patch.object(
+            OxAPIClient, "post", return_value=mocked_answer
+        ) as mocked_post:
+            Encoding.run(model="all-mpnet-base-v2", texts=["test"])
+            Encoding.run(model="all-mpnet-base-v2", texts=["test"])
+        assert mocked_post.call_count == 2
+
+    def test_retry(self):
+        """Testing that retryable failures are retried."""
+        oxapi.api_key = "test"
+        client = OxAPIClient(retry_policy=RetryPolicy(backoff_factor=0))
+        answers = [
+            requests.ConnectionError(),
+            MockedResponse(status_code=503, message={"message": "unavailable"}),
+            MockedResponse(status_code=200, message={"results": []}),
+        ]
+        with mock.patch.object(
+            requests.Session, "post", side_effect=answers
+        ) as mocked_post:
+            res = client.post("https://api.oxolo.com", {"texts": []})
+        assert res.status_code == 200 and mocked_post.call_count == 3
+
+    def test_retry_exhausted(self):
+        """Testing that the last failure is returned once the attempts are over."""
+        oxapi.api_key = "test"
+        client = OxAPIClient(retry_policy=RetryPolicy(max_attempts=2, backoff_factor=0))
+        answer = MockedResponse(status_code=429, message={"message": "slow down"})
+        with mock.patch.object(
+            requests.Session, "post", return_value=answer
+        ) as mocked_post:
+            res = client.post("https://api.oxolo.com", {"texts": []})
+        assert res.status_code == 429 and mocked_post.call_count == 2
+        with mock.patch.object(
+            requests.Session, "post", side_effect=requests.ConnectionError()
+        ):
+            with pytest.raises(requests.ConnectionError):
+                client.post("https://api.oxolo.com", {"texts": []})
+
+    def test_timeout(self):
+        """Testing that the connect and read timeouts are capped by the deadline."""
+        oxapi.api_key = "test"
+        client = OxAPIClient(connect_timeout=1, read_timeout=30)
+        answer = MockedResponse(status_code=200, message={"results": []})
+        with mock.patch.object(
+            requests.Session, "post", return_value=answer
+        ) as mocked_post:
+            client.post("https://api.oxolo.com", {"texts": []})
+            client.post("https://api.oxolo.com", {"texts": []}, deadline=5)
+        assert mocked_post.call_args_list[0].kwargs["timeout"] == (1, 30)
+        connect, read = mocked_post.call_args_list[1].kwargs["timeout"]
+        assert connect == 1 and 4 < read <= 5
+
+    def test_deadline(self):
+        """Testing that the retries stop when the deadline budget is exhausted."""
+        oxapi.api_key = "test"
+        client = OxAPIClient(
+            retry_policy=RetryPolicy(max_attempts=10, backoff_factor=0.04, jitter=False)
+        )
+        answer = MockedResponse(status_code=503, message={"message": "unavailable"})
+        with mock.patch.object(
+            requests.Session, "post", return_value=answer
+        ) as mocked_post:
+            start = time.monotonic()
+            res = client.post("https://api.oxolo.com", {"texts": []}, deadline=0.1)
+        assert res.status_code == 503 and mocked_post.call_count == 2
+        assert time.monotonic() - start < 0.1
+
+        def post(*args, **kwargs):
+            time.sleep(kwargs["timeout"][1])
+            raise requests.Timeout()
+
+        with mock.patch.object(requests.Session, "post", side_effect=post):
+            with pytest.raises(DeadlineExceededException):
+                client.post("https://api.oxolo.com", {"texts": []}, deadline=0.05)
+
+    def test_no_retry(self):
+        """Testing that failures are not retried without a retry policy."""
+        oxapi.api_key = "test"
+        client = OxAPIClient()
+        answer = MockedResponse(status_code=503, message={"message": "unavailable"})
+        with mock.patch.object(
+            requests.Session, "post", return_value=answer
+        ) as mocked_post:
+            client.post("https://api.oxolo.com", {"texts": []})
+        assert mocked_post.call_count == 1
+
+    def test_hedging(self):
+        """Testing that a slow request is hedged and the fastest response used."""
+        oxapi.api_key = "test"
+        slow = MockedResponse(status_code=200, message={"results": ["slow"]})
+        fast = MockedResponse(status_code=200, message={"results": ["fast"]})
+        slow.close = fast.close = mock.Mock()
+        answers = iter([(0.5, slow), (0.0, fast)])
+
+        def post(*args, **kwargs):
+            delay, answer = next(answers)
+            time.sleep(delay)
+            return answer
+
+        hedging = HedgingPolicy(initial_delay=0.05, max_ratio=1.0)
+        with OxAPIClient(hedging=hedging) as client:
+            with mock.patch.object(requests.Session, "post", side_effect=post):
+                res = client.post("https://api.oxolo.com", {"prompt": "test"})
+        assert res is fast and hedging.hedges == 1
+
+    def test_hedging_abort(self):
+        """Testing that the request sent by the calling thread is aborted once its
+        duplicate wins."""
+        oxapi.api_key = "test"
+        hedging = HedgingPolicy(initial_delay=0.05, max_ratio=1.0)
+        with LocalServer(message={"results": ["done"]}, delays=[5]) as server:
+            with OxAPIClient(hedging=hedging) as client:
+                start = time.monotonic()
+                res = client.post(server.url + "/v1/model", {"prompt": "test"})
+                elapsed = time.monotonic() - start
+        assert res.json() == {"results": ["done"]} and hedging.hedges == 1
+        assert elapsed < 2 and len(server.requests) == 2
+
+    def test_hedging_ratio_exceeded(self):
+        """Testing that no duplicate request is sent beyond the maximum ratio."""
+        oxapi.api_key = "test"
+        answer = MockedResponse(status_code=200, message={"results": ["slow"]})
+
+        def post(*args, **kwargs):
+            time.sleep(0.1)
+            return answer
+
+        hedging = HedgingPolicy(initial_delay=0.01, max_ratio=0.0)
+        with OxAPIClient(hedging=hedging) as client:
+            with mock.patch.object(
+                requests.Session, "post", side_effect=post
+            ) as mocked_post:
+                res = client.post("https://api.oxolo.com", {"prompt": "test"})
+        assert res is answer and mocked_post.call_count == 1
+        assert hedging.hedges == 0 and hedging.requests == 1
+
+
+class TestAsyncOxAPIClient:
+    """Tests for AsyncOxAPIClient class."""
+
+    def test_post(self):
+        """Testing a POST request against a local server."""
+        oxapi.api_key = "test"
+
+        async def post(url):
+            async with AsyncOxAPIClient(limit=2) as client:
+                res = await client.post(url, {"texts": ["test"]})
+                session = client.session
+                await client.post(url, {"texts": ["test"]})
+                assert client.session is session
+            return res
+
+        with LocalServer(message={"results": [[1.0]]}) as server:
+            res = asyncio.run(post(server.url + "/v1/model"))
+        assert res.status_code == 200 and res.json() == {"results": [[1.0]]}
+        assert json.loads(server.requests[0]["body"]) == {"texts": ["test"]}
+        assert server.requests[0]["headers"]["Authorization"] == "test"
+
+    def test_session_per_loop(self):
+        """Testing that the session of an event loop is closed with it, and not
+        replaced by the sessions of the other loops."""
+        oxapi.api_key = "test"
+        client = AsyncOxAPIClient()
+        sessions = []
+
+        async def post(url):
+            await client.post(url, {"texts": ["test"]})
+            sessions.append(client.session)
+            # no task is left on the loop to close the session
+            assert asyncio.all_tasks() == {asyncio.current_task()}
+
+        with LocalServer(message={"results": [[1.0]]}) as server:
+            for _ in range(2):
+                asyncio.run(post(server.url + "/v1/model"))
+                # closed at the shutdown of its loop by asyncio.run
+                assert sessions[-1].closed and not client._sessions
+            loop = asyncio.new_event_loop()
+            other = threading.Thread(target=loop.run_forever)
+            other.start()
+            try:
+                asyncio.run_coroutine_threadsafe(
+                    post(server.url + "/v1/model"), loop
+                ).result()
+
+                async def run():
+                    await post(server.url + "/v1/model")
+                    await client.close()
+
+                asyncio.run(run())
+                assert sessions[-1].closed
+                # the session of the other loop is closed within its loop
+                for _ in range(100):
+                    if sessions[2].closed:
+                        break
+                    time.sleep(0.01)
+                assert sessions[2].closed and not client._sessions
+            finally:
+                loop.call_soon_threadsafe(loop.stop)
+                other.join()
+                loop.close()
+        assert len(set(map(id, sessions))) == 4
+
+    def test_deadline(self):
+        """Testing that a call exceeding its deadline is interrupted."""
+        oxapi.api_key = "test"
+        client = AsyncOxAPIClient(retry_policy=RetryPolicy(backoff_factor=0))
+
+        async def post(client, url, data, headers, timeout=None):
+            await asyncio.sleep(1)
+
+        with mock.patch.object(AsyncOxAPIClient, "_post", new=post):
+            start = time.monotonic()
+            with pytest.raises(DeadlineExceededException):
+                asyncio.run(client.post("https://api.oxolo.com", {}, deadline=0.05))
+        assert time.monotonic() - start < 0.5
+
+    def test_set_async_client(self):
+        """Testing the replacement of the default asynchronous client."""
+        previous = get_async_client()
+        client = AsyncOxAPIClient()
+        set_async_client(client)
+        try:
+            assert get_async_client() is client
+        finally:
+            set_async_client(previous)
+
+    def test_retry(self):
+        """Testing that retryable failures are retried."""
+        oxapi.api_key = "test"
+        client = AsyncOxAPIClient(retry_policy=RetryPolicy(backoff_factor=0))
+        answers = [
+            asyncio.TimeoutError(),
+            MockedResponse(status_code=502, message={"message": "bad gateway"}),
+            MockedResponse(status_code=200, message={"results": []}),
+        ]
+        with mock.patch.object(
+            AsyncOxAPIClient, "_post", new=mock.AsyncMock(side_effect=answers)
+        ) as mocked_post:
+            res = asyncio.run(client.post("https://api.oxolo.com", {"texts": []}))
+        assert res.status_code == 200 and mocked_post.call_count == 3
+
+    def test_hedging(self):
+        """Testing that a slow request is hedged and the loser cancelled."""
+        oxapi.api_key = "test"
+        fast = MockedResponse(status_code=200, message={"results": ["fast"]})
+        cancelled = []
+        calls = []
+
+        async def post(client, url, data, headers, timeout=None):
+            calls.append(url)
+            if len(calls) == 1:
+                try:
+                    await asyncio.sleep(1)
+                except asyncio.CancelledError:
+                    cancelled.append(url)
+                    raise
+            return fast
+
+        hedging = HedgingPolicy(initial_delay=0.05, max_ratio=1.0)
+        client = AsyncOxAPIClient(hedging=hedging)
+        with mock.patch.object(AsyncOxAPIClient, "_post", new=post):
+            res = asyncio.run(client.post("https://api.oxolo.com", {"prompt": "a"}))
+        assert res is fast and len(calls) == 2 and len(cancelled) == 1
+
+    def test_compression(self):
+        """Testing the compression of the request bodies above the threshold."""
+        oxapi.api_key = "test"
+        body = {"texts": ["a long transcript"] * 100}
+
+        async def post(url):
+            async with AsyncOxAPIClient(compress_threshold=100) as client:
+                await client.post(url, body)
+                return client.stats
+
+        with LocalServer(message={"results": []}) as server:
+            stats = asyncio.run(post(server.url))
+        assert server.requests[0]["headers"]["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(server.requests[0]["body"])) == body
+        assert stats.bytes_sent < stats.bytes_sent_uncompressed
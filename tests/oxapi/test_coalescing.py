@@ -0,0 +1,239 @@
+import asyncio
+import json
+import threading
+import time
+import unittest.mock as mock
+
+import pytest
+import requests
+
+import oxapi
+from oxapi.coalescing import Coalescer, SlicedResponse
+from oxapi.deadline import Deadline
+from oxapi.error import DeadlineExceededException
+from oxapi.nlp.encoding import Encoding
+from tests.testing_utils import MockedResponse
+
+
+def answer(url, data, **kwargs):
+    """Answers a mocked request with the length of each text.
+
+    Args:
+        url: the url of the request.
+        data: the JSON encoded body of the request.
+        **kwargs: the other arguments of the request.
+
+    Returns:
+        MockedResponse : the mocked response.
+    """
+    texts = json.loads(data)["texts"]
+    return MockedResponse(
+        status_code=200, message={"results": [[float(len(t))] for t in texts]}
+    )
+
+
+class TestSlicedResponse:
+    """Tests for SlicedResponse class."""
+
+    def test_json(self):
+        """Testing that only the results of the call are returned."""
+        response = MockedResponse(
+            status_code=200, message={"results": [1, 2, 3], "model": "m"}
+        )
+        assert SlicedResponse(response, 1, 3).json() == {
+            "results": [2, 3],
+            "model": "m",
+        }
+        error = MockedResponse(status_code=500, message={"message": "error"})
+        assert SlicedResponse(error, 1, 3).json() == {"message": "error"}
+
+
+class TestCoalescer:
+    """Tests for Coalescer class."""
+
+    def test_invalid_limits(self):
+        """Testing error at instantiation with invalid limits."""
+        with pytest.raises(ValueError):
+            Coalescer(max_wait=-1)
+        with pytest.raises(ValueError):
+            Coalescer(max_batch=0)
+
+    def test_accepts(self):
+        """Testing that only the calls with few texts are coalesced."""
+        coalescer = Coalescer(max_batch=2)
+        assert coalescer.accepts({"texts": ["a"]})
+        assert not coalescer.accepts({"texts": ["a", "b"]})
+        assert not coalescer.accepts({"texts": []})
+        assert not coalescer.accepts({"text": "a"})
+
+    def test_post(self):
+        """Testing that concurrent calls are sent in batches of at most max_batch
+        texts, with the same parameters only."""
+        client = mock.Mock()
+        client.post.side_effect = lambda url, body, **kwargs: answer(
+            url, json.dumps(body)
+        )
+        coalescer = Coalescer(max_wait=0.5, max_batch=4)
+        bodies = [
+            {"texts": ["a", "bb"]},
+            {"texts": ["ccc"]},
+            {"texts": ["dddd", "eeeee"]},
+            {"texts": ["ffffff"], "option": True},
+        ]
+        results = [None] * len(bodies)
+
+        def post(i):
+            results[i] = coalescer.post(client, "url", bodies[i]).json()
+
+        threads = [threading.Thread(target=post, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == [
+            {"results": [[1.0], [2.0]]},
+            {"results": [[3.0]]},
+            {"results": [[4.0], [5.0]]},
+            {"results": [[6.0]]},
+        ]
+        assert coalescer.calls == 4
+        assert client.post.call_count == coalescer.requests == 3
+
+    def test_error(self):
+        """Testing that the failure of a batched request fails all its calls."""
+        client = mock.Mock()
+        client.post.side_effect = requests.ConnectionError()
+        coalescer = Coalescer(max_wait=0)
+        with pytest.raises(requests.ConnectionError):
+            coalescer.post(client, "url", {"texts": ["a"]})
+
+    def test_leader_cancelled(self):
+        """Testing that cancelling the first call of a batch does not leave the
+        other calls waiting."""
+        client = mock.Mock()
+        client.post = mock.AsyncMock(
+            side_effect=lambda url, body, **kwargs: answer(url, json.dumps(body))
+        )
+        coalescer = Coalescer(max_wait=0.1, max_batch=4)
+
+        async def run():
+            leader = asyncio.ensure_future(
+                coalescer.apost(client, "url", {"texts": ["a"]})
+            )
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(
+                coalescer.apost(client, "url", {"texts": ["bb"]})
+            )
+            await asyncio.sleep(0)
+            leader.cancel()
+            return await asyncio.wait_for(follower, 2)
+
+        assert asyncio.run(run()).json() == {"results": [[2.0]]}
+        assert client.post.call_count == 1
+
+    def test_deadline(self):
+        """Testing that the wait of each call is bounded by its own deadline."""
+        client = mock.Mock()
+
+        async def hang(*args, **kwargs):
+            await asyncio.sleep(10)
+
+        client.post = mock.AsyncMock(side_effect=hang)
+        coalescer = Coalescer(max_wait=0)
+
+        async def run():
+            return await coalescer.apost(
+                client, "url", {"texts": ["a"]}, deadline=Deadline.start(0.05)
+            )
+
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceededException):
+            asyncio.run(run())
+        assert time.monotonic() - start < 2
+
+    def test_mixed_deadlines(self):
+        """Testing that a call with a tight deadline does not fail the other calls
+        of its batch."""
+        deadlines = []
+
+        def post(url, body, deadline=None, **kwargs):
+            deadlines.append(deadline)
+            time.sleep(0.1)
+            if deadline is not None:
+                deadline.check(url)
+            return answer(url, json.dumps(body))
+
+        client = mock.Mock()
+        client.post.side_effect = post
+        coalescer = Coalescer(max_wait=0.5, max_batch=2)
+        results = [None] * 2
+
+        def call(i, deadline):
+            try:
+                results[i] = coalescer.post(
+                    client, "url", {"texts": ["a" * (i + 1)]}, deadline=deadline
+                ).json()
+            except DeadlineExceededException as e:
+                results[i] = e
+
+        threads = [
+            threading.Thread(target=call, args=(0, Deadline.start(0.05))),
+            threading.Thread(target=call, args=(1, None)),
+        ]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.01)
+        for thread in threads:
+            thread.join()
+        assert deadlines == [None]
+        assert isinstance(results[0], DeadlineExceededException)
+        assert results[1] == {"results": [[2.0]]}
+
+
+class TestCoalescerModelAPI:
+    """Tests for the coalescing of the calls of the model classes."""
+
+    def test_run(self, monkeypatch):
+        """Testing that concurrent single text runs share one request."""
+        oxapi.api_key = "test"
+        monkeypatch.setattr(Encoding, "coalescing", Coalescer(max_wait=1, max_batch=8))
+        apis = [None] * 8
+
+        def run(i):
+            apis[i] = Encoding.run(model="all-mpnet-base-v2", texts=["a" * (i + 1)])
+
+        with mock.patch(
+            "oxapi.client.requests.Session.post", side_effect=answer
+        ) as mocked_post:
+            threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        assert mocked_post.call_count == 1
+        assert [api.result for api in apis] == [
+            {"results": [[float(i + 1)]]} for i in range(8)
+        ]
+
+    def test_arun(self, monkeypatch):
+        """Testing that concurrent single text coroutines share one request."""
+        oxapi.api_key = "test"
+        monkeypatch.setattr(Encoding, "coalescing", Coalescer(max_wait=1, max_batch=4))
+        mocked_post = mock.AsyncMock(
+            side_effect=lambda url, body, **kwargs: answer(url, json.dumps(body))
+        )
+
+        async def run():
+            return await asyncio.gather(
+                *[
+                    Encoding.arun(model="all-mpnet-base-v2", texts=["a" * (i + 1)])
+                    for i in range(4)
+                ]
+            )
+
+        with mock.patch("oxapi.client.AsyncOxAPIClient.post", new=mocked_post):
+            apis = asyncio.run(run())
+        assert mocked_post.call_count == 1
+        assert [api.result for api in apis] == [
+            {"results": [[float(i + 1)]]} for i in range(4)
+        ]
@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+from oxapi.deadline import Deadline
+from oxapi.error import DeadlineExceededException
+
+
+class TestDeadline:
+    """Tests for Deadline class."""
+
+    def test_invalid_budget(self):
+        """Testing error at instantiation with a non positive budget."""
+        with pytest.raises(ValueError):
+            Deadline(0)
+
+    def test_start(self):
+        """Testing the creation of a deadline from a budget."""
+        assert Deadline.start(None) is None
+        deadline = Deadline.start(1.0)
+        assert isinstance(deadline, Deadline) and 0 < deadline.remaining() <= 1.0
+        assert Deadline.start(deadline) is deadline
+
+    def test_earliest(self):
+        """Testing the selection of the deadline expiring first."""
+        short, long = Deadline(0.5), Deadline(10)
+        assert Deadline.earliest(long, None, short) is short
+        assert Deadline.earliest(None, None) is None
+
+    def test_latest(self):
+        """Testing the selection of the deadline expiring last."""
+        short, long = Deadline(0.5), Deadline(10)
+        assert Deadline.latest(short, long) is long
+        assert Deadline.latest(long, None, short) is None
+        assert Deadline.latest() is None
+
+    def test_expiry(self):
+        """Testing that the remaining budget shrinks until the deadline expires."""
+        deadline = Deadline(0.05)
+        deadline.check("https://api.oxolo.com")
+        assert not deadline.expired()
+        time.sleep(0.06)
+        assert deadline.expired() and deadline.remaining() == 0
+        with pytest.raises(DeadlineExceededException):
+            deadline.check("https://api.oxolo.com")
+
+    def test_clamp(self):
+        """Testing that the timeouts are capped to the remaining budget."""
+        deadline = Deadline(2)
+        connect, read = deadline.clamp((1.0, 300.0))
+        assert connect == 1.0 and 1.9 < read <= 2.0
+        connect, read = deadline.clamp((None, None))
+        assert 0 < connect <= 2.0 and 0 < read <= 2.0
@@ -0,0 +1,165 @@
+import json
+import socket
+import time
+import unittest.mock as mock
+
+import pytest
+import requests
+
+import oxapi
+from oxapi import endpoints
+from oxapi.client import OxAPIClient
+from oxapi.endpoints import EndpointSelector
+from oxapi.nlp.encoding import Encoding
+from oxapi.retry import RetryPolicy
+from tests.testing_utils import LocalServer, MockedResponse
+
+
+def closed_url() -> str:
+    """Builds the url of a local port where nothing is listening."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return "http://127.0.0.1:{0}".format(port)
+
+
+@pytest.fixture(autouse=True)
+def reset_endpoints():
+    base_url = oxapi.base_url
+    yield
+    oxapi.base_url = base_url
+    endpoints._selectors.clear()
+
+
+class TestEndpointSelector:
+    """Tests for EndpointSelector class."""
+
+    def test_probe(self, tmp_path):
+        """Testing the measurement of the round-trip times."""
+        unreachable = closed_url()
+        with LocalServer() as server:
+            selector = EndpointSelector(
+                [unreachable, server.url], cache_path=str(tmp_path / "endpoints.json")
+            )
+            assert selector.is_stale()
+            rtts = selector.probe()
+        assert rtts[unreachable] is None and rtts[server.url] > 0
+        assert not selector.is_stale()
+        assert selector.get_base_url() == server.url
+
+    def test_probe_in_background(self, tmp_path):
+        """Testing that the first selection does not wait for the measurement."""
+        urls = ["https://eu.example.com", "https://us.example.com"]
+        selector = EndpointSelector(urls, cache_path=str(tmp_path / "endpoints.json"))
+        with mock.patch.object(
+            EndpointSelector, "_measure", side_effect=lambda url: time.sleep(0.2)
+        ):
+            start = time.monotonic()
+            assert selector.get_base_url() == urls[0]
+            assert time.monotonic() - start < 0.1
+            selector.probe_in_background().join(timeout=5)
+        assert selector.rtts == {url: None for url in urls}
+
+    def test_fastest(self, tmp_path):
+        """Testing the selection of the fastest endpoint."""
+        urls = ["https://eu.example.com", "https://us.example.com/"]
+        rtts = {urls[0]: 0.2, urls[1].rstrip("/"): 0.01}
+        with mock.patch.object(
+            EndpointSelector, "_measure", side_effect=lambda url: rtts[url]
+        ):
+            selector = EndpointSelector(
+                urls, cache_path=str(tmp_path / "endpoints.json")
+            )
+            selector.probe()
+        assert selector.get_base_url() == "https://us.example.com"
+
+    def test_disk_cache(self, tmp_path):
+        """Testing that the measurements are reused by a new selector until expired."""
+        path = str(tmp_path / "cache" / "endpoints.json")
+        urls = ["https://eu.example.com", "https://us.example.com"]
+        rtts = {urls[0]: 0.01, urls[1]: 0.2}
+        with mock.patch.object(
+            EndpointSelector, "_measure", side_effect=lambda url: rtts[url]
+        ):
+            EndpointSelector(urls, cache_path=path).probe()
+        with open(path) as f:
+            assert list(json.load(f).values())[0]["rtts"] == rtts
+        selector = EndpointSelector(list(reversed(urls)), cache_path=path)
+        assert not selector.is_stale() and selector.rtts == rtts
+        assert selector.get_base_url() == urls[0]
+        assert EndpointSelector(urls, ttl=0, cache_path=path).is_stale()
+
+    def test_failover(self, tmp_path):
+        """Testing that a failing endpoint is avoided until the end of the cooldown."""
+        urls = ["https://eu.example.com", "https://us.example.com"]
+        selector = EndpointSelector(
+            urls, cooldown=0.1, cache_path=str(tmp_path / "endpoints.json")
+        )
+        selector.rtts = {urls[0]: 0.01, urls[1]: 0.2}
+        selector.probed_at = time.time()
+        selector.report_failure(urls[0])
+        assert selector.get_base_url() == urls[1]
+        selector.report_failure(urls[1])
+        assert selector.get_base_url() == urls[0]
+        time.sleep(0.1)
+        assert selector.get_base_url() == urls[0]
+        selector.report_failure(urls[0])
+        selector.report_success(urls[0])
+        assert selector.get_base_url() == urls[0]
+
+    def test_empty(self):
+        """Testing the error for an empty list of endpoints."""
+        with pytest.raises(ValueError):
+            EndpointSelector([])
+
+
+class TestEndpointRouting:
+    """Tests for the routing of the calls to the selected endpoint."""
+
+    def test_get_url(self, tmp_path):
+        """Testing the urls built from a list of base urls."""
+        urls = ["https://eu.example.com", "https://us.example.com"]
+        selector = EndpointSelector(urls, cache_path=str(tmp_path / "endpoints.json"))
+        selector.rtts = {urls[0]: 0.2, urls[1]: 0.01}
+        selector.probed_at = time.time()
+        oxapi.base_url = selector
+        api = Encoding.prepare(model="all-mpnet-base-v2", texts=["test"])
+        assert api.get_url().startswith("https://us.example.com/")
+        oxapi.base_url = "https://api.example.com"
+        assert api.get_url().startswith("https://api.example.com/")
+
+    def test_get_url_list(self, tmp_path, monkeypatch):
+        """Testing that a list of base urls shares a selector."""
+        monkeypatch.setenv("OXAPI_CACHE_DIR", str(tmp_path))
+        oxapi.base_url = ["https://eu.example.com", "https://us.example.com"]
+        with mock.patch.object(EndpointSelector, "_measure", return_value=None):
+            api = Encoding.prepare(model="all-mpnet-base-v2", texts=["test"])
+            assert api.get_url().startswith("https://eu.example.com/")
+            selector = endpoints.get_selector(oxapi.base_url)
+            selector.probe_in_background().join(timeout=5)
+        assert selector.cache_path == str(tmp_path / "endpoints.json")
+
+    def test_client_failover(self, tmp_path):
+        """Testing that a retried call is moved to another endpoint."""
+        urls = ["https://eu.example.com", "https://us.example.com"]
+        selector = EndpointSelector(urls, cache_path=str(tmp_path / "endpoints.json"))
+        selector.rtts = {urls[0]: 0.01, urls[1]: 0.2}
+        selector.probed_at = time.time()
+        oxapi.base_url = selector
+        oxapi.api_key = "test"
+        assert endpoints.get_base_url() == urls[0]
+        answers = [
+            requests.ConnectionError("unreachable"),
+            MockedResponse(status_code=200, message={"results": []}),
+        ]
+        client = OxAPIClient(retry_policy=RetryPolicy(backoff_factor=0))
+        with mock.patch(
+            "oxapi.client.requests.Session.post", side_effect=answers
+        ) as mocked_post:
+            res = client.post(urls[0] + "/v1/test", {"texts": ["test"]})
+        assert res.status_code == 200
+        assert [c.args[0] for c in mocked_post.call_args_list] == [
+            urls[0] + "/v1/test",
+            urls[1] + "/v1/test",
+        ]
+        assert selector.get_base_url() == urls[1]
@@ -0,0 +1,52 @@
+import pytest
+
+from oxapi.hedging import HedgingPolicy
+
+
+class TestHedgingPolicy:
+    """Tests for HedgingPolicy class."""
+
+    def test_invalid_parameters(self):
+        """Testing errors at instantiation with invalid parameters."""
+        with pytest.raises(ValueError):
+            HedgingPolicy(percentile=100)
+        with pytest.raises(ValueError):
+            HedgingPolicy(max_ratio=2)
+
+    def test_initial_delay(self):
+        """Testing the delay used before enough latencies are observed."""
+        policy = HedgingPolicy(initial_delay=0.5, min_samples=10)
+        policy.record("url", 0.1)
+        assert policy.get_delay("url") == 0.5
+
+    def test_percentile_delay(self):
+        """Testing the delay derived from the observed latencies."""
+        policy = HedgingPolicy(percentile=90, min_delay=0.0, min_samples=10)
+        for i in range(1, 101):
+            policy.record("url", i / 100)
+        assert policy.get_delay("url") == 0.9
+        assert policy.get_delay("other_url") == policy.initial_delay
+
+    def test_min_delay(self):
+        """Testing that the delay is never below the minimum."""
+        policy = HedgingPolicy(min_delay=0.2, min_samples=1)
+        policy.record("url", 0.01)
+        assert policy.get_delay("url") == 0.2
+
+    def test_window(self):
+        """Testing that only the most recent latencies are considered."""
+        policy = HedgingPolicy(percentile=50, min_delay=0.0, window=5, min_samples=5)
+        for _ in range(5):
+            policy.record("url", 10.0)
+        for _ in range(5):
+            policy.record("url", 1.0)
+        assert policy.get_delay("url") == 1.0
+
+    def test_max_ratio(self):
+        """Testing the cap on the ratio of duplicate requests."""
+        policy = HedgingPolicy(max_ratio=0.25)
+        for _ in range(8):
+            policy.start_request()
+        assert policy.try_hedge() and policy.try_hedge()
+        assert not policy.try_hedge()
+        assert policy.hedges == 2 and policy.requests == 8
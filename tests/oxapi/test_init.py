@@ -0,0 +1,36 @@
+import json
+import os
+import subprocess
+import sys
+
+IMPORT_BENCHMARK = """
+import json
+import sys
+import time
+
+start = time.perf_counter()
+import oxapi
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+class TestInit:
+    """Tests for the oxapi package initialization."""
+
+    def test_import_time(self):
+        """Benchmarking `import oxapi` in a fresh interpreter: heavy dependencies must
+        not be imported and no network call must be performed."""
+        env = dict(os.environ)
+        env["OXAPI_KEY"] = "test"
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_BENCHMARK],
+            capture_output=True,
+            check=True,
+            env=env,
+            text=True,
+        )
+        res = json.loads(out.stdout)
+        for module in ["pandas", "numpy", "grequests", "gevent"]:
+            assert module not in res["modules"]
+        assert res["elapsed"] < 1.0
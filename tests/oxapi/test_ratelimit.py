@@ -0,0 +1,50 @@
+import asyncio
+import time
+
+import pytest
+
+from oxapi.ratelimit import TokenBucket
+
+
+class TestTokenBucket:
+    """Tests for TokenBucket class."""
+
+    def test_invalid_rate(self):
+        """Testing error at instantiation with a non positive rate."""
+        with pytest.raises(ValueError):
+            TokenBucket(rate=0)
+
+    def test_burst(self):
+        """Testing that a burst up to the capacity is not delayed."""
+        bucket = TokenBucket(rate=10, capacity=5)
+        start = time.monotonic()
+        for _ in range(5):
+            bucket.acquire()
+        assert time.monotonic() - start < 0.05
+
+    def test_acquire(self):
+        """Testing that acquiring beyond the capacity waits for the refill."""
+        bucket = TokenBucket(rate=100, capacity=1)
+        start = time.monotonic()
+        for _ in range(11):
+            bucket.acquire()
+        assert time.monotonic() - start >= 0.09
+
+    def test_acquire_more_than_capacity(self):
+        """Testing that a request bigger than the capacity is let through."""
+        bucket = TokenBucket(rate=100, capacity=1)
+        start = time.monotonic()
+        bucket.acquire(5)
+        assert time.monotonic() - start >= 0.035
+
+    def test_acquire_async(self):
+        """Testing the asynchronous acquisition."""
+        bucket = TokenBucket(rate=100, capacity=1)
+
+        async def acquire():
+            for _ in range(11):
+                await bucket.acquire_async()
+
+        start = time.monotonic()
+        asyncio.run(acquire())
+        assert time.monotonic() - start >= 0.09
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from oxapi.retry import RetryPolicy
+from tests.testing_utils import MockedResponse
+
+
+class TestRetryPolicy:
+    """Tests for RetryPolicy class."""
+
+    def test_invalid_max_attempts(self):
+        """Testing error at instantiation with less than one attempt."""
+        with pytest.raises(ValueError):
+            RetryPolicy(max_attempts=0)
+
+    def test_is_retryable(self):
+        """Testing which failures are retried."""
+        policy = RetryPolicy()
+        assert policy.is_retryable(None)
+        assert policy.is_retryable(MockedResponse(status_code=429, message={}))
+        assert policy.is_retryable(MockedResponse(status_code=503, message={}))
+        assert not policy.is_retryable(MockedResponse(status_code=404, message={}))
+        assert not policy.is_retryable(MockedResponse(status_code=200, message={}))
+
+    def test_exponential_backoff(self):
+        """Testing the exponential backoff without jitter."""
+        policy = RetryPolicy(backoff_factor=1, max_backoff=5, jitter=False)
+        assert [policy.get_backoff(attempt) for attempt in range(1, 5)] == [
+            1,
+            2,
+            4,
+            5,
+        ]
+
+    def test_jitter(self):
+        """Testing that the jitter never exceeds the exponential backoff."""
+        policy = RetryPolicy(backoff_factor=1, jitter=True)
+        assert all(0 <= policy.get_backoff(3) <= 4 for _ in range(100))
+
+    def test_retry_after_seconds(self):
+        """Testing the Retry-After header expressed in seconds."""
+        policy = RetryPolicy(backoff_factor=0.1, jitter=False)
+        response = MockedResponse(
+            status_code=429, message={}, headers={"Retry-After": "7"}
+        )
+        assert policy.get_backoff(1, response) == 7
+
+    def test_retry_after_date(self):
+        """Testing the Retry-After header expressed as a date."""
+        date = datetime.now(timezone.utc) + timedelta(seconds=30)
+        response = MockedResponse(
+            status_code=503,
+            message={},
+            headers={"Retry-After": format_datetime(date, usegmt=True)},
+        )
+        assert 25 <= RetryPolicy.parse_retry_after(response) <= 30
+
+    def test_retry_after_ignored(self):
+        """Testing that Retry-After can be ignored or be malformed."""
+        response = MockedResponse(
+            status_code=429, message={}, headers={"Retry-After": "soon"}
+        )
+        assert RetryPolicy.parse_retry_after(response) is None
+        policy = RetryPolicy(backoff_factor=1, jitter=False, respect_retry_after=False)
+        response.headers["Retry-After"] = "60"
+        assert policy.get_backoff(1, response) == 1
@@ -0,0 +1,203 @@
+import asyncio
+import threading
+import time
+import unittest.mock as mock
+
+import pytest
+
+import oxapi
+from oxapi.deadline import Deadline
+from oxapi.error import DeadlineExceededException
+from oxapi.nlp.completion import Completion
+from oxapi.singleflight import SingleFlight
+from tests.testing_utils import MockedResponse
+
+URL = "https://api.oxolo.com/nlp/v1/completion/gpt-neo-2-7b"
+
+
+class TestSingleFlight:
+    """Tests for SingleFlight class."""
+
+    def test_get_key(self):
+        """Testing that the key does not depend on the order of the parameters."""
+        key = SingleFlight.get_key(URL, {"prompt": "a", "max_length": 10})
+        assert key == SingleFlight.get_key(URL, {"max_length": 10, "prompt": "a"})
+        assert key != SingleFlight.get_key(URL, {"prompt": "a", "max_length": 11})
+        assert key != SingleFlight.get_key(URL + "2", {"prompt": "a", "max_length": 10})
+
+    def test_do(self):
+        """Testing that identical concurrent calls share a single call."""
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def function():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "result"
+
+        results = []
+        leader = threading.Thread(
+            target=lambda: results.append(flight.do(URL, {"prompt": "a"}, function))
+        )
+        leader.start()
+        started.wait(5)
+        followers = [
+            threading.Thread(
+                target=lambda: results.append(flight.do(URL, {"prompt": "a"}, function))
+            )
+            for _ in range(3)
+        ]
+        for follower in followers:
+            follower.start()
+        while flight.calls < 4:
+            time.sleep(0.001)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join()
+        assert results == ["result"] * 4 and len(calls) == 1
+        assert flight.shared == 3
+        # the flight is over, the following call is performed again
+        assert flight.do(URL, {"prompt": "a"}, lambda: "again") == "again"
+
+    def test_error(self):
+        """Testing that the error of a call is raised to its caller."""
+        flight = SingleFlight()
+
+        def function():
+            raise ValueError()
+
+        with pytest.raises(ValueError):
+            flight.do(URL, {"prompt": "a"}, function)
+        assert flight.do(URL, {"prompt": "a"}, lambda: 1) == 1
+
+    def test_deadline(self):
+        """Testing that a caller stops waiting for an identical call at its
+        deadline."""
+        flight = SingleFlight()
+        release = threading.Event()
+        leader = threading.Thread(
+            target=lambda: flight.do(URL, {"prompt": "a"}, lambda: release.wait(5))
+        )
+        leader.start()
+        while flight.calls < 1:
+            time.sleep(0.001)
+        with pytest.raises(DeadlineExceededException):
+            flight.do(URL, {"prompt": "a"}, lambda: None, deadline=Deadline(0.05))
+        release.set()
+        leader.join()
+
+    def test_ado(self):
+        """Testing that identical concurrent coroutines share a single call."""
+        flight = SingleFlight()
+        calls = []
+
+        async def function():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        async def run():
+            return await asyncio.gather(
+                *[flight.ado(URL, {"prompt": "a"}, function) for _ in range(4)],
+                flight.ado(URL, {"prompt": "b"}, function),
+            )
+
+        assert asyncio.run(run()) == ["result"] * 5
+        assert len(calls) == 2 and flight.shared == 3
+
+    def test_ado_cancelled(self):
+        """Testing that cancelling the caller which started a call does not cancel
+        it for the identical calls waiting for it."""
+        flight = SingleFlight()
+        calls = []
+
+        async def function():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        async def run():
+            leader = asyncio.ensure_future(flight.ado(URL, {"prompt": "a"}, function))
+            await asyncio.sleep(0)
+            followers = asyncio.gather(
+                *[flight.ado(URL, {"prompt": "a"}, function) for _ in range(2)]
+            )
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return await asyncio.wait_for(followers, 1)
+
+        assert asyncio.run(run()) == ["result"] * 2
+        assert len(calls) == 1 and not flight._flights
+
+
+class TestSingleFlightModelAPI:
+    """Tests for the single-flight layer of the model classes."""
+
+    def test_arun(self, monkeypatch):
+        """Testing that identical concurrent completions share one request."""
+        oxapi.api_key = "test"
+        monkeypatch.setattr(Completion, "single_flight", SingleFlight())
+
+        async def post(client, url, body, **kwargs):
+            await asyncio.sleep(0.05)
+            return MockedResponse(status_code=200, message={"results": ["done"]})
+
+        async def run():
+            return await asyncio.gather(
+                *[
+                    Completion.arun(
+                        model="gpt-neo-2-7b", prompt="Hello", do_sample=False
+                    )
+                    for _ in range(3)
+                ]
+            )
+
+        with mock.patch(
+            "oxapi.client.AsyncOxAPIClient.post", side_effect=post, autospec=True
+        ) as mocked_post:
+            apis = asyncio.run(run())
+        assert mocked_post.call_count == 1
+        assert [api.result for api in apis] == [{"results": ["done"]}] * 3
+
+    def test_run_mixed_deadlines(self, monkeypatch):
+        """Testing that the deadline of the caller which started a shared call does
+        not fail the identical calls waiting for it."""
+        oxapi.api_key = "test"
+        monkeypatch.setattr(Completion, "single_flight", SingleFlight())
+        results = [None] * 2
+
+        def post(url, data, **kwargs):
+            time.sleep(0.1)
+            return MockedResponse(status_code=200, message={"results": ["done"]})
+
+        def run(i, deadline):
+            try:
+                results[i] = Completion.run(
+                    model="gpt-neo-2-7b",
+                    prompt="Hello",
+                    do_sample=False,
+                    deadline=deadline,
+                ).result
+            except DeadlineExceededException as e:
+                results[i] = e
+
+        with mock.patch(
+            "oxapi.client.requests.Session.post", side_effect=post
+        ) as mocked_post:
+            threads = [
+                threading.Thread(target=run, args=(0, 0.05)),
+                threading.Thread(target=run, args=(1, None)),
+            ]
+            for thread in threads:
+                thread.start()
+                time.sleep(0.01)
+            for thread in threads:
+                thread.join()
+        assert mocked_post.call_count == 1
+        assert isinstance(results[0], DeadlineExceededException)
+        assert results[1] == {"results": ["done"]}
@@ -0,0 +1,69 @@
+import json
+
+import numpy as np
+import pytest
+
+from oxapi.wire import (
+    BASE64,
+    OCTET_STREAM,
+    decode_embeddings,
+    encode_embeddings,
+    get_accept,
+)
+from tests.testing_utils import MockedResponse
+
+EMBEDDINGS = [[0.5, -1.0, 2.0], [0.25, 0.0, -3.5]]
+
+
+class TestWire:
+    """Tests for the wire formats of the embeddings."""
+
+    def test_get_accept(self):
+        """Testing the negotiation of the wire formats, with JSON as fallback."""
+        assert get_accept("json") is None
+        assert get_accept(OCTET_STREAM).startswith("application/octet-stream")
+        assert "application/json; q=0.5" in get_accept(BASE64)
+        with pytest.raises(ValueError):
+            get_accept("msgpack")
+
+    def test_octet_stream(self):
+        """Testing the zero-copy decoding of an octet-stream response."""
+        content = encode_embeddings(EMBEDDINGS, OCTET_STREAM)
+        assert len(content) == 8 + 6 * 4
+        response = MockedResponse(
+            status_code=200,
+            message=None,
+            headers={"Content-Type": "application/octet-stream"},
+            content=content,
+        )
+        results = decode_embeddings(response)["results"]
+        assert results.dtype == np.float32 and results.shape == (2, 3)
+        assert results.tolist() == EMBEDDINGS
+        assert not results.flags.owndata and not results.flags.writeable
+
+    def test_base64(self):
+        """Testing the decoding of a base64 response."""
+        content = encode_embeddings(EMBEDDINGS, BASE64)
+        response = MockedResponse(
+            status_code=200,
+            message=json.loads(content),
+            headers={"Content-Type": "application/json; charset=utf-8"},
+        )
+        results = decode_embeddings(response)["results"]
+        assert results.dtype == np.float32 and results.tolist() == EMBEDDINGS
+        assert not results.flags.owndata
+
+    def test_json(self):
+        """Testing the fallback to the embeddings as lists of floats."""
+        response = MockedResponse(status_code=200, message={"results": EMBEDDINGS})
+        assert decode_embeddings(response) == {"results": EMBEDDINGS}
+
+    def test_empty(self):
+        """Testing the encoding of a call without texts."""
+        response = MockedResponse(
+            status_code=200,
+            message=None,
+            headers={"Content-Type": "application/octet-stream"},
+            content=encode_embeddings([], OCTET_STREAM),
+        )
+        assert decode_embeddings(response)["results"].shape == (0, 0)
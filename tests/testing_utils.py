@@ -1,8 +1,149 @@
+import base64
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+
 class MockedResponse:
-    def __init__(self, status_code: int, message: dict):
+    def __init__(
+        self,
+        status_code: int,
+        message: dict,
+        headers: dict = None,
+        content: bytes = None,
+    ):
         self.status_code = status_code
-        self.headers = ""
+        self.headers = headers if headers is not None else {}
         self.message = message
+        self.url = "mocked_url"
+        self._content = content
+
+    @property
+    def content(self) -> bytes:
+        if self._content is not None:
+            return self._content
+        return json.dumps(self.message).encode()
 
     def json(self):
         return self.message
+
+
+class LocalServer:
+    """Local HTTP server answering every POST request with a fixed body, JSON by
+    default, to be used as a stand-in for OxAPI.
+
+    The server runs in a separate process, so that it is not affected by the
+    monkey-patching performed by grequests.
+    """
+
+    def __init__(
+        self,
+        status_code: int = 200,
+        message: dict = None,
+        content: bytes = None,
+        content_type: str = "application/json",
+        delays: list = None,
+    ):
+        self.status_code = status_code
+        self.message = message if message is not None else {"results": []}
+        self.content = (
+            content if content is not None else json.dumps(self.message).encode()
+        )
+        self.content_type = content_type
+        self.delays = delays if delays is not None else []
+        self.port = None
+        self._process = None
+        self._log = None
+        self._requests = None
+
+    @property
+    def url(self) -> str:
+        return "http://127.0.0.1:{0}".format(self.port)
+
+    @property
+    def requests(self) -> list:
+        """The requests received by the server, in order of arrival."""
+        if self._requests is not None:
+            return self._requests
+        with open(self._log) as log:
+            requests = [json.loads(line) for line in log]
+        for request in requests:
+            request["body"] = base64.b64decode(request["body"])
+        return requests
+
+    def __enter__(self):
+        fd, self._log = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+        self._process = subprocess.Popen(
+            [
+                sys.executable,
+                "-c",
+                _LOCAL_SERVER_SCRIPT,
+                str(self.status_code),
+                base64.b64encode(self.content).decode(),
+                self._log,
+                self.content_type,
+                json.dumps(self.delays),
+            ],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        self.port = int(self._process.stdout.readline())
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._process.terminate()
+        self._process.wait()
+        self._process.stdout.close()
+        self._requests = self.requests
+        os.remove(self._log)
+
+
+_LOCAL_SERVER_SCRIPT = """
+import base64
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+status_code = int(sys.argv[1])
+content = base64.b64decode(sys.argv[2])
+log_path = sys.argv[3]
+content_type = sys.argv[4]
+# seconds waited before answering each request, in order of arrival
+delays = json.loads(sys.argv[5])
+lock = threading.Lock()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        with lock, open(log_path, "a") as log:
+            request = {
+                "path": self.path,
+                "headers": dict(self.headers),
+                "body": base64.b64encode(body).decode(),
+            }
+            log.write(json.dumps(request) + "\\n")
+            delay = delays.pop(0) if delays else 0
+        time.sleep(delay)
+        self.send_response(status_code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+print(server.server_address[1], flush=True)
+server.serve_forever()
+"""